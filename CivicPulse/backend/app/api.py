@@ -0,0 +1,536 @@
+"""Read-only API: /events, /route, /stats, health and metrics.
+
+API replicas import only what serving needs (Motor, NumPy, the scoring and
+rollup helpers). The scraper, LLM client and scheduler belong to the ingest
+worker (app/ingest.py) and are never imported here; /route imports requests
+on its first Directions call.
+
+    uvicorn app.api:app      read API replica (python -m app.serve for multi-worker)
+    python -m app.ingest     ingest worker
+    uvicorn app.main:app     both in one process
+
+/route picks a provider per request: Google Directions alternatives, the
+offline road graph of app/routing.py (risk-aware A*), or auto, which uses the
+local graph when it covers both ends and Google otherwise.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, FastAPI, HTTPException, Response
+from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, Field
+import numpy as np
+
+from .db import db, EVENT_MAP_PROJECTION, HOT_RETENTION_HOURS, QUERY_LIMIT
+from .events import EventColumns
+from .routing import SPEEDS, get_road_graph, sync_edge_risk
+from .scoring import (
+    compute_route_risk,
+    decode_polyline,
+    encode_polyline,
+    events_near,
+    normalize_route_metrics,
+    resample_polyline,
+    simplify_polyline,
+)
+from .rollups import GEOHASH_ALPHABET, GEOHASH_PRECISION, geohash, stats_match, timeseries_pipeline, top_pipeline
+from .loopmon import loop_report, start_loop_monitor, stop_loop_monitor
+from .metrics import UPSTREAM_FALLBACKS, MetricsMiddleware, render_latest, stage
+from .profiling import ProfilingMiddleware
+from .resilience import DeadlineMiddleware, breaker_states, get_upstream
+from .snapshot import get_snapshot
+
+
+router = APIRouter()
+
+ROUTE_PROVIDERS = ("google", "local", "auto")
+ROUTE_PROVIDER = os.getenv("ROUTE_PROVIDER", "google")
+# Routes are simplified to this tolerance before risk sampling (0 keeps every point)
+ROUTE_SIMPLIFY_METERS = float(os.getenv("ROUTE_SIMPLIFY_METERS", "5"))
+# Risk is sampled every ROUTE_SAMPLE_METERS along the simplified shape, up to ROUTE_MAX_SAMPLES points
+ROUTE_SAMPLE_METERS = float(os.getenv("ROUTE_SAMPLE_METERS", "50"))
+ROUTE_MAX_SAMPLES = int(os.getenv("ROUTE_MAX_SAMPLES", "200"))
+ROUTE_RISK_RADIUS_METERS = 50.0
+# Without a snapshot, candidates come from one box query per this many consecutive samples
+ROUTE_LOOKUP_SEGMENT_POINTS = 40
+DIRECTIONS_TIMEOUT_SECONDS = 10.0
+# Recent Directions answers, served only when Directions itself is unavailable
+DIRECTIONS_CACHE_SIZE = int(os.getenv("DIRECTIONS_CACHE_SIZE", "1000"))
+DIRECTIONS_CACHE_SECONDS = float(os.getenv("DIRECTIONS_CACHE_SECONDS", "86400"))
+_directions_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+# Pydantic models
+class EventResponse(BaseModel):
+    _id: str
+    source: str
+    title: str
+    text: str
+    timestamp: str
+    coordinates: Dict[str, float]
+    safety_score: float
+    event_type: str
+    severity: int
+
+
+class RouteRequest(BaseModel):
+    start: Dict[str, float] = Field(..., description="Start location with lat and lng")
+    end: Dict[str, float] = Field(..., description="End location with lat and lng")
+    mode: str = Field(default="driving", description="Transportation mode: driving, walking, bicycling, transit")
+    alpha: float = Field(default=0.5, description="Weight for distance in route selection")
+    beta: float = Field(default=0.5, description="Weight for risk in route selection")
+    preference: str = Field(default="safest", description="Route preference: fastest or safest")
+    provider: str = Field(default=ROUTE_PROVIDER, description="Routing provider: google, local (offline road graph) or auto")
+
+
+class RouteResponse(BaseModel):
+    route: Dict[str, Any]
+    distance_meters: float
+    duration_seconds: float
+    aggregate_risk: float
+    event_count: int
+    preference: str
+    polyline: str
+
+
+async def startup_event():
+    """Initialize database connection on startup."""
+    start_loop_monitor()
+    try:
+        await db.connect()
+    except Exception as e:
+        print(f"Warning: Database connection failed: {e}")
+        print("App will continue but database operations may fail")
+
+
+async def shutdown_event():
+    """Close database connection on shutdown."""
+    await db.disconnect()
+    stop_loop_monitor()
+
+
+@router.get("/health")
+async def health_check():
+    """Health check endpoint."""
+    return {
+        "status": "healthy",
+        "timestamp": datetime.utcnow().isoformat(),
+        "circuits": breaker_states()
+    }
+
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics."""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+@router.get("/admin/loop")
+async def loop_health():
+    """Event loop lag, recent stalls with their stacks and, in LOOP_STRICT mode, blocking call sites."""
+    return loop_report()
+
+
+@router.get("/admin/explain")
+async def explain_queries(
+    sw_lat: Optional[float] = None,
+    sw_lng: Optional[float] = None,
+    ne_lat: Optional[float] = None,
+    ne_lng: Optional[float] = None,
+    since_hours: Optional[int] = 24,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None
+):
+    """Explain the /events and route queries: index used, keys examined vs documents returned."""
+    try:
+        bbox = None
+        if all(x is not None for x in [sw_lat, sw_lng, ne_lat, ne_lng]):
+            bbox = {
+                "sw": {"lat": sw_lat, "lng": sw_lng},
+                "ne": {"lat": ne_lat, "lng": ne_lng}
+            }
+        point = {"lat": lat, "lng": lng} if lat is not None and lng is not None else None
+        
+        return await db.explain_queries(bbox=bbox, since_hours=since_hours, point=point)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Explain failed: {str(e)}")
+
+
+@router.get("/stats")
+async def get_stats(
+    view: str = "timeseries",
+    since_hours: int = 168,
+    cell: Optional[str] = None,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    precision: int = GEOHASH_PRECISION,
+    event_type: Optional[str] = None,
+    bucket: str = "hour",
+    group_by: str = "cell",
+    limit: int = 10
+):
+    """
+    Incident trends from the hourly rollups.
+
+    view=timeseries: count, average severity and max score per hour or day.
+    view=top: the top `limit` geohash cells (at `precision`) or event types.
+    The area is a geohash `cell`, or the cell of `precision` around lat/lng.
+    """
+    if view not in ("timeseries", "top") or bucket not in ("hour", "day") or group_by not in ("cell", "event_type"):
+        raise HTTPException(status_code=400, detail="view must be timeseries|top, bucket hour|day, group_by cell|event_type")
+    if lat is not None and lng is not None:
+        cell = geohash(lat, lng, min(precision, GEOHASH_PRECISION))
+    if cell and any(ch not in GEOHASH_ALPHABET for ch in cell):
+        raise HTTPException(status_code=400, detail="cell must be a geohash")
+    
+    try:
+        since = datetime.utcnow() - timedelta(hours=since_hours)
+        match = stats_match(since, cell=cell, event_type=event_type)
+        if view == "timeseries":
+            pipeline = timeseries_pipeline(match, bucket)
+        else:
+            pipeline = top_pipeline(match, group_by, min(precision, GEOHASH_PRECISION), max(1, min(limit, 1000)))
+        
+        results = await db.aggregate_rollups(pipeline)
+        return {"view": view, "cell": cell, "since": since.isoformat(), "results": results}
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Stats query failed: {str(e)}")
+
+
+@router.get("/events")
+async def get_events(
+    sw_lat: Optional[float] = None,
+    sw_lng: Optional[float] = None,
+    ne_lat: Optional[float] = None,
+    ne_lng: Optional[float] = None,
+    since_hours: Optional[int] = 24
+):
+    """Get safety events within bounding box and time window."""
+    try:
+        bbox = None
+        if all(x is not None for x in [sw_lat, sw_lng, ne_lat, ne_lng]):
+            bbox = {
+                "sw": {"lat": sw_lat, "lng": sw_lng},
+                "ne": {"lat": ne_lat, "lng": ne_lng}
+            }
+        
+        # Multi-worker serving: answer from the shared snapshot when it covers the window
+        snapshot = get_snapshot()
+        if snapshot is not None and snapshot.covers(since_hours):
+            rows = snapshot.query(bbox=bbox, since_hours=since_hours, limit=QUERY_LIMIT)
+            return Response(content=snapshot.events_json(rows), media_type="application/json")
+        
+        events = await db.query_events(bbox=bbox, since_hours=since_hours, projection=EVENT_MAP_PROJECTION)
+        
+        # Format for frontend
+        formatted_events = []
+        for event in events:
+            coords = event.get("coordinates", {})
+            formatted_events.append({
+                "_id": event.get("_id"),
+                "source": event.get("source", ""),
+                "title": event.get("title", ""),
+                "text": event.get("text", "")[:200],  # Truncate for response
+                "timestamp": event.get("timestamp"),
+                "coordinates": {
+                    "lat": coords.get("lat") if isinstance(coords, dict) else None,
+                    "lng": coords.get("lng") if isinstance(coords, dict) else None
+                },
+                "safety_score": event.get("safety_score", 0),
+                "event_type": event.get("event_type", "other"),
+                "severity": event.get("severity", 5),
+                "report_count": event.get("report_count", 1)
+            })
+        
+        return {"events": formatted_events, "count": len(formatted_events)}
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+
+
+async def nearby_route_events(sample_points) -> EventColumns:
+    """Events within 50 m of any sample point, from the snapshot or Mongo."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        with stage("route", "nearby_events"):
+            return snapshot.columns(snapshot.near(sample_points, radius_meters=ROUTE_RISK_RADIUS_METERS))
+    
+    # A few box queries along the route instead of one $near per sample point;
+    # boxes of consecutive samples stay small even on long diagonal routes
+    points = np.asarray(sample_points, dtype=np.float64).reshape(-1, 2)
+    segments = [points[i:i + ROUTE_LOOKUP_SEGMENT_POINTS] for i in range(0, len(points), ROUTE_LOOKUP_SEGMENT_POINTS)]
+    with stage("route", "nearby_events"):
+        results = await asyncio.gather(*(
+            db.risk_events(route_envelope(segment, ROUTE_RISK_RADIUS_METERS), since_hours=HOT_RETENTION_HOURS)
+            for segment in segments
+        ))
+    
+    # Remove duplicates (boxes overlap at segment ends), then keep events in range
+    seen_ids = set()
+    unique_events = []
+    for event in (event for events in results for event in events):
+        event_id = event.get("_id")
+        if event_id and event_id not in seen_ids:
+            seen_ids.add(event_id)
+            unique_events.append(event)
+    return await asyncio.to_thread(
+        events_near, points, EventColumns.from_docs(unique_events), ROUTE_RISK_RADIUS_METERS
+    )
+
+
+def route_envelope(points: np.ndarray, radius_meters: float) -> Dict[str, Dict[str, float]]:
+    """Bounding box of the points, padded by radius_meters."""
+    south, west = points.min(axis=0)
+    north, east = points.max(axis=0)
+    dlat = radius_meters / 111320.0
+    dlng = dlat / max(math.cos(math.radians(max(abs(south), abs(north)))), 0.01)
+    return {"sw": {"lat": float(south) - dlat, "lng": float(west) - dlng},
+            "ne": {"lat": float(north) + dlat, "lng": float(east) + dlng}}
+
+
+async def local_route(start: Dict[str, float], end: Dict[str, float], mode: str,
+                      alpha: float, beta: float) -> Optional[Dict[str, Any]]:
+    """The best route on the local road graph for these weights; None when the graph cannot route it."""
+    graph = get_road_graph(mode)
+    if graph is None:
+        return None
+    
+    try:
+        with stage("route", "edge_risk"):
+            await sync_edge_risk(graph)
+    except Exception as e:
+        # Route on the last known risk rather than not at all
+        print(f"Edge risk refresh failed: {e}")
+    with stage("route", "local_search"):
+        path = await asyncio.to_thread(graph.shortest_path, start, end, alpha, beta)
+    if path is None or len(path["coordinates"]) < 2:
+        return None
+    
+    encoded_polyline = encode_polyline(path["coordinates"])
+    route_coordinates = simplify_polyline(path["coordinates"], ROUTE_SIMPLIFY_METERS)
+    sample_points = resample_polyline(route_coordinates, ROUTE_SAMPLE_METERS, ROUTE_MAX_SAMPLES)
+    unique_events = await nearby_route_events(sample_points)
+    with stage("route", "risk"):
+        aggregate_risk, event_count = await asyncio.to_thread(
+            compute_route_risk, sample_points, unique_events, radius_meters=ROUTE_RISK_RADIUS_METERS, sample=False
+        )
+    
+    distance_meters = path["distance_meters"]
+    duration_seconds = distance_meters / SPEEDS.get(mode, SPEEDS["driving"])
+    first, last = route_coordinates[0], route_coordinates[-1]
+    # Shaped like a Directions route, so clients read both the same way
+    route = {
+        "summary": "local",
+        "legs": [{
+            "distance": {"value": round(distance_meters)},
+            "duration": {"value": round(duration_seconds)},
+            "start_location": {"lat": float(first[0]), "lng": float(first[1])},
+            "end_location": {"lat": float(last[0]), "lng": float(last[1])}
+        }],
+        "overview_polyline": {"points": encoded_polyline}
+    }
+    return {
+        "route": route,
+        "distance_meters": distance_meters,
+        "duration_seconds": duration_seconds,
+        "aggregate_risk": aggregate_risk,
+        "event_count": event_count,
+        "polyline": encoded_polyline
+    }
+
+
+def directions_key(start: Dict[str, float], end: Dict[str, float], mode: str) -> tuple:
+    """Trips whose ends round to the same ~100 m cells share cached routes."""
+    return (round(start["lat"], 3), round(start["lng"], 3), round(end["lat"], 3), round(end["lng"], 3), mode)
+
+
+def cache_directions(key: tuple, routes: List[Dict[str, Any]]):
+    _directions_cache[key] = (time.monotonic(), routes)
+    _directions_cache.move_to_end(key)
+    while len(_directions_cache) > DIRECTIONS_CACHE_SIZE:
+        _directions_cache.popitem(last=False)
+
+
+def cached_directions(key: tuple) -> Optional[List[Dict[str, Any]]]:
+    """Routes Directions returned for this trip within DIRECTIONS_CACHE_SECONDS, if any."""
+    cached = _directions_cache.get(key)
+    if cached is None or time.monotonic() - cached[0] > DIRECTIONS_CACHE_SECONDS:
+        return None
+    return cached[1]
+
+
+@router.post("/route", response_model=RouteResponse)
+async def get_route(request: RouteRequest):
+    """Get route with safety analysis."""
+    if request.provider not in ROUTE_PROVIDERS:
+        raise HTTPException(status_code=400, detail=f"provider must be one of {', '.join(ROUTE_PROVIDERS)}")
+    
+    try:
+        start = request.start
+        end = request.end
+        mode = request.mode
+        preference = request.preference
+        alpha = request.alpha
+        beta = request.beta
+        
+        # Normalize weights
+        total_weight = alpha + beta
+        if total_weight > 0:
+            alpha = alpha / total_weight
+            beta = beta / total_weight
+        else:
+            alpha = 0.5
+            beta = 0.5
+        
+        if request.provider != "google":
+            # The local graph finds the single best route for the weights directly
+            weights = (1.0, 0.0) if preference == "fastest" else (alpha, beta)
+            selected_route = await local_route(start, end, mode, *weights)
+            if selected_route is not None:
+                return RouteResponse(preference=preference, **selected_route)
+            if request.provider == "local":
+                raise HTTPException(status_code=400, detail=f"No local road graph route for mode {mode}")
+        
+        api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+        if not api_key:
+            raise HTTPException(status_code=500, detail="GOOGLE_MAPS_API_KEY not configured")
+        
+        # Call Google Directions API (requests is only imported by replicas that route)
+        from .geocode import fetch_json, maps_api_url
+        directions_url = maps_api_url("directions")
+        params = {
+            "origin": f"{start['lat']},{start['lng']}",
+            "destination": f"{end['lat']},{end['lng']}",
+            "mode": mode,
+            "alternatives": "true",  # Get alternative routes
+            "key": api_key
+        }
+        
+        cache_key = directions_key(start, end, mode)
+        try:
+            with stage("route", "directions"):
+                data = await get_upstream("google_directions", DIRECTIONS_TIMEOUT_SECONDS).call(
+                    lambda timeout: fetch_json(directions_url, params, timeout)
+                )
+        except Exception as e:
+            # Directions is down, slow or short-circuited: recent routes for the
+            # same trip, else the local road graph, else give up
+            routes_data = cached_directions(cache_key)
+            if routes_data is not None:
+                UPSTREAM_FALLBACKS.labels("google_directions", "cached_route").inc()
+            else:
+                weights = (1.0, 0.0) if preference == "fastest" else (alpha, beta)
+                selected_route = await local_route(start, end, mode, *weights) if request.provider == "google" else None
+                if selected_route is None:
+                    UPSTREAM_FALLBACKS.labels("google_directions", "none").inc()
+                    raise HTTPException(status_code=503, detail=f"Directions unavailable: {e}")
+                UPSTREAM_FALLBACKS.labels("google_directions", "local_route").inc()
+                return RouteResponse(preference=preference, **selected_route)
+        else:
+            if data.get("status") != "OK" or not data.get("routes"):
+                raise HTTPException(status_code=400, detail=f"Directions API error: {data.get('status')}")
+            routes_data = data["routes"]
+            cache_directions(cache_key, routes_data)
+        
+        # Process each route
+        processed_routes = []
+        
+        for route in routes_data:
+            leg = route["legs"][0]
+            distance_meters = leg["distance"]["value"]
+            duration_seconds = leg["duration"]["value"]
+            
+            # Decode polyline; only the simplified shape is kept for scoring
+            encoded_polyline = route["overview_polyline"]["points"]
+            with stage("route", "decode"):
+                route_coordinates = simplify_polyline(decode_polyline(encoded_polyline), ROUTE_SIMPLIFY_METERS)
+            
+            # Find nearby events at evenly spaced points along the route
+            sample_points = resample_polyline(route_coordinates, ROUTE_SAMPLE_METERS, ROUTE_MAX_SAMPLES)
+            unique_events = await nearby_route_events(sample_points)
+            
+            # Compute aggregate risk
+            with stage("route", "risk"):
+                aggregate_risk, event_count = await asyncio.to_thread(
+                    compute_route_risk,
+                    sample_points,
+                    unique_events,
+                    radius_meters=ROUTE_RISK_RADIUS_METERS,
+                    sample=False
+                )
+            
+            processed_routes.append({
+                "route": route,
+                "distance_meters": distance_meters,
+                "duration_seconds": duration_seconds,
+                "aggregate_risk": aggregate_risk,
+                "event_count": event_count,
+                "polyline": encoded_polyline
+            })
+        
+        # Normalize metrics
+        processed_routes = normalize_route_metrics(processed_routes)
+        
+        # Select route based on preference
+        if preference == "fastest":
+            # Choose route with shortest duration
+            selected_route = min(processed_routes, key=lambda r: r["duration_seconds"])
+        else:  # safest
+            # Choose route minimizing alpha*norm_distance + beta*norm_risk
+            selected_route = min(
+                processed_routes,
+                key=lambda r: alpha * r.get("normalized_distance", 0) + beta * r.get("normalized_risk", 0)
+            )
+        
+        return RouteResponse(
+            route=selected_route["route"],
+            distance_meters=selected_route["distance_meters"],
+            duration_seconds=selected_route["duration_seconds"],
+            aggregate_risk=selected_route["aggregate_risk"],
+            event_count=selected_route["event_count"],
+            preference=preference,
+            polyline=selected_route["polyline"]
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Route calculation failed: {str(e)}")
+
+
+def create_app() -> FastAPI:
+    """FastAPI app serving the read endpoints; app.main adds ingest and admin endpoints to its own."""
+    app = FastAPI(title="Urban Pulse API", version="1.0.0")
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # In production, specify frontend URL
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Request latency per endpoint, exported on /metrics
+    app.add_middleware(MetricsMiddleware)
+
+    # Sampled/on-demand request profiles (PROFILE_SAMPLE_RATE, PROFILE_TOKEN)
+    app.add_middleware(ProfilingMiddleware)
+
+    # Upstream calls made while serving a request share its deadline
+    app.add_middleware(DeadlineMiddleware)
+
+    app.add_event_handler("startup", startup_event)
+    app.add_event_handler("shutdown", shutdown_event)
+    app.include_router(router)
+    return app
+
+
+app = create_app()
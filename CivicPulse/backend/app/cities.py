@@ -0,0 +1,181 @@
+"""Cities served by one deployment, each with its own sources, gazetteer, area and database.
+
+CITIES_FILE is a JSON list of cities:
+
+    [{"name": "nyc",
+      "mongo_uri": "mongodb://nyc-db:27017/urbanpulse_nyc",
+      "rss_feeds": ["https://www.nyc.gov/rss/feeds/cityhall.rss"],
+      "subreddits": ["nyc"],
+      "blotter_urls": [],
+      "gazetteer": "data/gazetteer/nyc.csv",
+      "area": [[-74.26, 40.49], [-73.69, 40.49], [-73.69, 40.92], [-74.26, 40.92]]},
+     ...]
+
+area is the service-area polygon as [lng, lat] pairs; a city without one
+covers everywhere. mongo_uri defaults to MONGO_URI and database to the
+database named in the city's own mongo_uri, else urbanpulse_<name>, so
+cities sharing a cluster still get a database each. Without CITIES_FILE
+there is a single city configured by the environment as before (MONGO_URI,
+INGEST_RSS_FEEDS, INGEST_SUBREDDITS, INGEST_BLOTTER_URLS, GAZETTEER_PATH).
+
+CITY names the city this process ingests and maintains (the first one by
+default), so each city's ingest worker can run on its own node next to its
+own MongoDB. Reads fan out: app/db.py sends /events and /route queries only
+to the cities whose area intersects the request's box.
+"""
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .gazetteer import GAZETTEER_PATH
+
+
+CITIES_FILE = os.getenv("CITIES_FILE")
+DEFAULT_MONGO_URI = "mongodb://mongo:27017/urbanpulse"
+DEFAULT_RSS_FEEDS = [
+    "https://www.nyc.gov/rss/feeds/cityhall.rss",
+    "https://www1.nyc.gov/nyc-resources/feeds/all.rss",
+]
+DEFAULT_SUBREDDITS = ["nyc"]
+
+
+def _env_list(name: str, default: List[str]) -> List[str]:
+    """Read a comma-separated list from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def uri_database(mongo_uri: str) -> Optional[str]:
+    """Database named in a MongoDB URI path, if any."""
+    path = mongo_uri.split("://", 1)[-1].partition("/")[2].split("?", 1)[0]
+    return path or None
+
+
+@dataclass
+class City:
+    name: str
+    mongo_uri: Optional[str] = None
+    database: Optional[str] = None
+    rss_feeds: List[str] = field(default_factory=list)
+    subreddits: List[str] = field(default_factory=list)
+    blotter_urls: List[str] = field(default_factory=list)
+    gazetteer: Optional[str] = None
+    area: Optional[List[Tuple[float, float]]] = None  # [lng, lat] ring; None covers everywhere
+
+    def __post_init__(self):
+        if not self.database:
+            self.database = (uri_database(self.mongo_uri) if self.mongo_uri else None) or f"urbanpulse_{self.name}"
+        self.mongo_uri = self.mongo_uri or os.getenv("MONGO_URI", DEFAULT_MONGO_URI)
+        if self.area is not None:
+            self.area = [(float(lng), float(lat)) for lng, lat in self.area]
+            if len(self.area) < 3:
+                raise ValueError(f"City {self.name}: area needs at least 3 points")
+
+    @property
+    def envelope(self) -> Optional[Tuple[float, float, float, float]]:
+        """(min_lat, min_lng, max_lat, max_lng) of the area; None when unbounded."""
+        if self.area is None:
+            return None
+        lngs, lats = zip(*self.area)
+        return min(lats), min(lngs), max(lats), max(lngs)
+
+    def contains(self, lat: float, lng: float) -> bool:
+        """Whether a point lies in the service area (ray casting)."""
+        if self.area is None:
+            return True
+        inside = False
+        previous = self.area[-1]
+        for point in self.area:
+            (x1, y1), (x2, y2) = previous, point
+            if (y1 > lat) != (y2 > lat) and lng < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+            previous = point
+        return inside
+
+    def intersects(self, bbox: Optional[Dict[str, Dict[str, float]]]) -> bool:
+        """Whether the area and a {"sw": .., "ne": ..} box overlap; no box means everywhere."""
+        if self.area is None or bbox is None:
+            return True
+        south, west = bbox["sw"]["lat"], bbox["sw"]["lng"]
+        north, east = bbox["ne"]["lat"], bbox["ne"]["lng"]
+        min_lat, min_lng, max_lat, max_lng = self.envelope
+        if south > max_lat or north < min_lat or west > max_lng or east < min_lng:
+            return False
+        # Overlapping envelopes: a vertex of one inside the other, or crossing edges
+        if any(west <= lng <= east and south <= lat <= north for lng, lat in self.area):
+            return True
+        corners = [(west, south), (east, south), (east, north), (west, north)]
+        if any(self.contains(lat, lng) for lng, lat in corners):
+            return True
+        box_edges = list(zip(corners, corners[1:] + corners[:1]))
+        area_edges = list(zip(self.area, self.area[1:] + self.area[:1]))
+        return any(_segments_cross(a, b, c, d) for a, b in area_edges for c, d in box_edges)
+
+    def bounds(self) -> Optional[str]:
+        """The envelope as a Google geocoding bounds bias ("south,west|north,east")."""
+        if self.area is None:
+            return None
+        min_lat, min_lng, max_lat, max_lng = self.envelope
+        return f"{min_lat},{min_lng}|{max_lat},{max_lng}"
+
+
+def _segments_cross(a, b, c, d) -> bool:
+    def side(p, q, r):
+        return (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+    return side(a, b, c) * side(a, b, d) < 0 and side(c, d, a) * side(c, d, b) < 0
+
+
+def default_city() -> City:
+    """The single city of a deployment without CITIES_FILE, configured by the environment."""
+    mongo_uri = os.getenv("MONGO_URI", DEFAULT_MONGO_URI)
+    return City(
+        name=os.getenv("CITY", "default"),
+        mongo_uri=mongo_uri,
+        database=uri_database(mongo_uri) or "urbanpulse",
+        rss_feeds=_env_list("INGEST_RSS_FEEDS", DEFAULT_RSS_FEEDS),
+        subreddits=_env_list("INGEST_SUBREDDITS", DEFAULT_SUBREDDITS),
+        blotter_urls=_env_list("INGEST_BLOTTER_URLS", []),
+        gazetteer=GAZETTEER_PATH,
+    )
+
+
+def load_cities(path: str) -> List[City]:
+    with open(path) as f:
+        entries: List[Dict[str, Any]] = json.load(f)
+    cities = [City(**entry) for entry in entries]
+    names = [city.name for city in cities]
+    if not cities or len(set(names)) != len(names):
+        raise ValueError(f"{path}: expected a non-empty list of uniquely named cities")
+    return cities
+
+
+_cities: Optional[List[City]] = None
+
+
+def get_cities() -> List[City]:
+    """Every configured city, loaded once."""
+    global _cities
+    if _cities is None:
+        _cities = load_cities(CITIES_FILE) if CITIES_FILE else [default_city()]
+        print(f"Serving cities: {', '.join(city.name for city in _cities)}")
+    return _cities
+
+
+def get_city(name: Optional[str] = None) -> City:
+    """A city by name; without a name, CITY or else the first configured city."""
+    cities = get_cities()
+    name = name or os.getenv("CITY")
+    if name is None:
+        return cities[0]
+    for city in cities:
+        if city.name == name:
+            return city
+    raise ValueError(f"Unknown city {name!r}; configured: {', '.join(city.name for city in cities)}")
+
+
+def cities_for_bbox(bbox: Optional[Dict[str, Dict[str, float]]] = None) -> List[City]:
+    """Cities whose area intersects bbox (every city when bbox is None)."""
+    return [city for city in get_cities() if city.intersects(bbox)]
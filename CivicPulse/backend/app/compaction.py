@@ -0,0 +1,135 @@
+"""Text normalization and token budgeting for article text sent to the LLM.
+
+Feed entries repeat themselves (title, summary and description are often the
+same sentences) and carry raw HTML. clean_text() strips markup and drops
+repeated segments and sentences when the scraper assembles an article;
+fit_token_budget() then cuts the prompt text to LLM_TEXT_TOKEN_BUDGET,
+keeping the sentences most likely to name a location or describe the
+incident, in their original order.
+
+Token counts are estimated at CHARS_PER_TOKEN characters per token, the same
+estimate the LLM client uses for its tokens/minute budget.
+"""
+import html
+import os
+import re
+from typing import Iterable, List, Optional
+
+from .keywords import SAFETY_KEYWORDS
+from .llm_client import CHARS_PER_TOKEN
+from .metrics import PROMPT_TOKENS_SAVED
+
+
+TEXT_TOKEN_BUDGET = int(os.getenv("LLM_TEXT_TOKEN_BUDGET", "250"))
+
+SCRIPT_STYLE = re.compile(r"<(script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+BLOCK_TAG = re.compile(r"<\s*(?:br|/p|/div|/li|/h\d|/tr)\b[^>]*>", re.IGNORECASE)
+TAG = re.compile(r"<[^>]+>")
+SPACES = re.compile(r"[ \t\r\f\v ]+")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])|\n+")
+WORD = re.compile(r"[a-z0-9]+")
+
+# Signals that a sentence says where something happened
+LOCATION_HINT = re.compile(
+    r"\b(?:street|st|avenue|ave|road|rd|boulevard|blvd|drive|dr|lane|place|plaza|square|park|bridge|"
+    r"highway|expressway|parkway|station|block|intersection|corner|borough|neighborhood)\b\.?"
+    r"|\b(?:at|near|on|in|outside|between)\s+[A-Z][a-z]+"
+    r"|\b\d+(?:st|nd|rd|th)\b",
+    re.IGNORECASE
+)
+TIME_HINT = re.compile(r"\b(?:\d{1,2}(?::\d{2})?\s*(?:a\.?m\.?|p\.?m\.?)|morning|afternoon|evening|night|"
+                       r"overnight|today|yesterday|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b",
+                       re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def strip_html(text: str) -> str:
+    """Plain text from an HTML fragment; block-level tags become line breaks."""
+    if "<" in text:
+        text = SCRIPT_STYLE.sub(" ", text)
+        text = BLOCK_TAG.sub("\n", text)
+        text = TAG.sub(" ", text)
+    if "&" in text:
+        text = html.unescape(text)
+    lines = (SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in SENTENCE_END.split(text) if s and s.strip()]
+
+
+def _fingerprint(sentence: str) -> str:
+    return " ".join(WORD.findall(sentence.lower()))
+
+
+def clean_text(segments: Iterable[Optional[str]]) -> str:
+    """
+    Join article segments (title, summary, description) as plain, de-duplicated text.
+
+    A sentence is dropped when the same words already appeared in an earlier
+    sentence, so a summary that repeats the title, or a description that
+    repeats the summary, costs nothing.
+    """
+    raw_tokens = 0
+    kept: List[str] = []
+    seen: List[str] = []
+    for segment in segments:
+        if not segment:
+            continue
+        raw_tokens += estimate_tokens(segment)
+        for sentence in split_sentences(strip_html(segment)):
+            fingerprint = f" {_fingerprint(sentence)} "
+            if not fingerprint.strip() or any(fingerprint in earlier for earlier in seen):
+                continue
+            # A longer restatement replaces the shorter sentence it contains
+            for i, earlier in enumerate(seen):
+                if earlier and earlier in fingerprint:
+                    seen[i], kept[i] = "", ""
+            seen.append(fingerprint)
+            kept.append(sentence)
+    text = "\n".join(sentence for sentence in kept if sentence)
+    PROMPT_TOKENS_SAVED.labels("cleanup").inc(max(0, raw_tokens - estimate_tokens(text)))
+    return text
+
+
+def sentence_score(sentence: str, position: int) -> float:
+    """How likely a sentence is to carry the location and incident details."""
+    score = 0.0
+    if LOCATION_HINT.search(sentence):
+        score += 2.0
+    if SAFETY_KEYWORDS.match(sentence):
+        score += 2.0
+    if TIME_HINT.search(sentence):
+        score += 0.5
+    # News ledes put the who/what/where first
+    score += 1.5 / (1 + position)
+    return score
+
+
+def fit_token_budget(text: str, token_budget: Optional[int] = None) -> str:
+    """Keep the highest-scoring sentences that fit the budget, in original order."""
+    if token_budget is None:
+        token_budget = TEXT_TOKEN_BUDGET
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    sentences = split_sentences(text)
+    ranked = sorted(range(len(sentences)), key=lambda i: sentence_score(sentences[i], i), reverse=True)
+    chosen, used = set(), 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost <= token_budget:
+            chosen.add(i)
+            used += cost
+
+    if chosen:
+        fitted = "\n".join(sentences[i] for i in sorted(chosen))
+    else:
+        # Not even one sentence fits: fall back to the head of the best one
+        fitted = sentences[ranked[0]][:token_budget * CHARS_PER_TOKEN] if sentences else ""
+    PROMPT_TOKENS_SAVED.labels("budget").inc(estimate_tokens(text) - estimate_tokens(fitted))
+    return fitted
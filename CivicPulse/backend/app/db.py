@@ -1,123 +1,619 @@
-"""MongoDB database connection and operations."""
+"""MongoDB database connection and operations.
+
+Each city (app/cities.py) has its own database, possibly on its own
+cluster. The module-level db is this process's city, which ingest writes
+and maintenance jobs use; /events, /route and snapshot reads go through its
+routing layer, which queries only the city shards whose service area
+intersects the request's box, concurrently, and concatenates the results.
+"""
+import asyncio
+import hashlib
+import json
+import math
 import os
+import random
+import time
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import ConnectionFailure
+from pymongo import ReplaceOne, UpdateOne, read_preferences
+from pymongo.errors import BulkWriteError, CollectionInvalid, ConnectionFailure, OperationFailure, PyMongoError
+from pymongo.write_concern import WriteConcern
+
+from .cities import City, cities_for_bbox, get_city
+from .metrics import CITY_SHARD_QUERIES, PoolMetricsListener
+
+
+# Connection pool and routing. Map and route reads use MONGO_READ_PREFERENCE
+# (e.g. secondaryPreferred with a staleness bound); ingest writes use
+# MONGO_WRITE_CONCERN.
+MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "-1"))
+WRITE_CONCERN = os.getenv("MONGO_WRITE_CONCERN", "1")
+WRITE_TIMEOUT_MS = int(os.getenv("MONGO_WRITE_TIMEOUT_MS", "0"))
+CONNECT_RETRIES = int(os.getenv("MONGO_CONNECT_RETRIES", "5"))
+CONNECT_BACKOFF_SECONDS = float(os.getenv("MONGO_CONNECT_BACKOFF_SECONDS", "0.5"))
+CONNECT_BACKOFF_MAX_SECONDS = float(os.getenv("MONGO_CONNECT_BACKOFF_MAX_SECONDS", "30"))
+
+
+# Event lifecycle: recent events live in the hot `events` collection, older ones
+# are moved in bulk to a compressed `events_archive` collection that expires
+# documents via a TTL index.
+HOT_RETENTION_HOURS = int(os.getenv("EVENTS_HOT_RETENTION_HOURS", "72"))
+ARCHIVE_RETENTION_DAYS = int(os.getenv("EVENTS_ARCHIVE_RETENTION_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("EVENTS_ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_COLLECTION = "events_archive"
+ROLLUP_COLLECTION = "event_rollups"
+QUERY_LIMIT = 10000  # Limit for safety
+
+# Managed indexes, shaped after the real queries: /events filters on time and
+# bbox together, route scoring runs $near on coordinates alone. connect()
+# (re)creates them and drops the retired ones whenever index_fingerprint()
+# changes, which covers env-derived options such as the archive TTL as well
+# as edits here (INDEX_VERSION is reported by /admin/explain). Geo indexes
+# cannot cover a query, so map reads rely on EVENT_MAP_PROJECTION to keep
+# documents small instead.
+INDEX_VERSION = 3
+EVENT_INDEXES = [
+    {"name": "timestamp_geo", "keys": [("timestamp", -1), ("coordinates", "2dsphere")]},
+    {"name": "geo_timestamp", "keys": [("coordinates", "2dsphere"), ("timestamp", -1)]},
+    {"name": "timestamp", "keys": [("timestamp", -1)]},
+    {"name": "source_timestamp", "keys": [("source", 1), ("timestamp", -1)]},
+]
+ARCHIVE_INDEXES = [
+    {"name": "timestamp_geo", "keys": [("timestamp", -1), ("coordinates", "2dsphere")]},
+    {"name": "geo_timestamp", "keys": [("coordinates", "2dsphere"), ("timestamp", -1)]},
+    {"name": "timestamp_ttl", "keys": [("timestamp", -1)],
+     "options": {"expireAfterSeconds": ARCHIVE_RETENTION_DAYS * 86400} if ARCHIVE_RETENTION_DAYS > 0 else {}},
+]
+# Hourly rollups (app/rollups.py): /stats filters on hour, optionally on a cell prefix
+ROLLUP_INDEXES = [
+    {"name": "hour", "keys": [("hour", 1)]},
+    {"name": "cell_hour", "keys": [("cell", 1), ("hour", 1)]},
+]
+# Indexes created by earlier versions of connect()
+RETIRED_INDEXES = ["coordinates_2dsphere", "timestamp_-1", "source_1"]
+
+# Fields the map needs from /events; text is trimmed server-side
+EVENT_MAP_PROJECTION = {
+    "source": 1,
+    "title": 1,
+    "text": {"$substrCP": ["$text", 0, 200]},
+    "timestamp": 1,
+    "coordinates.lat": 1,
+    "coordinates.lng": 1,
+    "safety_score": 1,
+    "event_type": 1,
+    "severity": 1,
+    "report_count": 1,
+}
+
+# Fields route scoring needs to build EventColumns
+EVENT_RISK_PROJECTION = {
+    "title": 1,
+    "text": 1,
+    "timestamp": 1,
+    "coordinates.lat": 1,
+    "coordinates.lng": 1,
+    "severity": 1,
+    "event_type": 1,
+}
+
+# Fields a serving snapshot needs for both /events and route scoring
+SNAPSHOT_PROJECTION = {
+    "source": 1,
+    "title": 1,
+    "text": 1,
+    "timestamp": 1,
+    "coordinates.lat": 1,
+    "coordinates.lng": 1,
+    "safety_score": 1,
+    "event_type": 1,
+    "severity": 1,
+    "report_count": 1,
+}
+
+# Fields incident merging (and its rollup update) needs from the matched event
+INCIDENT_MERGE_PROJECTION = {
+    "source": 1,
+    "url": 1,
+    "title": 1,
+    "text": 1,
+    "timestamp": 1,
+    "coordinates.lat": 1,
+    "coordinates.lng": 1,
+    "event_type": 1,
+    "severity": 1,
+    "report_count": 1,
+    "sources.url": 1,
+    "sources.key": 1,
+}
 
 
 class Database:
-    def __init__(self):
+    def __init__(self, city: Optional[str] = None):
+        self.city_name = city  # None: CITY, or the first configured city
         self.client: Optional[AsyncIOMotorClient] = None
         self.db = None
-        self.collection = None
+        self.collection = None  # Writes, with the configured write concern
+        self.archive = None
+        self.read_collection = None  # Map/route reads, with the configured read preference
+        self.read_archive = None
+        self.rollups = None
+        self.read_rollups = None
+        self._connect_lock = asyncio.Lock()
+        self._connect_failures = 0
+        self._retry_at = 0.0
+        self._shards: Dict[str, "Database"] = {}
+
+    @property
+    def city(self) -> City:
+        return get_city(self.city_name)
+
+    async def connect(self, retries: int = CONNECT_RETRIES):
+        """Connect to MongoDB, retrying with exponential backoff."""
+        for attempt in range(1, retries + 1):
+            try:
+                await self._open()
+                self._connect_failures = 0
+                return
+            except PyMongoError as e:
+                # Server selection timeouts and auth/command failures back off too
+                print(f"MongoDB connection failed (attempt {attempt}/{retries}): {e}")
+                if attempt == retries:
+                    raise
+                await asyncio.sleep(_backoff_delay(attempt))
 
-    async def connect(self):
-        """Connect to MongoDB."""
-        mongo_uri = os.getenv("MONGO_URI", "mongodb://mongo:27017/urbanpulse")
+    async def _open(self):
+        """Open the client, verify it, and set up collections and indexes."""
+        city = self.city
+        mongo_uri = city.mongo_uri
+        client = AsyncIOMotorClient(
+            mongo_uri,
+            maxPoolSize=MAX_POOL_SIZE,
+            minPoolSize=MIN_POOL_SIZE,
+            waitQueueTimeoutMS=WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=[PoolMetricsListener()]
+        )
         try:
-            self.client = AsyncIOMotorClient(mongo_uri)
             # Test connection
-            await self.client.admin.command('ping')
-            db_name = mongo_uri.split('/')[-1] if '/' in mongo_uri else "urbanpulse"
-            self.db = self.client[db_name]
-            self.collection = self.db.events
-            # Create indexes
-            # Note: 2dsphere index requires GeoJSON format: {type: "Point", coordinates: [lng, lat]}
-            try:
-                await self.collection.create_index([("coordinates", "2dsphere")])
-            except Exception as e:
-                print(f"Warning: Could not create 2dsphere index: {e}")
-            await self.collection.create_index([("timestamp", -1)])
-            await self.collection.create_index([("source", 1)])
-            print(f"Connected to MongoDB: {db_name}")
-        except ConnectionFailure as e:
-            print(f"MongoDB connection failed: {e}")
+            await client.admin.command('ping')
+            db_name = city.database
+            self.client = client
+            self.db = client[db_name]
+            self.collection = self.db.get_collection("events", write_concern=_write_concern())
+            self.rollups = self.db.get_collection(ROLLUP_COLLECTION, write_concern=_write_concern())
+            await self._setup_archive()
+            await self.ensure_indexes()
+        except Exception:
+            client.close()
+            self.collection = None
+            self.read_collection = None
             raise
 
+        read_preference = _read_preference()
+        self.read_collection = self.collection.with_options(read_preference=read_preference)
+        self.read_archive = self.archive.with_options(read_preference=read_preference)
+        self.read_rollups = self.rollups.with_options(read_preference=read_preference)
+        print(f"Connected to MongoDB for {city.name}: {db_name} (reads: {READ_PREFERENCE}, writes: w={WRITE_CONCERN})")
+
+    async def _ensure_connected(self):
+        """
+        Connect lazily, at most once at a time.
+
+        After a failed attempt further calls fail fast until the backoff
+        delay has passed, so a down database does not cause a reconnect storm.
+        """
+        # read_collection is assigned last in _open(), so it marks a usable connection
+        if self.read_collection is not None:
+            return
+        async with self._connect_lock:
+            if self.read_collection is not None:
+                return
+            wait = self._retry_at - time.monotonic()
+            if wait > 0:
+                raise ConnectionFailure(f"MongoDB unavailable, next reconnect attempt in {wait:.1f}s")
+            try:
+                await self._open()
+                self._connect_failures = 0
+            except PyMongoError:
+                self._connect_failures += 1
+                self._retry_at = time.monotonic() + _backoff_delay(self._connect_failures)
+                raise
+
+    async def _setup_archive(self):
+        """Create the compressed archive collection."""
+        if ARCHIVE_COLLECTION not in await self.db.list_collection_names():
+            try:
+                await self.db.create_collection(
+                    ARCHIVE_COLLECTION,
+                    storageEngine={"wiredTiger": {"configString": "block_compressor=zstd"}}
+                )
+            except CollectionInvalid:
+                pass  # Created concurrently by another worker
+        self.archive = self.db.get_collection(ARCHIVE_COLLECTION, write_concern=_write_concern())
+
+    async def ensure_indexes(self, force: bool = False) -> bool:
+        """
+        Bring managed indexes in line with the current specs.
+
+        Safe to run repeatedly and from several workers at once. Returns True
+        if any index work was done.
+        """
+        meta = self.db.schema_meta
+        state = await meta.find_one({"_id": "event_indexes"})
+        fingerprint = index_fingerprint()
+        if not force and state and state.get("fingerprint") == fingerprint:
+            return False
+
+        # Note: 2dsphere indexes require GeoJSON format: {type: "Point", coordinates: [lng, lat]}
+        managed = ((self.collection, EVENT_INDEXES), (self.archive, ARCHIVE_INDEXES), (self.rollups, ROLLUP_INDEXES))
+        for collection, specs in managed:
+            existing = await collection.index_information()
+            retired = [name for name in RETIRED_INDEXES if name in existing]
+            # A retired index with the same keys as a managed one blocks its creation
+            for spec in specs:
+                for name in list(retired):
+                    if _index_keys(existing[name]["key"]) == _index_keys(spec["keys"]):
+                        await collection.drop_index(name)
+                        retired.remove(name)
+                await self._create_index(collection, spec)
+            for name in retired:
+                await collection.drop_index(name)
+
+        await meta.update_one(
+            {"_id": "event_indexes"},
+            {"$set": {"version": INDEX_VERSION, "fingerprint": fingerprint, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        print(f"Event indexes at version {INDEX_VERSION}")
+        return True
+
+    async def _create_index(self, collection, spec: Dict[str, Any]):
+        """Create one named index, updating TTL options in place if they changed."""
+        options = spec.get("options", {})
+        try:
+            await collection.create_index(spec["keys"], name=spec["name"], **options)
+        except OperationFailure as e:
+            if e.code != 85:  # IndexOptionsConflict
+                raise
+            if "expireAfterSeconds" not in options:
+                await collection.drop_index(spec["name"])
+                await collection.create_index(spec["keys"], name=spec["name"])
+                return
+            await self.db.command(
+                "collMod", collection.name,
+                index={"name": spec["name"], "expireAfterSeconds": options["expireAfterSeconds"]}
+            )
+
     async def disconnect(self):
         """Disconnect from MongoDB."""
         if self.client:
             self.client.close()
+        for shard in self._shards.values():
+            await shard.disconnect()
+
+    def shards_for(self, bbox: Optional[Dict[str, Any]] = None) -> List["Database"]:
+        """Databases of the cities whose area intersects bbox (all cities without one)."""
+        local = self.city.name
+        shards = []
+        for city in cities_for_bbox(bbox):
+            if city.name == local:
+                shards.append(self)
+            else:
+                if city.name not in self._shards:
+                    self._shards[city.name] = Database(city.name)
+                shards.append(self._shards[city.name])
+        return shards
+
+    async def _fan_out(self, shards: List["Database"], method: str, *args,
+                       partial: bool = True, **kwargs) -> List[Dict[str, Any]]:
+        """
+        Run one read on each shard concurrently and concatenate the results.
+
+        A shard that fails is left out of the answer, unless they all fail or
+        partial is False (a snapshot must not silently lose a city).
+        """
+        for shard in shards:
+            CITY_SHARD_QUERIES.labels(shard.city.name).inc()
+        if shards == [self]:
+            return await getattr(self, method)(*args, **kwargs)
+        results = await asyncio.gather(
+            *(getattr(shard, method)(*args, **kwargs) for shard in shards), return_exceptions=True
+        )
+        docs, errors = [], []
+        for shard, result in zip(shards, results):
+            if isinstance(result, Exception):
+                print(f"City shard {shard.city.name} unavailable: {result}")
+                errors.append(result)
+            else:
+                docs.extend(result)
+        if errors and (not partial or len(errors) == len(shards)):
+            raise errors[0]
+        return docs
 
     async def insert_event(self, event: Dict[str, Any]) -> str:
         """Insert a safety event into the database."""
-        if self.collection is None:
-            await self.connect()
+        await self._ensure_connected()
         
         event["created_at"] = datetime.utcnow()
         result = await self.collection.insert_one(event)
         return str(result.inserted_id)
 
+    async def find_incident(
+        self,
+        event: Dict[str, Any],
+        radius_meters: float,
+        window_hours: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Nearest stored event of the same type within radius and time window.
+
+        Reads the primary: a report ingested moments ago must be visible to
+        the next one, whatever MONGO_READ_PREFERENCE says.
+        """
+        await self._ensure_connected()
+        
+        query = incident_filter(event, radius_meters, window_hours)
+        return await self.collection.find_one(query, INCIDENT_MERGE_PROJECTION)
+
+    async def merge_into_incident(self, incident_id, update: Dict[str, Any], key: Optional[str] = None) -> bool:
+        """Apply a merge update; False when the incident already lists the report with this key."""
+        await self._ensure_connected()
+        
+        query = {"_id": incident_id}
+        if key:
+            query["sources.key"] = {"$ne": key}
+        result = await self.collection.update_one(query, update)
+        return result.modified_count > 0
+
+    async def apply_rollup(self, key: Dict[str, Any], update: Dict[str, Any]):
+        """Upsert one hourly rollup document."""
+        await self._ensure_connected()
+        
+        await self.rollups.update_one({"_id": key["_id"]}, update, upsert=True)
+
+    async def aggregate_rollups(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run a /stats aggregation over the rollup collection."""
+        await self._ensure_connected()
+        
+        cursor = self.read_rollups.aggregate(pipeline)
+        results = await cursor.to_list(length=None)
+        for row in results:
+            if isinstance(row.get("time"), datetime):
+                row["time"] = row["time"].isoformat()
+        return results
+
+    async def replace_rollups(self, docs: List[Dict[str, Any]]) -> int:
+        """Overwrite rollup documents wholesale (backfills); returns documents written."""
+        await self._ensure_connected()
+        
+        if not docs:
+            return 0
+        await self.rollups.bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False
+        )
+        return len(docs)
+
+    async def increment_rollups(self, updates: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Apply many (key, update) rollup upserts in one unordered bulk write."""
+        await self._ensure_connected()
+        
+        if updates:
+            await self.rollups.bulk_write(
+                [UpdateOne({"_id": key["_id"]}, update, upsert=True) for key, update in updates], ordered=False
+            )
+
+    async def import_events(self, events: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Bulk insert imported events, unordered; returns the events actually inserted.
+
+        Events past the hot retention window go straight to the archive.
+        Events whose _id is already stored (a resumed import) are skipped.
+        """
+        await self._ensure_connected()
+        
+        cutoff = archive_cutoff(now)
+        hot = [event for event in events if event["timestamp"] >= cutoff]
+        cold = [event for event in events if event["timestamp"] < cutoff]
+        inserted = []
+        for collection, batch in ((self.collection, hot), (self.archive, cold)):
+            if not batch:
+                continue
+            try:
+                await collection.insert_many(batch, ordered=False)
+                inserted.extend(batch)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if any(err.get("code") != 11000 for err in errors):
+                    raise
+                duplicates = {err["index"] for err in errors}
+                inserted.extend(event for i, event in enumerate(batch) if i not in duplicates)
+        return inserted
+
+    async def record_classification(self, record: Dict[str, Any]) -> str:
+        """Store an LLM classification; these train the relevance prefilter."""
+        await self._ensure_connected()
+        
+        record["created_at"] = datetime.utcnow()
+        result = await self.db.classifications.insert_one(record)
+        return str(result.inserted_id)
+
+    async def classification_samples(self, limit: int = 100000) -> List[Dict[str, Any]]:
+        """Most recent stored LLM classifications."""
+        await self._ensure_connected()
+        
+        cursor = self.db.classifications.find({}, {"_id": 0}).sort("created_at", -1)
+        return await cursor.to_list(length=limit)
+
+    async def archive_cold_events(self, now: Optional[datetime] = None) -> int:
+        """
+        Move events older than the hot retention window to the archive.
+
+        Events are copied before they are deleted, so an interrupted run only
+        leaves duplicates that the next run skips.
+        """
+        await self._ensure_connected()
+
+        now = now or datetime.utcnow()
+        query = archive_filter(archive_cutoff(now))
+        moved = 0
+
+        while True:
+            cursor = self.collection.find(query).limit(ARCHIVE_BATCH_SIZE)
+            batch = await cursor.to_list(length=ARCHIVE_BATCH_SIZE)
+            if not batch:
+                break
+
+            for event in batch:
+                event["archived_at"] = now
+            try:
+                await self.archive.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                # Duplicate keys come from a previously interrupted run
+                if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                    raise
+
+            await self.collection.delete_many({"_id": {"$in": [event["_id"] for event in batch]}})
+            moved += len(batch)
+
+        if moved:
+            print(f"Archived {moved} events older than {HOT_RETENTION_HOURS}h")
+        return moved
+
+    async def rescore_events(self, query: Dict[str, Any], pipeline: List[Dict[str, Any]],
+                             archived: bool = False) -> int:
+        """Apply a rescoring update pipeline to matching events; returns the number modified."""
+        await self._ensure_connected()
+        
+        collection = self.archive if archived else self.collection
+        result = await collection.update_many(query, pipeline)
+        return result.modified_count
+
+    async def events_without_scored_at(self, since: datetime, projection: Dict[str, Any], limit: int,
+                                       archived: bool = False) -> List[Dict[str, Any]]:
+        """Events newer than since that predate stored score components."""
+        await self._ensure_connected()
+        
+        collection = self.archive if archived else self.collection
+        cursor = collection.find({"timestamp": {"$gte": since}, "scored_at": {"$exists": False}}, projection)
+        return await cursor.limit(limit).to_list(length=limit)
+
+    async def set_event_fields(self, updates: List[Tuple[Any, Dict[str, Any]]], archived: bool = False) -> int:
+        """Apply many (_id, fields) $set updates in one unordered bulk write."""
+        await self._ensure_connected()
+        
+        if not updates:
+            return 0
+        collection = self.archive if archived else self.collection
+        result = await collection.bulk_write(
+            [UpdateOne({"_id": _id}, {"$set": fields}) for _id, fields in updates], ordered=False
+        )
+        return result.modified_count
+
     async def query_events(
         self,
         bbox: Optional[Dict[str, float]] = None,
-        since_hours: Optional[int] = None
+        since_hours: Optional[int] = None,
+        projection: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
-        """Query events within bounding box and time window."""
-        if self.collection is None:
-            await self.connect()
-        
-        query = {}
-        
-        # Time filter
-        if since_hours:
-            since_time = datetime.utcnow() - timedelta(hours=since_hours)
-            query["timestamp"] = {"$gte": since_time}
-        
-        # Geographic filter - use GeoJSON format for 2dsphere index
-        if bbox:
-            query["coordinates"] = {
-                "$geoWithin": {
-                    "$geometry": {
-                        "type": "Polygon",
-                        "coordinates": [[
-                            [bbox["sw"]["lng"], bbox["sw"]["lat"]],
-                            [bbox["ne"]["lng"], bbox["sw"]["lat"]],
-                            [bbox["ne"]["lng"], bbox["ne"]["lat"]],
-                            [bbox["sw"]["lng"], bbox["ne"]["lat"]],
-                            [bbox["sw"]["lng"], bbox["sw"]["lat"]]
-                        ]]
-                    }
-                }
-            }
+        """Query events within bounding box and time window, from every city it touches."""
+        events = await self._fan_out(self.shards_for(bbox), "_query_events", bbox, since_hours, projection)
+        if len(events) > QUERY_LIMIT:
+            # Keep the newest across cities, not whichever city is listed first
+            events.sort(key=lambda event: event.get("timestamp") or "", reverse=True)
+        return events[:QUERY_LIMIT]
+
+    async def _query_events(
+        self,
+        bbox: Optional[Dict[str, float]] = None,
+        since_hours: Optional[int] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Query this city's events within bounding box and time window.
+
+        Windows longer than the hot retention (or no window at all) also
+        read from the archive collection.
+        """
+        await self._ensure_connected()
+        
+        query = events_filter(bbox, since_hours)
         
-        cursor = self.collection.find(query)
-        events = await cursor.to_list(length=10000)  # Limit for safety
+        collections = [self.read_collection]
+        if reads_archive(since_hours):
+            collections.append(self.read_archive)
+        
+        events = []
+        for collection in collections:
+            remaining = QUERY_LIMIT - len(events)
+            if remaining <= 0:
+                break
+            cursor = collection.find(query, projection)
+            events.extend(await cursor.to_list(length=remaining))
         
         # Convert ObjectId to string
         for event in events:
             event["_id"] = str(event["_id"])
-            if isinstance(event.get("timestamp"), datetime):
-                event["timestamp"] = event["timestamp"].isoformat()
-            if isinstance(event.get("created_at"), datetime):
-                event["created_at"] = event["created_at"].isoformat()
+            for field in ("timestamp", "created_at", "archived_at"):
+                if isinstance(event.get(field), datetime):
+                    event[field] = event[field].isoformat()
         
         return events
 
+    async def snapshot_events(self, since_hours: int = HOT_RETENTION_HOURS) -> List[Dict[str, Any]]:
+        """Every hot event of the last since_hours hours in every city, for a serving snapshot."""
+        return await self._fan_out(self.shards_for(), "_snapshot_events", since_hours, partial=False)
+
+    async def _snapshot_events(self, since_hours: int) -> List[Dict[str, Any]]:
+        await self._ensure_connected()
+        cursor = self.read_collection.find(events_filter(since_hours=since_hours), SNAPSHOT_PROJECTION)
+        return await cursor.to_list(length=None)
+
+    async def risk_events(self, bbox: Optional[Dict[str, Any]], since_hours: int) -> List[Dict[str, Any]]:
+        """
+        Every hot event in bbox of the last since_hours hours, with the fields
+        route scoring needs; uncapped, unlike query_events.
+        """
+        return await self._fan_out(self.shards_for(bbox), "_risk_events", bbox, since_hours)
+
+    async def _risk_events(self, bbox: Optional[Dict[str, Any]], since_hours: int) -> List[Dict[str, Any]]:
+        await self._ensure_connected()
+        cursor = self.read_collection.find(events_filter(bbox, since_hours), EVENT_RISK_PROJECTION)
+        return await cursor.to_list(length=None)
+
     async def find_nearby_events(
         self,
         lat: float,
         lng: float,
-        radius_meters: float = 50
+        radius_meters: float = 50,
+        projection: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
-        """Find events within radius of a point."""
-        if self.collection is None:
-            await self.connect()
-        
-        query = {
-            "coordinates": {
-                "$near": {
-                    "$geometry": {
-                        "type": "Point",
-                        "coordinates": [lng, lat]
-                    },
-                    "$maxDistance": radius_meters
-                }
-            }
-        }
+        """Find events within radius of a point, from the cities whose area comes that close."""
+        shards = self.shards_for(point_envelope(lat, lng, radius_meters))
+        return await self._fan_out(shards, "_find_nearby_events", lat, lng, radius_meters, projection)
+
+    async def _find_nearby_events(
+        self,
+        lat: float,
+        lng: float,
+        radius_meters: float = 50,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find this city's events within radius of a point.
+
+        Only the hot collection is searched: archived events have decayed to
+        near-zero route risk.
+        """
+        await self._ensure_connected()
         
-        cursor = self.collection.find(query)
+        cursor = self.read_collection.find(nearby_filter(lat, lng, radius_meters), projection)
         events = await cursor.to_list(length=1000)
         
         for event in events:
@@ -127,6 +623,189 @@ class Database:
         
         return events
 
+    async def explain_queries(
+        self,
+        bbox: Optional[Dict[str, float]] = None,
+        since_hours: Optional[int] = 24,
+        point: Optional[Dict[str, float]] = None,
+        radius_meters: float = 50
+    ) -> Dict[str, Any]:
+        """Explain the /events and route queries and summarize their plans."""
+        await self._ensure_connected()
+        
+        plans = {
+            "events": {
+                "filter": events_filter(bbox, since_hours),
+                "projection": EVENT_MAP_PROJECTION,
+                "limit": QUERY_LIMIT
+            }
+        }
+        if point:
+            plans["route"] = {
+                "filter": nearby_filter(point["lat"], point["lng"], radius_meters),
+                "limit": 1000
+            }
+        
+        report = {"index_version": INDEX_VERSION}
+        for name, find in plans.items():
+            explained = await self.db.command(
+                "explain",
+                {"find": self.collection.name, **find},
+                verbosity="executionStats"
+            )
+            report[name] = summarize_plan(explained)
+        return report
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Jittered exponential backoff for the given (1-based) attempt."""
+    delay = min(CONNECT_BACKOFF_MAX_SECONDS, CONNECT_BACKOFF_SECONDS * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _read_preference():
+    """Build the read preference for map and route reads."""
+    modes = {
+        "primary": read_preferences.Primary,
+        "primarypreferred": read_preferences.PrimaryPreferred,
+        "secondary": read_preferences.Secondary,
+        "secondarypreferred": read_preferences.SecondaryPreferred,
+        "nearest": read_preferences.Nearest,
+    }
+    mode = modes.get(READ_PREFERENCE.lower())
+    if mode is None:
+        print(f"Unknown MONGO_READ_PREFERENCE '{READ_PREFERENCE}', using primary")
+        mode = read_preferences.Primary
+    if mode is read_preferences.Primary:
+        return mode()
+    return mode(max_staleness=MAX_STALENESS_SECONDS)
+
+
+def _write_concern() -> WriteConcern:
+    """Build the write concern for ingest writes."""
+    w = int(WRITE_CONCERN) if WRITE_CONCERN.isdigit() else WRITE_CONCERN
+    return WriteConcern(w=w, wtimeout=WRITE_TIMEOUT_MS or None)
+
+
+def index_fingerprint() -> str:
+    """Hash of every managed index spec, options derived from the environment included."""
+    specs = [INDEX_VERSION, EVENT_INDEXES, ARCHIVE_INDEXES, ROLLUP_INDEXES, RETIRED_INDEXES]
+    return hashlib.sha1(json.dumps(specs, sort_keys=True).encode()).hexdigest()
+
+
+def _index_keys(keys) -> List[tuple]:
+    """Normalize an index key pattern for comparison (1 vs 1.0)."""
+    return [(field, float(kind) if isinstance(kind, (int, float)) else kind) for field, kind in keys]
+
+
+def events_filter(
+    bbox: Optional[Dict[str, float]] = None,
+    since_hours: Optional[int] = None
+) -> Dict[str, Any]:
+    """Build the /events filter for a bounding box and time window."""
+    query = {}
+    
+    # Time filter
+    if since_hours:
+        since_time = datetime.utcnow() - timedelta(hours=since_hours)
+        query["timestamp"] = {"$gte": since_time}
+    
+    # Geographic filter - use GeoJSON format for 2dsphere index
+    if bbox:
+        query["coordinates"] = {
+            "$geoWithin": {
+                "$geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[
+                        [bbox["sw"]["lng"], bbox["sw"]["lat"]],
+                        [bbox["ne"]["lng"], bbox["sw"]["lat"]],
+                        [bbox["ne"]["lng"], bbox["ne"]["lat"]],
+                        [bbox["sw"]["lng"], bbox["ne"]["lat"]],
+                        [bbox["sw"]["lng"], bbox["sw"]["lat"]]
+                    ]]
+                }
+            }
+        }
+    
+    return query
+
+
+def archive_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Events older than this belong in the archive."""
+    return (now or datetime.utcnow()) - timedelta(hours=HOT_RETENTION_HOURS)
+
+
+def archive_filter(cutoff: datetime) -> Dict[str, Any]:
+    """Hot events due to move to the archive."""
+    return {"timestamp": {"$lt": cutoff}}
+
+
+def reads_archive(since_hours: Optional[int]) -> bool:
+    """Whether a time window reaches past the hot collection into the archive."""
+    return since_hours is None or since_hours > HOT_RETENTION_HOURS
+
+
+def point_envelope(lat: float, lng: float, radius_meters: float) -> Dict[str, Dict[str, float]]:
+    """Bounding box of a radius around a point, for shard routing."""
+    dlat = radius_meters / 111320.0
+    dlng = dlat / max(math.cos(math.radians(lat)), 0.01)
+    return {"sw": {"lat": lat - dlat, "lng": lng - dlng}, "ne": {"lat": lat + dlat, "lng": lng + dlng}}
+
+
+def incident_filter(event: Dict[str, Any], radius_meters: float, window_hours: float) -> Dict[str, Any]:
+    """Stored events an incoming report may merge into: same type, nearby, close in time, precisely placed."""
+    coords = event["coordinates"]
+    timestamp = event["timestamp"]
+    window = timedelta(hours=window_hours)
+    query = nearby_filter(coords["lat"], coords["lng"], radius_meters)
+    query["event_type"] = event.get("event_type", "other")
+    query["timestamp"] = {"$gte": timestamp - window, "$lte": timestamp + window}
+    query["approximate_location"] = {"$ne": True}
+    return query
+
+
+def nearby_filter(lat: float, lng: float, radius_meters: float) -> Dict[str, Any]:
+    """Build the $near filter used for route scoring."""
+    return {
+        "coordinates": {
+            "$near": {
+                "$geometry": {
+                    "type": "Point",
+                    "coordinates": [lng, lat]
+                },
+                "$maxDistance": radius_meters
+            }
+        }
+    }
+
+
+def summarize_plan(explained: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce explain output to the winning index and examined/returned counts."""
+    stats = explained.get("executionStats", {})
+    returned = stats.get("nReturned", 0)
+    keys_examined = stats.get("totalKeysExamined", 0)
+    docs_examined = stats.get("totalDocsExamined", 0)
+    
+    # Walk the winning plan down to the stage(s) that name an index
+    indexes = []
+    stages = [explained.get("queryPlanner", {}).get("winningPlan", {})]
+    while stages:
+        stage = stages.pop()
+        if stage.get("indexName"):
+            indexes.append(stage["indexName"])
+        if stage.get("inputStage"):
+            stages.append(stage["inputStage"])
+        stages.extend(stage.get("inputStages", []))
+    
+    return {
+        "indexes": indexes or ["COLLSCAN"],
+        "n_returned": returned,
+        "keys_examined": keys_examined,
+        "docs_examined": docs_examined,
+        "keys_per_result": round(keys_examined / returned, 2) if returned else None,
+        "execution_time_ms": stats.get("executionTimeMillis", 0)
+    }
+
 
 # Global database instance
 db = Database()
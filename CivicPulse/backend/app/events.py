@@ -0,0 +1,193 @@
+"""Compact in-process event representations.
+
+Mongo documents carry nested GeoJSON, full text, string ids and ISO
+timestamps; scoring only needs a handful of numbers per event. EventRecord
+holds one event in a __slots__ object, EventColumns holds many as NumPy
+arrays (lat, lng, epoch seconds, severity, static score, type code) so route
+scoring works on whole arrays at once.
+
+The safety score splits into a time-independent part, fixed when an event is
+converted, and a recency decay applied at scoring time:
+
+    score = clip(severity * 10 * exp(-age_hours / 24) + static_score, 0, 100)
+
+where static_score is the keyword impact of the title and text.
+"""
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from .keywords import SAFETY_KEYWORDS
+
+
+EVENT_TYPES = [
+    "major_crime",
+    "minor_crime",
+    "accident",
+    "environmental",
+    "infrastructure",
+    "public_disorder",
+    "other"
+]
+TYPE_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+OTHER_CODE = TYPE_CODES["other"]
+
+DECAY_HOURS = 24.0
+HIGH_RISK_IMPACT = 15.0
+MEDIUM_RISK_IMPACT = 8.0
+DEFAULT_SEVERITY = 5
+EPOCH = datetime(1970, 1, 1)
+
+
+def valid_severity(severity: Any) -> float:
+    """LLM severity on the 1-10 scale, DEFAULT_SEVERITY when missing or out of range."""
+    if not isinstance(severity, (int, float)) or severity < 1 or severity > 10:
+        return DEFAULT_SEVERITY
+    return severity
+
+
+def keyword_impact(text: str) -> float:
+    """Additional risk from high- and medium-risk keywords."""
+    hits = SAFETY_KEYWORDS.match(text)
+    impact = 0.0
+    if "high_risk" in hits:
+        impact += HIGH_RISK_IMPACT
+    if "medium_risk" in hits:
+        impact += MEDIUM_RISK_IMPACT
+    return impact
+
+
+def static_score(doc: Dict[str, Any]) -> float:
+    return keyword_impact(doc.get("title", "") + " " + doc.get("text", ""))
+
+
+def epoch_seconds(timestamp: Any, default: Optional[float] = None) -> float:
+    """
+    Seconds since the epoch for a stored timestamp (naive UTC datetime or ISO string).
+
+    Unparseable or missing timestamps count as now, as compute_score always has.
+    """
+    if isinstance(timestamp, str):
+        try:
+            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        except ValueError:
+            timestamp = None
+    if isinstance(timestamp, datetime):
+        return (timestamp.replace(tzinfo=None) - EPOCH).total_seconds()
+    return time.time() if default is None else default
+
+
+def decayed_score(severity: float, static: float, age_seconds: float) -> float:
+    raw = severity * 10.0 * math.exp(-age_seconds / 3600.0 / DECAY_HOURS) + static
+    return max(0.0, min(100.0, raw))
+
+
+class EventRecord:
+    """One event, reduced to what scoring and the map need."""
+
+    __slots__ = ("id", "lat", "lng", "time", "severity", "static_score", "type_code")
+
+    def __init__(self, id: str, lat: float, lng: float, time: float, severity: float,
+                 static_score: float, type_code: int):
+        self.id = id
+        self.lat = lat
+        self.lng = lng
+        self.time = time
+        self.severity = severity
+        self.static_score = static_score
+        self.type_code = type_code
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> "EventRecord":
+        coords = doc.get("coordinates") or {}
+        lat, lng = coords.get("lat"), coords.get("lng")
+        return cls(
+            str(doc.get("_id", "")),
+            math.nan if lat is None else float(lat),
+            math.nan if lng is None else float(lng),
+            epoch_seconds(doc.get("timestamp")),
+            float(valid_severity(doc.get("severity", DEFAULT_SEVERITY))),
+            static_score(doc),
+            TYPE_CODES.get(doc.get("event_type"), OTHER_CODE)
+        )
+
+    @property
+    def event_type(self) -> str:
+        return EVENT_TYPES[self.type_code]
+
+    def score(self, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        return decayed_score(self.severity, self.static_score, now - self.time)
+
+
+class EventColumns:
+    """Many events as parallel NumPy arrays; row i of every array is one event."""
+
+    __slots__ = ("ids", "lat", "lng", "time", "severity", "static_score", "type_code")
+
+    def __init__(self, ids: Sequence[str], lat, lng, time, severity, static_score, type_code):
+        self.ids = list(ids)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.time = np.asarray(time, dtype=np.float64)
+        self.severity = np.asarray(severity, dtype=np.float32)
+        self.static_score = np.asarray(static_score, dtype=np.float32)
+        self.type_code = np.asarray(type_code, dtype=np.int8)
+
+    @classmethod
+    def from_docs(cls, docs: Iterable[Dict[str, Any]]) -> "EventColumns":
+        """Columns from Mongo documents (or dicts shaped like them)."""
+        return cls.from_records(EventRecord.from_doc(doc) for doc in docs)
+
+    @classmethod
+    def from_records(cls, records: Iterable[EventRecord]) -> "EventColumns":
+        records = list(records)
+        return cls(
+            [r.id for r in records],
+            [r.lat for r in records],
+            [r.lng for r in records],
+            [r.time for r in records],
+            [r.severity for r in records],
+            [r.static_score for r in records],
+            [r.type_code for r in records]
+        )
+
+    @classmethod
+    def empty(cls) -> "EventColumns":
+        return cls([], [], [], [], [], [], [])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def record(self, i: int) -> EventRecord:
+        return EventRecord(self.ids[i], float(self.lat[i]), float(self.lng[i]), float(self.time[i]),
+                           float(self.severity[i]), float(self.static_score[i]), int(self.type_code[i]))
+
+    def take(self, index) -> "EventColumns":
+        """Subset by boolean mask or integer indices."""
+        positions = np.arange(len(self))[index]
+        return EventColumns([self.ids[i] for i in positions], self.lat[index], self.lng[index],
+                            self.time[index], self.severity[index], self.static_score[index],
+                            self.type_code[index])
+
+    def scores(self, now: Optional[float] = None) -> np.ndarray:
+        """Safety score of every event at time now (epoch seconds)."""
+        now = time.time() if now is None else now
+        age_hours = (now - self.time) / 3600.0
+        raw = self.severity.astype(np.float64) * 10.0 * np.exp(-age_hours / DECAY_HOURS) + self.static_score
+        return np.clip(raw, 0.0, 100.0)
+
+
+def haversine_matrix(lats: np.ndarray, lngs: np.ndarray, event_lats: np.ndarray,
+                     event_lngs: np.ndarray) -> np.ndarray:
+    """Distances in meters between every point (rows) and every event (columns)."""
+    R = 6371000.0
+    phi1 = np.radians(lats)[:, None]
+    phi2 = np.radians(event_lats)[None, :]
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(event_lngs)[None, :] - np.radians(lngs)[:, None]
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    return 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
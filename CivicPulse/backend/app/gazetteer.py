@@ -0,0 +1,286 @@
+"""Offline gazetteer geocoder for the service area.
+
+Resolves street, neighborhood and landmark names from a local CSV file
+(name,kind,lat,lng,aliases) without network access. geocode() consults it
+first and only calls Google on a miss. Lookups try, in order:
+
+1. exact match of the normalized name (abbreviations expanded, house numbers
+   and compass prefixes stripped, each comma-separated part on its own)
+2. unique-enough prefix match ("grand central" -> "grand central terminal")
+3. fuzzy match through a trigram index, verified by a similarity ratio
+4. known names appearing inside longer text ("Theft reported in Central Park");
+   a one-word name must be capitalized there ("Queens", not "drag queens"),
+   and a short one written in capitals ("LES", not "les")
+
+A street entry is a single centroid for the whole street, so it only answers
+a bare street name. A street named with a house number ("123 Broadway"), a
+cross street ("Canal St & Bowery") or a borough ("Canal Street Brooklyn")
+gets no match and goes to Google, which can place it.
+"""
+import bisect
+import csv
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+
+DEFAULT_PATH = Path(__file__).parent.parent / "data" / "gazetteer" / "nyc.csv"
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", str(DEFAULT_PATH))
+FUZZY_CUTOFF = float(os.getenv("GAZETTEER_FUZZY_CUTOFF", "0.88"))
+MIN_PREFIX_LENGTH = 5
+MAX_TEXT_NGRAM = 5
+# One-word names this short only match inside text when written in capitals
+MAX_ACRONYM_LENGTH = 3
+
+# Preferred when several entries normalize to the same name
+KIND_PRIORITY = {"landmark": 0, "neighborhood": 1, "street": 2, "borough": 3}
+
+ABBREVIATIONS = {
+    "st": "street", "str": "street", "ave": "avenue", "av": "avenue", "rd": "road",
+    "blvd": "boulevard", "dr": "drive", "ln": "lane", "pl": "place", "pkwy": "parkway",
+    "hwy": "highway", "expy": "expressway", "sq": "square", "ter": "terrace", "ct": "court",
+    "e": "east", "w": "west", "n": "north", "s": "south", "ft": "fort", "mt": "mount",
+    "bklyn": "brooklyn", "intl": "international",
+}
+ORDINALS = {
+    "first": "1st", "second": "2nd", "third": "3rd", "fourth": "4th", "fifth": "5th", "sixth": "6th",
+    "seventh": "7th", "eighth": "8th", "ninth": "9th", "tenth": "10th", "eleventh": "11th", "twelfth": "12th",
+}
+DIRECTIONS = {"east", "west", "north", "south"}
+BOROUGHS = ["manhattan", "brooklyn", "queens", "bronx", "staten island"]
+# Words joining a street name to a cross street ("Bowery and Canal St", "Canal St at Bowery")
+CROSS_STREET_BEFORE = {"and", "between"}
+CROSS_STREET_AFTER = {"and", "at", "between"}
+NOISE_SUFFIXES = ["new york city", "new york", "nyc", "ny", "neighborhood", "area", "district", "borough"]
+
+
+def normalize(name: str) -> str:
+    """Canonical form used for every index key and query."""
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    text = text.replace("&", " and ").replace("'", "")
+    tokens = re.sub(r"[^a-z0-9]+", " ", text).split()
+    out = []
+    for i, token in enumerate(tokens):
+        if token == "st" and i == 0 and len(tokens) > 1:
+            token = "saint"  # "St Marks Place", not "Street Marks Place"
+        else:
+            token = ABBREVIATIONS.get(token, token)
+        out.append(ORDINALS.get(token, token))
+    if out and out[0] == "the":
+        out = out[1:]
+    return " ".join(out)
+
+
+def _variants(text: str) -> List[str]:
+    """Normalized forms of a hint worth trying, most specific first."""
+    variants = []
+    for part in [text] + text.split(","):
+        key = normalize(part)
+        for suffix in NOISE_SUFFIXES:
+            if key.endswith(" " + suffix):
+                key = key[: -len(suffix) - 1]
+        tokens = key.split()
+        if tokens and tokens[0].isdigit():
+            tokens = tokens[1:]  # house number
+        candidates = [" ".join(tokens)]
+        if len(tokens) > 1 and tokens[0] in DIRECTIONS:
+            candidates.append(" ".join(tokens[1:]))
+        for candidate in candidates:
+            if candidate and candidate not in variants:
+                variants.append(candidate)
+    return variants
+
+
+def street_qualified(text: str, key: str) -> bool:
+    """
+    Whether the street key in a hint comes with a house number, a cross street
+    or a borough, i.e. names a point its centroid cannot stand for.
+    """
+    tokens = normalize(text.replace("/", " & ")).split()
+    name = key.split()
+    starts = [i for i in range(len(tokens) - len(name) + 1) if tokens[i:i + len(name)] == name]
+    if starts:
+        spans = [(i, i + len(name)) for i in starts]
+    else:
+        # Fuzzy or prefix match: the hint as a whole names the street
+        spans = [(1, len(tokens)) if len(tokens) > 1 and tokens[0].isdigit() else (0, len(tokens))]
+    for start, end in spans:
+        if start > 0 and tokens[start - 1] in DIRECTIONS:
+            start -= 1  # "350 West 42nd Street" matched as "42nd street"
+        before = tokens[start - 1] if start > 0 else ""
+        after = tokens[end] if end < len(tokens) else ""
+        if before.isdigit() or before in CROSS_STREET_BEFORE or after in CROSS_STREET_AFTER:
+            return True
+    hint, name = f" {' '.join(tokens)} ", f" {key} "
+    return any(f" {borough} " in hint and f" {borough} " not in name for borough in BOROUGHS)
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class Place:
+    name: str
+    kind: str
+    lat: float
+    lng: float
+
+
+@dataclass
+class GazetteerMatch:
+    place: Place
+    method: str  # exact, prefix, fuzzy or text
+    score: float
+    key: str = ""  # the indexed name that matched
+
+
+class Gazetteer:
+    """Normalized-name index over a city's places."""
+
+    def __init__(self, places: List[Place], aliases: Optional[Dict[str, List[str]]] = None):
+        self.index: Dict[str, Place] = {}
+        for place in places:
+            for name in [place.name] + (aliases or {}).get(place.name, []):
+                key = normalize(name)
+                current = self.index.get(key)
+                if key and (current is None or KIND_PRIORITY.get(place.kind, 9) < KIND_PRIORITY.get(current.kind, 9)):
+                    self.index[key] = place
+        self.keys = sorted(self.index)
+        self.trigram_index: Dict[str, List[int]] = {}
+        for i, key in enumerate(self.keys):
+            for gram in _trigrams(key):
+                self.trigram_index.setdefault(gram, []).append(i)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "Gazetteer":
+        places, aliases = [], {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                place = Place(row["name"], row.get("kind", "landmark"), float(row["lat"]), float(row["lng"]))
+                places.append(place)
+                if row.get("aliases"):
+                    aliases.setdefault(place.name, []).extend(a for a in row["aliases"].split("|") if a)
+        return cls(places, aliases)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def match(self, text: str) -> Optional[GazetteerMatch]:
+        """Best match for a hint, or None (also when it is a street the hint is too precise for)."""
+        if not text:
+            return None
+        found = self._match(text)
+        if found is not None and found.place.kind == "street" and street_qualified(text, found.key):
+            return None
+        return found
+
+    def _match(self, text: str) -> Optional[GazetteerMatch]:
+        key = normalize(text)
+        place = self.index.get(key)
+        if place:
+            return GazetteerMatch(place, "exact", 1.0, key)
+        variants = _variants(text)
+        for key in variants:
+            place = self.index.get(key)
+            if place:
+                return GazetteerMatch(place, "exact", 1.0, key)
+        for key in variants:
+            found = self._prefix(key)
+            if found:
+                return found
+        for key in variants:
+            found = self._fuzzy(key)
+            if found:
+                return found
+        return self._in_text(text)
+
+    def lookup(self, text: str) -> Optional[Dict[str, float]]:
+        """Coordinates in the same shape geocode() returns."""
+        found = self.match(text)
+        if found is None:
+            return None
+        return {"lat": found.place.lat, "lng": found.place.lng}
+
+    def _prefix(self, key: str) -> Optional[GazetteerMatch]:
+        if len(key) < MIN_PREFIX_LENGTH:
+            return None
+        start = bisect.bisect_left(self.keys, key)
+        candidates = []
+        for candidate in self.keys[start:start + 8]:
+            if not candidate.startswith(key):
+                break
+            # Whole words only: "harlem" may complete to "harlem river drive", "harl" may not
+            if len(candidate) == len(key) or candidate[len(key)] == " ":
+                candidates.append(candidate)
+        if not candidates:
+            return None
+        best = min(candidates, key=len)
+        return GazetteerMatch(self.index[best], "prefix", len(key) / len(best), best)
+
+    def _fuzzy(self, key: str) -> Optional[GazetteerMatch]:
+        grams = _trigrams(key)
+        counts: Dict[int, int] = {}
+        for gram in grams:
+            for i in self.trigram_index.get(gram, ()):
+                counts[i] = counts.get(i, 0) + 1
+        if not counts:
+            return None
+
+        best, best_score = None, FUZZY_CUTOFF
+        # Only the strongest trigram overlaps are worth a full comparison
+        for i in sorted(counts, key=counts.get, reverse=True)[:10]:
+            candidate = self.keys[i]
+            matcher = SequenceMatcher(None, key, candidate)
+            if matcher.real_quick_ratio() < best_score or matcher.quick_ratio() < best_score:
+                continue
+            score = matcher.ratio()
+            if score >= best_score:
+                best, best_score = candidate, score
+        if best is None:
+            return None
+        return GazetteerMatch(self.index[best], "fuzzy", best_score, best)
+
+    def _in_text(self, text: str) -> Optional[GazetteerMatch]:
+        """Longest known name appearing as whole words inside the text."""
+        tokens = normalize(text).split()
+        for size in range(min(MAX_TEXT_NGRAM, len(tokens)), 1, -1):
+            for i in range(len(tokens) - size + 1):
+                key = " ".join(tokens[i:i + size])
+                place = self.index.get(key)
+                if place:
+                    return GazetteerMatch(place, "text", 1.0, key)
+        # Single words are checked as written: lowercase ones are ordinary words
+        for word in re.findall(r"[A-Za-z0-9]+", unicodedata.normalize("NFKD", text).replace("'", "")):
+            if not word[0].isupper() or (len(word) <= MAX_ACRONYM_LENGTH and not word.isupper()):
+                continue
+            key = normalize(word)
+            place = self.index.get(key)
+            if place:
+                return GazetteerMatch(place, "text", 1.0, key)
+        return None
+
+
+_gazetteers: Dict[str, Optional[Gazetteer]] = {}
+
+
+def get_gazetteer(path: Optional[str] = None) -> Optional[Gazetteer]:
+    """Load a gazetteer (GAZETTEER_PATH by default) once; None when unset or missing."""
+    path = path or GAZETTEER_PATH
+    if path not in _gazetteers:
+        gazetteer = None
+        if path and Path(path).exists():
+            try:
+                gazetteer = Gazetteer.from_csv(path)
+                print(f"Loaded gazetteer {path} ({len(gazetteer)} names)")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load gazetteer {path}: {e}")
+        elif path:
+            print(f"Gazetteer {path} not found, geocoding with Google only")
+        _gazetteers[path] = gazetteer
+    return _gazetteers[path]
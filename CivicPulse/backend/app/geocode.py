@@ -1,43 +1,112 @@
-"""Geocoding module using Google Maps Geocoding API."""
+"""Geocoding module: offline gazetteer first, Google Maps Geocoding API on a miss.
+
+Google calls go through app/resilience.py: while its circuit is open a
+gazetteer miss is simply a miss. Given a city (app/cities.py), its own
+gazetteer is used and Google results are biased to its service area.
+"""
 import os
 import requests
 from typing import Optional, Dict, Any
 
+from .cities import City
+from .gazetteer import get_gazetteer
+from .metrics import GEOCODE_LOOKUPS, UPSTREAM_FALLBACKS
+from .resilience import CircuitOpen, get_upstream
+
+
+GEOCODE_TIMEOUT_SECONDS = 5.0
+# Results standing for a whole street or area rather than a point
+APPROXIMATE_KINDS = {"street", "neighborhood", "borough"}
+APPROXIMATE_LOCATION_TYPES = {"GEOMETRIC_CENTER", "APPROXIMATE"}
+# Statuses Google answers with HTTP 200 when the service, not the query, failed
+FAILED_STATUSES = {"OVER_QUERY_LIMIT", "OVER_DAILY_LIMIT", "REQUEST_DENIED", "UNKNOWN_ERROR"}
+
+
+class MapsApiError(Exception):
+    """A Google Maps web service answered, but with a failure status."""
+
+
+def maps_api_url(endpoint: str) -> str:
+    """Google Maps web service URL; GOOGLE_MAPS_API_URL points it at a stand-in for load tests."""
+    base_url = os.getenv("GOOGLE_MAPS_API_URL", "https://maps.googleapis.com/maps/api")
+    return f"{base_url.rstrip('/')}/{endpoint}/json"
+
+
+def fetch_json(url: str, params: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """
+    GET a JSON web service; HTTP errors and FAILED_STATUSES raise.
+
+    Raising lets the upstream metric and circuit breaker count quota and key
+    failures; ZERO_RESULTS and the like are answers and are returned.
+    """
+    response = requests.get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    status = data.get("status") if isinstance(data, dict) else None
+    if status in FAILED_STATUSES:
+        raise MapsApiError(f"{status}: {data.get('error_message', '')}".rstrip(": "))
+    return data
+
+
+def geocode(text_or_address: str, city: Optional[City] = None) -> Optional[Dict[str, float]]:
+    """
+    Geocode an address or location text to lat/lng coordinates.
+
+    approximate is True when the point is a centroid (a gazetteer street or
+    neighborhood, or a Google result that is not a rooftop or interpolated
+    address), which many unrelated events share.
+    """
+    if not text_or_address:
+        return None
+
+    gazetteer = get_gazetteer(city.gazetteer if city else None)
+    if gazetteer is not None:
+        found = gazetteer.match(text_or_address)
+        if found is not None:
+            GEOCODE_LOOKUPS.labels(f"gazetteer_{found.method}").inc()
+            return {"lat": found.place.lat, "lng": found.place.lng,
+                    "approximate": found.place.kind in APPROXIMATE_KINDS}
 
-def geocode(text_or_address: str) -> Optional[Dict[str, float]]:
-    """Geocode an address or location text to lat/lng coordinates."""
     api_key = os.getenv("GOOGLE_MAPS_API_KEY")
     
     if not api_key:
+        GEOCODE_LOOKUPS.labels("miss").inc()
         print("GOOGLE_MAPS_API_KEY not set, geocoding unavailable")
         return None
     
-    if not text_or_address:
-        return None
-    
     try:
-        url = "https://maps.googleapis.com/maps/api/geocode/json"
+        url = maps_api_url("geocode")
         params = {
             "address": text_or_address,
             "key": api_key
         }
+        if city is not None and city.bounds():
+            params["bounds"] = city.bounds()
         
-        response = requests.get(url, params=params, timeout=5)
-        response.raise_for_status()
-        
-        data = response.json()
+        data = get_upstream("google_geocode", GEOCODE_TIMEOUT_SECONDS).call_sync(
+            lambda timeout: fetch_json(url, params, timeout)
+        )
         
         if data.get("status") == "OK" and data.get("results"):
-            location = data["results"][0]["geometry"]["location"]
+            geometry = data["results"][0]["geometry"]
+            location = geometry["location"]
+            GEOCODE_LOOKUPS.labels("google").inc()
             return {
                 "lat": location["lat"],
-                "lng": location["lng"]
+                "lng": location["lng"],
+                "approximate": geometry.get("location_type") in APPROXIMATE_LOCATION_TYPES
             }
         else:
+            GEOCODE_LOOKUPS.labels("miss").inc()
             print(f"Geocoding failed for '{text_or_address}': {data.get('status')}")
             return None
             
+    except CircuitOpen:
+        GEOCODE_LOOKUPS.labels("miss").inc()
+        UPSTREAM_FALLBACKS.labels("google_geocode", "miss").inc()
+        return None
     except Exception as e:
+        GEOCODE_LOOKUPS.labels("miss").inc()
         print(f"Geocoding error for '{text_or_address}': {e}")
         return None
 
@@ -50,16 +119,15 @@ def reverse_geocode(lat: float, lng: float) -> Optional[str]:
         return None
     
     try:
-        url = "https://maps.googleapis.com/maps/api/geocode/json"
+        url = maps_api_url("geocode")
         params = {
             "latlng": f"{lat},{lng}",
             "key": api_key
         }
         
-        response = requests.get(url, params=params, timeout=5)
-        response.raise_for_status()
-        
-        data = response.json()
+        data = get_upstream("google_geocode", GEOCODE_TIMEOUT_SECONDS).call_sync(
+            lambda timeout: fetch_json(url, params, timeout)
+        )
         
         if data.get("status") == "OK" and data.get("results"):
             return data["results"][0]["formatted_address"]
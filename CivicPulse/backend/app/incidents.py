@@ -0,0 +1,138 @@
+"""Merge reports of the same incident from different sources at ingest.
+
+A city feed, a few Reddit posts and a blotter entry about one fire should be
+one event. Before an event is stored, the nearest stored event of the same
+event_type within INCIDENT_MERGE_RADIUS_METERS and INCIDENT_MERGE_WINDOW_HOURS
+is looked up through the geo index; if there is one, the new report is added
+to its sources instead of becoming a new document. A merged incident keeps:
+
+- sources: one entry (source, url, title, timestamp) per contributing report
+- report_count: number of contributing reports
+- severity, urgency, safety_score: the most severe report's values
+- timestamp: the first report stored, fixed once the incident exists
+- first_reported_at / last_reported_at: the earliest and latest report times
+
+Events placed at a centroid (approximate_location: a street or neighborhood
+rather than an address) are never merged and never merged into: unrelated
+reports that only share a hint like "Broadway" would land on the same point.
+
+Re-scraping a report already listed (same report_key) changes nothing. A
+report's key is its url, except on listing pages such as a police blotter,
+where one url carries many entries and each is keyed by url plus a hash of
+its text. Sources stored before keys existed are matched by url (or, for a
+listing page, against the incident's own text). Hourly
+rollups (app/rollups.py) are updated alongside: a new incident adds one to
+its hour and cell, a merge only adds the severity it raised. timestamp stays
+fixed so a report arriving out of order cannot move the incident to an hour
+its rollup does not count it in (rebuild_rollups.py buckets by timestamp).
+"""
+import hashlib
+import os
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+from .db import db
+from .rollups import rollup_key, rollup_update
+
+
+MERGE_RADIUS_METERS = float(os.getenv("INCIDENT_MERGE_RADIUS_METERS", "250"))
+MERGE_WINDOW_HOURS = float(os.getenv("INCIDENT_MERGE_WINDOW_HOURS", "6"))
+# Sources whose url is a page of many entries rather than one report
+LISTING_SOURCE_PREFIXES = ("html:",)
+
+
+def report_key(event: Dict[str, Any]) -> str:
+    """Identity of one report: its url, or url#text-hash for listing pages and reports without a url."""
+    url = event.get("url") or ""
+    if url and not event.get("source", "").startswith(LISTING_SOURCE_PREFIXES):
+        return url
+    digest = hashlib.sha1(event.get("text", "").encode("utf-8")).hexdigest()[:16]
+    return f"{url}#{digest}"
+
+
+def source_entry(event: Dict[str, Any]) -> Dict[str, Any]:
+    """What an incident keeps about one contributing report."""
+    return {
+        "source": event.get("source", ""),
+        "url": event.get("url", ""),
+        "key": report_key(event),
+        "title": event.get("title", ""),
+        "timestamp": event.get("timestamp")
+    }
+
+
+def new_incident(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Event document for the first report of an incident."""
+    event["sources"] = [source_entry(event)]
+    event["report_count"] = 1
+    event["first_reported_at"] = event.get("timestamp")
+    event["last_reported_at"] = event.get("timestamp")
+    return event
+
+
+def lists_report(incident: Dict[str, Any], event: Dict[str, Any]) -> bool:
+    """Whether a stored incident already lists this report, including sources stored before report keys."""
+    key = report_key(event)
+    if report_key(incident) == key:
+        return True
+    for source in incident.get("sources", []):
+        if source.get("key", source.get("url")) == key:
+            return True
+    return False
+
+
+def merge_update(incident: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """MongoDB update folding one more report into a stored incident."""
+    timestamp = event.get("timestamp") or datetime.utcnow()
+    update: Dict[str, Any] = {
+        "$max": {
+            "severity": event.get("severity", 5),
+            "urgency": event.get("urgency", 0),
+            "safety_score": event.get("safety_score", 0),
+            "static_score": event.get("static_score", 0),
+            "last_reported_at": timestamp
+        },
+        # Incidents stored before first_reported_at existed start from their timestamp
+        "$min": {"first_reported_at": min(timestamp, incident.get("timestamp") or timestamp)}
+    }
+    if "sources" in incident:
+        update["$push"] = {"sources": source_entry(event)}
+        update["$inc"] = {"report_count": 1}
+    else:
+        # Stored before merging existed: the incident's own report becomes its first source
+        update["$push"] = {"sources": {"$each": [source_entry(incident), source_entry(event)]}}
+        update["$set"] = {"report_count": 2}
+    return update
+
+
+async def store_event(event: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Store an event as a new incident or merge it into a matching one.
+
+    Returns (incident_id, outcome) with outcome "new", "merged" or
+    "duplicate" (a report the incident already lists).
+    """
+    mergeable = not event.get("approximate_location")
+    if mergeable and MERGE_RADIUS_METERS > 0 and MERGE_WINDOW_HOURS > 0 and event.get("timestamp"):
+        incident = await db.find_incident(event, MERGE_RADIUS_METERS, MERGE_WINDOW_HOURS)
+        if incident is not None:
+            merged = False
+            if not lists_report(incident, event):
+                merged = await db.merge_into_incident(incident["_id"], merge_update(incident, event), report_key(event))
+            if merged:
+                raised = max(0, event.get("severity", 5) - incident.get("severity", 5))
+                await _update_rollup(incident, 0, raised, event.get("safety_score", 0))
+            return str(incident["_id"]), "merged" if merged else "duplicate"
+
+    incident_id = await db.insert_event(new_incident(event))
+    await _update_rollup(event, 1, event.get("severity", 5), event.get("safety_score", 0))
+    return incident_id, "new"
+
+
+async def _update_rollup(incident: Dict[str, Any], count: int, severity: float, safety_score: float):
+    """Best effort: rollups can be rebuilt (scripts/rebuild_rollups.py), a lost event cannot."""
+    try:
+        key = rollup_key(incident)
+        await db.apply_rollup(key, rollup_update(key, count, severity, safety_score))
+    except Exception as e:
+        print(f"Rollup update failed: {e}")
@@ -0,0 +1,212 @@
+"""Ingest worker: scrape, classify, geocode, score and store events.
+
+    python -m app.ingest            ingest every INGEST_INTERVAL_HOURS and archive hourly
+    python -m app.ingest --once     one ingestion pass, then exit
+    python -m app.ingest --city X   ingest city X of CITIES_FILE (default: CITY)
+
+A worker ingests one city (app/cities.py): its sources and gazetteer, into
+its own database. Run one worker per city, on that city's node.
+
+The scraper, LLM client and geocoder are imported here and by app.main,
+never by the read API (app/api.py).
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from .cities import get_city
+from .db import db
+from .scraper import run_one_shot
+from .llm import analyze_article
+from .llm_client import MAX_CONCURRENCY as LLM_MAX_CONCURRENCY, close_llm_client
+from .loopmon import start_loop_monitor, stop_loop_monitor
+from .geocode import geocode
+from .scoring import score_fields
+from .incidents import store_event
+from .metrics import EVENTS_INGESTED, INCIDENT_REPORTS, stage
+
+
+INTERVAL_HOURS = float(os.getenv("INGEST_INTERVAL_HOURS", "6"))
+
+# The pass in progress, joined by callers that arrive while it runs
+_current_pass: Optional[asyncio.Task] = None
+
+
+async def classify_articles(articles: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Run analyze_article over all articles with a pool of concurrent workers.
+
+    Workers pull articles as they free up, so an article's LLM deadline only
+    starts once it is actually sent. Each result is (analysis, llm_analysis)
+    or the exception raised for that article.
+    """
+    results: List[Any] = [None] * len(articles)
+    pending = iter(enumerate(articles))
+    
+    async def worker():
+        for i, article in pending:
+            try:
+                with stage("ingest", "analyze"):
+                    results[i] = await analyze_article(article["text"])
+            except Exception as e:
+                results[i] = e
+    
+    await asyncio.gather(*(worker() for _ in range(min(LLM_MAX_CONCURRENCY, len(articles)))))
+    return results
+
+
+async def run_ingest() -> Dict[str, int]:
+    """
+    One ingestion pass over this city's sources; returns the IngestResponse counts.
+
+    A call made while a pass is running (the scheduler and /ingest/one-shot
+    overlapping) joins that pass instead of scraping every source again.
+    """
+    global _current_pass
+    loop = asyncio.get_running_loop()
+    if _current_pass is None or _current_pass.done() or _current_pass.get_loop() is not loop:
+        _current_pass = loop.create_task(_ingest_pass())
+    return await asyncio.shield(_current_pass)
+
+
+async def _ingest_pass() -> Dict[str, int]:
+    city = db.city
+    # Scraping and geocoding block on HTTP, so they run in worker threads
+    with stage("ingest", "scrape"):
+        articles = await asyncio.to_thread(run_one_shot, city)
+    events_stored = 0
+    events_merged = 0
+    llm_calls_avoided = 0
+
+    # Analyze with the relevance prefilter and/or LLM, concurrently
+    analyses = await classify_articles(articles)
+
+    for article, result in zip(articles, analyses):
+        try:
+            if isinstance(result, Exception):
+                raise result
+            analysis, llm_analysis = result
+
+            # Keep LLM outputs to train the relevance prefilter
+            if llm_analysis and llm_analysis.get("analyzer") == "llm":
+                await db.record_classification({
+                    "source": article["source"],
+                    "text": article["text"],
+                    "type": llm_analysis.get("type", "other"),
+                    "severity": llm_analysis.get("severity", 5)
+                })
+
+            if llm_analysis is None:
+                llm_calls_avoided += 1
+
+            # Skip articles the prefilter dropped as irrelevant
+            if analysis is None:
+                continue
+
+            with stage("ingest", "geocode"):
+                # Geocode if address hint exists
+                coordinates = None
+                if analysis.get("address_hint"):
+                    coordinates = await asyncio.to_thread(geocode, analysis["address_hint"], city)
+
+                # If geocoding failed, try geocoding the title or first part of text
+                if not coordinates:
+                    # Try to geocode title or first sentence
+                    geocode_text = article.get("title", "")[:100]
+                    coordinates = await asyncio.to_thread(geocode, geocode_text, city)
+
+            # Skip if no coordinates found
+            if not coordinates:
+                print(f"Skipping article (no coordinates): {article.get('title', 'No title')}")
+                continue
+            # Reads are routed by service area, so events outside it would never be found
+            if not city.contains(coordinates["lat"], coordinates["lng"]):
+                print(f"Skipping article (outside {city.name}): {article.get('title', 'No title')}")
+                continue
+
+            # Create event document
+            event = {
+                "source": article["source"],
+                "title": article.get("title", ""),
+                "text": article.get("text", ""),
+                "url": article.get("url", ""),
+                "timestamp": article.get("published", datetime.utcnow()),
+                "coordinates": {
+                    "type": "Point",
+                    "coordinates": [coordinates["lng"], coordinates["lat"]],
+                    "lat": coordinates["lat"],
+                    "lng": coordinates["lng"]
+                },
+                "approximate_location": bool(coordinates.get("approximate")),
+                "event_type": analysis.get("type", "other"),
+                "severity": analysis.get("severity", 5),
+                "urgency": analysis.get("urgency", 0),
+                "address_hint": analysis.get("address_hint"),
+                "notes": analysis.get("notes", ""),
+                "analyzer": analysis.get("analyzer")
+            }
+
+            # Compute safety score
+            with stage("ingest", "score"):
+                event.update(score_fields(event))
+
+            # Store as a new incident, or merge into a matching one
+            with stage("ingest", "store"):
+                _, outcome = await store_event(event)
+            INCIDENT_REPORTS.labels(outcome).inc()
+            if outcome == "new":
+                events_stored += 1
+            elif outcome == "merged":
+                events_merged += 1
+            if outcome != "duplicate":
+                EVENTS_INGESTED.labels(event["source"]).inc()
+
+        except Exception as e:
+            print(f"Error processing article: {e}")
+            continue
+    
+    return {
+        "events_processed": len(articles),
+        "events_stored": events_stored,
+        "events_merged": events_merged,
+        "llm_calls_avoided": llm_calls_avoided
+    }
+
+
+async def run_worker(once: bool = False, interval_hours: float = INTERVAL_HOURS):
+    """Connect, then ingest once or keep the scheduler running until cancelled."""
+    from .scheduler import start_scheduler, stop_scheduler
+
+    start_loop_monitor()
+    await db.connect()
+    try:
+        if once:
+            print(f"Ingestion completed: {await run_ingest()}")
+            return
+        start_scheduler(interval_hours)
+        await asyncio.Event().wait()
+    finally:
+        stop_scheduler()
+        await db.disconnect()
+        await close_llm_client()
+        stop_loop_monitor()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Urban Pulse ingest worker")
+    parser.add_argument("--once", action="store_true", help="run one ingestion pass and exit")
+    parser.add_argument("--interval-hours", type=float, default=INTERVAL_HOURS)
+    parser.add_argument("--city", help="city of CITIES_FILE to ingest (default: CITY, else the first)")
+    args = parser.parse_args()
+    if args.city:
+        db.city_name = get_city(args.city).name  # fails early on an unknown city
+    try:
+        asyncio.run(run_worker(args.once, args.interval_hours))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
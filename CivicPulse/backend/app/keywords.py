@@ -0,0 +1,126 @@
+"""Shared keyword matching for the fallback classifier, scorer and scraper."""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+
+# Fallback classifier categories, in priority order (first hit wins)
+EVENT_CATEGORY_KEYWORDS = {
+    "major_crime": ["murder", "homicide", "shooting", "stabbing", "rape", "assault with weapon", "armed robbery"],
+    "minor_crime": ["theft", "burglary", "vandalism", "petty theft", "shoplifting"],
+    "accident": ["accident", "crash", "collision", "car accident", "traffic accident"],
+    "environmental": ["fire", "flood", "storm", "natural disaster", "hazardous material"],
+    "infrastructure": ["power outage", "water main", "bridge", "road closure", "construction"],
+    "public_disorder": ["protest", "riot", "disturbance", "unrest", "crowd"],
+}
+
+# Additional risk added by compute_score
+HIGH_RISK_KEYWORDS = ["shooting", "murder", "homicide", "stabbing", "fire", "explosion"]
+MEDIUM_RISK_KEYWORDS = ["assault", "robbery", "accident", "crash", "emergency"]
+
+# Elements of a police blotter page worth keeping
+BLOTTER_KEYWORDS = [
+    "arrest", "robbery", "assault", "theft", "burglary",
+    "accident", "crash", "collision", "fire", "emergency",
+    "incident", "crime", "violence", "shooting", "stabbing"
+]
+
+# CPython's substring search beats one combined regex pass until the keyword
+# set gets fairly large (see the keyword cases in scripts/bench_scoring.py),
+# so small sets are scanned keyword by keyword and larger ones use a single
+# trie-shaped regex. Both report exactly what `kw in text` would.
+REGEX_MIN_KEYWORDS = 64
+MAX_CACHED_TEXT = 8192
+
+
+class KeywordMatcher:
+    """
+    Case-insensitive substring matcher over named keyword categories.
+
+    match() returns every category with at least one keyword occurring in the
+    text, computed in one call. Results are memoized per text, since the same
+    event text is scored again on every route evaluation.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]], cache_size: int = 4096):
+        self.categories: Dict[str, FrozenSet[str]] = {}
+        keyword_categories: Dict[str, set] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                keyword_categories.setdefault(keyword, set()).add(category)
+
+        # A match of a longer keyword also implies every keyword inside it
+        # ("assault with weapon" contains "assault").
+        for keyword in keyword_categories:
+            self.categories[keyword] = frozenset(
+                c for other, other_cats in keyword_categories.items() if other in keyword for c in other_cats
+            )
+
+        self.keywords: Tuple[str, ...] = tuple(sorted(self.categories))
+        self._pattern = None
+        if len(self.keywords) >= REGEX_MIN_KEYWORDS:
+            # Lookahead finds a match at every position, so overlapping
+            # keywords ("car accident" / "accident") are all reported.
+            self._pattern = re.compile(f"(?=({_trie_pattern(self.keywords)}))")
+        self._cached_match = lru_cache(maxsize=cache_size)(self._match)
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """Categories with at least one keyword in text."""
+        # Huge texts (whole blotter pages) are not worth pinning in the cache
+        if len(text) > MAX_CACHED_TEXT:
+            return self._match(text)
+        return self._cached_match(text)
+
+    def _match(self, text: str) -> FrozenSet[str]:
+        text = text.lower()
+        hits = set()
+        if self._pattern is not None:
+            for keyword in set(self._pattern.findall(text)):
+                hits |= self.categories[keyword]
+        else:
+            for keyword in self.keywords:
+                if keyword in text:
+                    hits |= self.categories[keyword]
+        return frozenset(hits)
+
+    def match_many(self, texts: Iterable[str]) -> List[FrozenSet[str]]:
+        """Match a batch of texts."""
+        return [self.match(text) for text in texts]
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Regex alternation shaped as a prefix trie, preferring the longest keyword."""
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+# One matcher for every built-in category: a single call answers the
+# classifier, scorer and scraper questions about a text.
+SAFETY_KEYWORDS = KeywordMatcher({
+    **EVENT_CATEGORY_KEYWORDS,
+    "high_risk": HIGH_RISK_KEYWORDS,
+    "medium_risk": MEDIUM_RISK_KEYWORDS,
+    "blotter": BLOTTER_KEYWORDS,
+})
+
+
+@lru_cache(maxsize=32)
+def keyword_matcher(keywords: Tuple[str, ...]) -> KeywordMatcher:
+    """Matcher for a custom keyword list, reported under the "match" category."""
+    return KeywordMatcher({"match": keywords})
@@ -1,140 +1,150 @@
 """LLM analysis module for classifying safety events."""
-import os
 import json
+import random
 import re
-from typing import Dict, Any, Optional
-from openai import OpenAI
-
-
-EVENT_TYPES = [
-    "major_crime",
-    "minor_crime",
-    "accident",
-    "environmental",
-    "infrastructure",
-    "public_disorder",
-    "other"
+from typing import Dict, Any, List, Optional, Tuple
+
+from .compaction import fit_token_budget
+from .events import EVENT_TYPES
+from .keywords import EVENT_CATEGORY_KEYWORDS, SAFETY_KEYWORDS
+from .llm_client import LLMUnavailable, get_llm_client
+from .metrics import LLM_FALLBACKS, RELEVANCE_AGREEMENT, RELEVANCE_DECISIONS
+from .relevance import SHADOW_RATE, get_model
+
+
+# Fallback severity per event category, in EVENT_CATEGORY_KEYWORDS priority order
+FALLBACK_SEVERITY = {
+    "major_crime": 9,
+    "minor_crime": 4,
+    "accident": 6,
+    "environmental": 7,
+    "infrastructure": 5,
+    "public_disorder": 6,
+}
+
+# Fixed instructions, sent as the system message so each article only adds its own text
+SYSTEM_PROMPT = """You are a safety analysis expert. Classify the news article or social media post about a safety-related event and return ONLY valid JSON:
+{
+    "type": one of ["major_crime", "minor_crime", "accident", "environmental", "infrastructure", "public_disorder", "other"],
+    "severity": integer 1-10, potential harm to public safety (1=very minor, 10=very severe),
+    "address_hint": address, street, neighborhood or landmark mentioned (or null),
+    "notes": brief summary of the event,
+    "urgency": integer -100 to 100 from recency, severity and impact (-100=very safe, 0=neutral, 100=very urgent)
+}"""
+
+ADDRESS_PATTERNS = [
+    re.compile(r'\d+\s+[A-Z][a-z]+\s+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Drive|Dr|Lane|Ln|Way|Place|Pl)', re.IGNORECASE),
+    re.compile(r'[A-Z][a-z]+\s+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Drive|Dr)', re.IGNORECASE),
+    re.compile(r'\d+\s+[A-Z][a-z]+\s+(?:Street|St|Avenue|Ave|Road|Rd)', re.IGNORECASE),
+]
+NEIGHBORHOOD_PATTERNS = [
+    re.compile(r'(?:in|at|near|on)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s+(?:neighborhood|area|district|borough)'),
+    re.compile(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s+(?:neighborhood|area|district)'),
 ]
 
 
 def analyze_signal_fallback(text: str) -> Dict[str, Any]:
     """Fallback analysis using regex patterns when LLM is unavailable."""
-    text_lower = text.lower()
+    hits = SAFETY_KEYWORDS.match(text)
     
-    # Determine event type
+    # Determine event type: first matching category wins
     event_type = "other"
     severity = 5  # Default medium severity
+    for category in EVENT_CATEGORY_KEYWORDS:
+        if category in hits:
+            event_type = category
+            severity = FALLBACK_SEVERITY[category]
+            break
     
-    # Major crime keywords
-    major_crime_keywords = ["murder", "homicide", "shooting", "stabbing", "rape", "assault with weapon", "armed robbery"]
-    if any(kw in text_lower for kw in major_crime_keywords):
-        event_type = "major_crime"
-        severity = 9
-    
-    # Minor crime keywords
-    elif any(kw in text_lower for kw in ["theft", "burglary", "vandalism", "petty theft", "shoplifting"]):
-        event_type = "minor_crime"
-        severity = 4
-    
-    # Accident keywords
-    elif any(kw in text_lower for kw in ["accident", "crash", "collision", "car accident", "traffic accident"]):
-        event_type = "accident"
-        severity = 6
-    
-    # Environmental keywords
-    elif any(kw in text_lower for kw in ["fire", "flood", "storm", "natural disaster", "hazardous material"]):
-        event_type = "environmental"
-        severity = 7
+    return {
+        "type": event_type,
+        "severity": severity,
+        "address_hint": extract_address_hint(text),
+        "notes": "Fallback regex analysis",
+        "urgency": severity * 10 - 50,  # Convert 1-10 to -50 to 50 range
+        "analyzer": "fallback"
+    }
+
+
+def extract_address_hint(text: str) -> Optional[str]:
+    """Extract an address or neighborhood name using common patterns."""
+    for pattern in ADDRESS_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(0)
     
-    # Infrastructure keywords
-    elif any(kw in text_lower for kw in ["power outage", "water main", "bridge", "road closure", "construction"]):
-        event_type = "infrastructure"
-        severity = 5
+    # If no address found, try to extract neighborhood/area names
+    for pattern in NEIGHBORHOOD_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
     
-    # Public disorder keywords
-    elif any(kw in text_lower for kw in ["protest", "riot", "disturbance", "unrest", "crowd"]):
-        event_type = "public_disorder"
-        severity = 6
+    return None
+
+
+async def analyze_article(text: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Classify an article, using the local relevance prefilter when a model is loaded.
+
+    Returns (analysis, llm_analysis): analysis is None when the prefilter drops
+    the article as irrelevant; llm_analysis is the LLM output whenever the LLM
+    was called (including shadow calls used to measure agreement).
+    """
+    model = get_model()
+    if model is None:
+        analysis = await analyze_signal(text)
+        return analysis, analysis
     
-    # Extract address hints using common patterns
-    address_hint = None
-    address_patterns = [
-        r'\d+\s+[A-Z][a-z]+\s+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Drive|Dr|Lane|Ln|Way|Place|Pl)',
-        r'[A-Z][a-z]+\s+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Drive|Dr)',
-        r'\d+\s+[A-Z][a-z]+\s+(?:Street|St|Avenue|Ave|Road|Rd)',
-    ]
+    decision = model.decide(text)
+    RELEVANCE_DECISIONS.labels(decision.action).inc()
+    if decision.action == "llm":
+        analysis = await analyze_signal(text)
+        return analysis, analysis
     
-    for pattern in address_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            address_hint = match.group(0)
-            break
+    # Shadow a sample of local decisions with the LLM to track agreement
+    llm_analysis = None
+    if random.random() < SHADOW_RATE:
+        llm_analysis = await analyze_signal(text)
+        if llm_analysis.get("analyzer") == "llm":
+            agreed = llm_analysis.get("type") == decision.label
+            RELEVANCE_AGREEMENT.labels(decision.action, str(agreed).lower()).inc()
     
-    # If no address found, try to extract neighborhood/area names
-    if not address_hint:
-        neighborhood_patterns = [
-            r'(?:in|at|near|on)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s+(?:neighborhood|area|district|borough)',
-            r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s+(?:neighborhood|area|district)'
-        ]
-        for pattern in neighborhood_patterns:
-            match = re.search(pattern, text)
-            if match:
-                address_hint = match.group(1)
-                break
+    if decision.action == "drop":
+        return None, llm_analysis
     
+    severity = int(round(model.severity.get(decision.label, 5)))
     return {
-        "type": event_type,
+        "type": decision.label,
         "severity": severity,
-        "address_hint": address_hint,
-        "notes": "Fallback regex analysis",
-        "urgency": severity * 10 - 50  # Convert 1-10 to -50 to 50 range
-    }
+        "address_hint": extract_address_hint(text),
+        "notes": f"Local relevance model (p={decision.confidence:.2f})",
+        "urgency": severity * 10 - 50,
+        "analyzer": "local"
+    }, llm_analysis
 
 
-def analyze_signal(text: str) -> Dict[str, Any]:
-    """Analyze a safety signal using OpenAI LLM or fallback."""
-    api_key = os.getenv("OPENAI_API_KEY")
+def build_messages(text: str) -> List[Dict[str, str]]:
+    """Chat messages classifying one article, its text cut to the token budget."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": fit_token_budget(text)}
+    ]
+
+
+async def analyze_signal(text: str, messages: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+    """Analyze a safety signal using OpenAI LLM or fallback; messages default to build_messages(text)."""
+    client = get_llm_client()
     
-    if not api_key:
-        print("OPENAI_API_KEY not set, using fallback analysis")
+    if client is None:
+        LLM_FALLBACKS.labels("no_api_key").inc()
         return analyze_signal_fallback(text)
     
     try:
-        client = OpenAI(api_key=api_key)
-        
-        prompt = f"""Analyze the following news article or social media post about a safety-related event. Extract key information and classify it.
-
-Text:
-{text[:2000]}  # Limit text length
-
-Please provide a JSON response with the following structure:
-{{
-    "type": one of ["major_crime", "minor_crime", "accident", "environmental", "infrastructure", "public_disorder", "other"],
-    "severity": integer from 1-10 (1=very minor, 10=very severe),
-    "address_hint": any address, street name, neighborhood, or location mentioned in the text (or null if none),
-    "notes": brief summary of the event,
-    "urgency": integer from -100 to 100 representing urgency/impact (-100=very safe/positive, 0=neutral, 100=very urgent/dangerous)
-}}
-
-Focus on:
-- Classifying the event type accurately
-- Assessing severity based on potential harm to public safety
-- Extracting any location information (addresses, street names, neighborhoods, landmarks)
-- Determining urgency based on recency, severity, and potential impact
-
-Return ONLY valid JSON, no additional text."""
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a safety analysis expert. Always return valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=300
-        )
-        
-        response_text = response.choices[0].message.content.strip()
+        response_text = (await client.complete(
+            messages or build_messages(text),
+            max_tokens=300,
+            temperature=0.3
+        )).strip()
         
         # Try to extract JSON from response
         json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
@@ -160,9 +170,19 @@ Return ONLY valid JSON, no additional text."""
         if urgency > 100:
             urgency = 100
         result["urgency"] = urgency
+        result["analyzer"] = "llm"
         
         return result
         
+    except LLMUnavailable as e:
+        LLM_FALLBACKS.labels(e.reason).inc()
+        print(f"OpenAI API unavailable ({e}), using fallback")
+        return analyze_signal_fallback(text)
+    except (ValueError, AttributeError) as e:
+        LLM_FALLBACKS.labels("invalid_response").inc()
+        print(f"Unparseable OpenAI response: {e}, using fallback")
+        return analyze_signal_fallback(text)
     except Exception as e:
+        LLM_FALLBACKS.labels("error").inc()
         print(f"OpenAI API error: {e}, using fallback")
         return analyze_signal_fallback(text)
@@ -0,0 +1,323 @@
+"""Long-lived async OpenAI client with rate limiting and adaptive concurrency.
+
+One AsyncOpenAI client is shared by every classification. Before each call the
+limiter takes one request and the call's estimated tokens from two token
+buckets (requests/minute and tokens/minute), so bursts from ingest queue up
+locally instead of being rejected by the API. The x-ratelimit-* headers on
+every response resync the buckets with the account's real limits and
+remaining budget, and the number of calls in flight grows additively while
+the budget is healthy and halves on a 429 (AIMD).
+
+Rate limits, timeouts, connection errors and 5xx responses are retried with
+full-jitter exponential backoff (honoring retry-after) until the call's
+deadline; anything else fails immediately. A failed call raises LLMUnavailable
+with a reason, which callers report when falling back.
+
+The deadline is also cut to the caller's request deadline (app/resilience.py),
+and calls go through the "openai" circuit breaker: while it is open they fail
+at once with reason circuit_open instead of waiting out timeouts.
+"""
+import asyncio
+import os
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import openai
+from openai import AsyncOpenAI
+
+from .metrics import LLM_CONCURRENCY, LLM_RETRIES, upstream
+from .resilience import get_upstream, remaining
+
+
+MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "60000"))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "15"))
+BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "0.5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+# Below this fraction of the window's budget left, stop growing concurrency
+LOW_BUDGET_FRACTION = 0.1
+CHARS_PER_TOKEN = 4
+# Failure reasons that count against the circuit breaker; rate limits and
+# rejected requests mean the API is up
+UNHEALTHY_REASONS = {"timeout", "connection_error", "server_error"}
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class LLMUnavailable(Exception):
+    """The LLM could not answer before the deadline; reason is a short metric label."""
+
+    def __init__(self, reason: str, message: str = ""):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Tokens a request counts against the TPM limit: prompt estimate plus max_tokens."""
+    chars = sum(len(m.get("content", "")) for m in messages)
+    return chars // CHARS_PER_TOKEN + 4 * len(messages) + max_tokens
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds from rate-limit reset values such as "1s", "6m0s" or "20ms"."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+class TokenBucket:
+    """Continuously refilled bucket holding up to one minute of budget."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60.0
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available (0 when it already is)."""
+        # A request larger than the whole bucket can only ever go through a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], now: float):
+        """Adopt the server's view of the limit and what is left in this window."""
+        self.refill(now)
+        if limit:
+            self.capacity = limit
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining, self.capacity)
+
+
+class RateLimiter:
+    """Requests/minute and tokens/minute buckets taken together."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int, deadline: float):
+        """Wait for one request and tokens of budget, or raise once the deadline would pass."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if wait <= 0:
+                    self.requests.tokens -= 1
+                    self.tokens.tokens -= min(tokens, self.tokens.capacity)
+                    return
+                if now + wait > deadline:
+                    raise LLMUnavailable("rate_limited", f"limiter wait {wait:.1f}s exceeds deadline")
+                await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, used: int):
+        """Return over-estimated tokens to the bucket (or take the shortfall)."""
+        self.tokens.tokens = min(self.tokens.capacity, self.tokens.tokens + estimated - used)
+
+    def sync(self, headers):
+        now = time.monotonic()
+        self.requests.sync(_header_float(headers, "x-ratelimit-limit-requests"),
+                           _header_float(headers, "x-ratelimit-remaining-requests"), now)
+        self.tokens.sync(_header_float(headers, "x-ratelimit-limit-tokens"),
+                         _header_float(headers, "x-ratelimit-remaining-tokens"), now)
+
+
+def _header_float(headers, name: str) -> Optional[float]:
+    value = headers.get(name) if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class AdaptiveConcurrency:
+    """Semaphore whose limit grows additively on healthy responses and halves on 429s."""
+
+    def __init__(self, initial: int, maximum: int):
+        self.maximum = max(1, maximum)
+        self.limit = float(min(max(1, initial), self.maximum))
+        self.in_flight = 0
+        self._changed = asyncio.Condition()
+        LLM_CONCURRENCY.set(int(self.limit))
+
+    async def acquire(self, deadline: float):
+        async with self._changed:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMUnavailable("deadline", "no LLM slot before deadline")
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    raise LLMUnavailable("deadline", "no LLM slot before deadline")
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    async def on_success(self, budget_fraction: Optional[float]):
+        if budget_fraction is not None and budget_fraction < LOW_BUDGET_FRACTION:
+            return
+        await self._set(self.limit + 1.0 / self.limit)
+
+    async def on_rate_limited(self):
+        await self._set(self.limit / 2)
+
+    async def _set(self, limit: float):
+        async with self._changed:
+            self.limit = min(float(self.maximum), max(1.0, limit))
+            LLM_CONCURRENCY.set(int(self.limit))
+            self._changed.notify_all()
+
+
+def _budget_fraction(headers) -> Optional[float]:
+    """Smallest remaining/limit ratio across the request and token windows."""
+    fractions = []
+    for kind in ("requests", "tokens"):
+        limit = _header_float(headers, f"x-ratelimit-limit-{kind}")
+        remaining = _header_float(headers, f"x-ratelimit-remaining-{kind}")
+        if limit and remaining is not None:
+            fractions.append(remaining / limit)
+    return min(fractions) if fractions else None
+
+
+def _retry_delay(attempt: int, headers) -> float:
+    """Full-jitter exponential backoff, but never sooner than the server asked."""
+    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_SECONDS * (2 ** attempt)))
+    asked = None
+    if headers is not None:
+        if headers.get("retry-after-ms"):
+            asked = parse_duration(headers["retry-after-ms"] + "ms")
+        else:
+            asked = parse_duration(headers.get("retry-after"))
+    return max(delay, asked or 0.0)
+
+
+class LLMClient:
+    """Shared AsyncOpenAI client behind the rate limiter and adaptive concurrency."""
+
+    def __init__(self, api_key: str):
+        # Retries are ours: the SDK's own would ignore the deadline and the limiter
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0, timeout=REQUEST_TIMEOUT_SECONDS)
+        self.limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+        self.concurrency = AdaptiveConcurrency(INITIAL_CONCURRENCY, MAX_CONCURRENCY)
+
+    async def complete(self, messages: List[Dict[str, str]], max_tokens: int = 300,
+                       temperature: float = 0.3, deadline_seconds: float = DEADLINE_SECONDS) -> str:
+        """Message content of one chat completion, retried until the deadline."""
+        breaker = get_upstream("openai", REQUEST_TIMEOUT_SECONDS).breaker
+        if not breaker.allow():
+            raise LLMUnavailable("circuit_open")
+        try:
+            content = await self._complete(messages, max_tokens, temperature, remaining(deadline_seconds))
+        except LLMUnavailable as e:
+            breaker.record(e.reason not in UNHEALTHY_REASONS)
+            raise
+        except Exception:
+            breaker.record(False)
+            raise
+        breaker.record(True)
+        return content
+
+    async def _complete(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                        deadline_seconds: float) -> str:
+        deadline = time.monotonic() + deadline_seconds
+        estimated = estimate_tokens(messages, max_tokens)
+        attempt = 0
+        while True:
+            await self.concurrency.acquire(deadline)
+            try:
+                await self.limiter.acquire(estimated, deadline)
+                timeout = min(REQUEST_TIMEOUT_SECONDS, deadline - time.monotonic())
+                if timeout <= 0:
+                    raise LLMUnavailable("deadline")
+                with upstream("openai"):
+                    raw = await self.client.chat.completions.with_raw_response.create(
+                        model=MODEL, messages=messages, temperature=temperature,
+                        max_tokens=max_tokens, timeout=timeout
+                    )
+                    response = raw.parse()
+            except openai.RateLimitError as e:
+                headers = e.response.headers
+                self.limiter.sync(headers)
+                await self.concurrency.on_rate_limited()
+                reason = "rate_limited"
+            except openai.APITimeoutError:
+                headers, reason = None, "timeout"
+            except openai.APIConnectionError:
+                headers, reason = None, "connection_error"
+            except openai.InternalServerError as e:
+                headers, reason = e.response.headers, "server_error"
+            except openai.APIStatusError as e:
+                raise LLMUnavailable("api_error", f"{e.status_code}: {e.message}")
+            else:
+                self.limiter.sync(raw.headers)
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    self.limiter.settle(estimated, usage.total_tokens)
+                await self.concurrency.on_success(_budget_fraction(raw.headers))
+                return response.choices[0].message.content or ""
+            finally:
+                await self.concurrency.release()
+
+            delay = _retry_delay(attempt, headers)
+            if time.monotonic() + delay >= deadline:
+                raise LLMUnavailable(reason, f"{reason}, deadline reached after {attempt + 1} attempts")
+            LLM_RETRIES.labels(reason).inc()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        await self.client.close()
+
+
+_client: Optional[LLMClient] = None
+_client_loop: Any = None
+
+
+def get_llm_client() -> Optional[LLMClient]:
+    """Shared client for the running event loop; None without OPENAI_API_KEY."""
+    global _client, _client_loop
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    loop = asyncio.get_running_loop()
+    # The underlying connection pool and locks belong to one event loop
+    if _client is None or _client_loop is not loop:
+        _client = LLMClient(api_key)
+        _client_loop = loop
+    return _client
+
+
+async def close_llm_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.close()
+    _client, _client_loop = None, None
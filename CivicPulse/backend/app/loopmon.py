@@ -0,0 +1,160 @@
+"""Event-loop health: lag metric, blocked-loop watchdog and strict blocking-call mode.
+
+start_loop_monitor() runs on API startup and in the ingest worker:
+
+- A probe task sleeps LOOP_PROBE_SECONDS at a time and records how late it
+  wakes up as urbanpulse_event_loop_lag_seconds. Every other coroutine on the
+  loop waited at least that long too.
+- A watchdog thread notices when the probe has not run for
+  LOOP_BLOCK_SECONDS, i.e. the loop thread is stuck in synchronous code. It
+  captures that thread's stack once per stall, prints it, counts it in
+  urbanpulse_event_loop_blocks_total and keeps the last few for /admin/loop.
+- With LOOP_STRICT=1 (development) an audit hook flags synchronous I/O made
+  on the loop thread while the loop is running: blocking socket connects,
+  DNS lookups, time.sleep (Python 3.12+), subprocesses and file opens (imports excepted).
+  Each call site is printed once with its stack; every call is counted in
+  urbanpulse_blocking_calls_total.
+"""
+import asyncio
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Dict
+
+from .metrics import BLOCKING_CALLS, LOOP_BLOCKS, LOOP_LAG
+
+
+PROBE_SECONDS = float(os.getenv("LOOP_PROBE_SECONDS", "0.1"))
+BLOCK_SECONDS = float(os.getenv("LOOP_BLOCK_SECONDS", "0.5"))
+STRICT = os.getenv("LOOP_STRICT", "0").lower() in ("1", "true", "yes")
+RECENT_REPORTS = 20
+STACK_LIMIT = 30
+# Audit events that mean synchronous I/O
+BLOCKING_EVENTS = {
+    "socket.connect", "socket.getaddrinfo", "socket.gethostbyname", "time.sleep",
+    "open", "subprocess.Popen", "os.system",
+}
+IMPORT_SUFFIXES = (".py", ".pyc", ".so", ".pth", ".zip")
+# A blocking call is attributed to the first caller outside these
+LIBRARY_DIRS = tuple({sysconfig.get_paths()[key] for key in ("stdlib", "platstdlib", "purelib", "platlib")})
+
+_state: Dict[str, Any] = {"loop": None, "thread_id": None, "heartbeat": 0.0, "lag": 0.0, "task": None}
+_blocks: deque = deque(maxlen=RECENT_REPORTS)
+_blocking_sites: Dict[tuple, Dict[str, Any]] = {}
+_hook_installed = False
+_in_hook = threading.local()
+
+
+def start_loop_monitor(strict: bool = STRICT):
+    """Start the lag probe and watchdog for the running loop (once per loop)."""
+    loop = asyncio.get_running_loop()
+    if _state["loop"] is loop:
+        return
+    _state.update(loop=loop, thread_id=threading.get_ident(), heartbeat=time.monotonic())
+    _state["task"] = loop.create_task(_probe())
+    threading.Thread(target=_watchdog, args=(loop,), name="loop-watchdog", daemon=True).start()
+    if strict:
+        install_strict_hook()
+    print(f"Event loop monitor started (probe {PROBE_SECONDS}s, block threshold {BLOCK_SECONDS}s"
+          f"{', strict' if strict else ''})")
+
+
+def stop_loop_monitor():
+    task = _state.get("task")
+    if task is not None:
+        task.cancel()
+    _state.update(loop=None, task=None)
+
+
+async def _probe():
+    while True:
+        expected = time.monotonic() + PROBE_SECONDS
+        await asyncio.sleep(PROBE_SECONDS)
+        now = time.monotonic()
+        lag = max(0.0, now - expected)
+        _state["lag"] = lag
+        _state["heartbeat"] = now
+        LOOP_LAG.observe(lag)
+
+
+def _watchdog(loop):
+    reported = None
+    while _state["loop"] is loop and not loop.is_closed():
+        time.sleep(PROBE_SECONDS)
+        heartbeat = _state["heartbeat"]
+        stalled = time.monotonic() - heartbeat - PROBE_SECONDS
+        if stalled < BLOCK_SECONDS or reported == heartbeat:
+            continue
+        # One report per stall: the heartbeat only moves once the loop runs again
+        reported = heartbeat
+        frame = sys._current_frames().get(_state["thread_id"])
+        stack = traceback.format_stack(frame, limit=STACK_LIMIT) if frame is not None else []
+        LOOP_BLOCKS.inc()
+        _blocks.append({"at": time.time(), "blocked_seconds": round(stalled, 3), "stack": stack})
+        print(f"Event loop blocked for {stalled:.2f}s in:\n{''.join(stack)}")
+
+
+def install_strict_hook():
+    """Flag synchronous I/O on the loop thread; audit hooks cannot be removed, so this installs once."""
+    global _hook_installed
+    if not _hook_installed:
+        sys.addaudithook(_audit)
+        _hook_installed = True
+
+
+def _is_blocking(event: str, args: tuple) -> bool:
+    if event == "socket.connect":
+        # Sockets the loop itself drives are non-blocking
+        return args[0].gettimeout() != 0.0
+    if event == "open":
+        path = args[0]
+        return isinstance(path, (str, bytes)) and not str(path).endswith(IMPORT_SUFFIXES)
+    if event == "time.sleep":
+        return bool(args) and args[0] > 0
+    return True
+
+
+def _audit(event: str, args: tuple):
+    if event not in BLOCKING_EVENTS or threading.get_ident() != _state["thread_id"]:
+        return
+    if getattr(_in_hook, "active", False) or asyncio._get_running_loop() is None:
+        return
+    _in_hook.active = True
+    try:
+        if not _is_blocking(event, args):
+            return
+        BLOCKING_CALLS.labels(event).inc()
+        frames = traceback.extract_stack(sys._getframe(1), limit=STACK_LIMIT)
+        site = _call_site(frames)
+        key = (event, site)
+        if key in _blocking_sites:
+            _blocking_sites[key]["count"] += 1
+            return
+        stack = traceback.format_list(frames)
+        _blocking_sites[key] = {"event": event, "site": site, "count": 1, "stack": stack}
+        print(f"Blocking call on the event loop: {event} at {site}\n{''.join(stack)}")
+    finally:
+        _in_hook.active = False
+
+
+def _call_site(frames) -> str:
+    """Innermost frame outside the standard library and installed packages, else the innermost."""
+    for frame in reversed(frames):
+        if not frame.filename.startswith(LIBRARY_DIRS) and frame.filename != __file__:
+            return f"{frame.filename}:{frame.lineno}"
+    return f"{frames[-1].filename}:{frames[-1].lineno}" if frames else "unknown"
+
+
+def loop_report() -> Dict[str, Any]:
+    """Current lag, recent stalls and (in strict mode) blocking call sites, for /admin/loop."""
+    return {
+        "running": _state["loop"] is not None,
+        "lag_seconds": round(_state["lag"], 4),
+        "strict": _hook_installed,
+        "blocks": list(_blocks),
+        "blocking_calls": sorted(_blocking_sites.values(), key=lambda site: -site["count"]),
+    }
@@ -0,0 +1,233 @@
+"""Prometheus metrics for HTTP endpoints, pipeline stages and upstream calls."""
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo.monitoring import ConnectionPoolListener
+
+
+HTTP_LATENCY = Histogram(
+    "urbanpulse_http_request_duration_seconds",
+    "HTTP request latency by endpoint",
+    ["method", "route", "status"]
+)
+STAGE_LATENCY = Histogram(
+    "urbanpulse_stage_duration_seconds",
+    "Latency of ingest and route pipeline stages",
+    ["pipeline", "stage"]
+)
+UPSTREAM_REQUESTS = Counter(
+    "urbanpulse_upstream_requests_total",
+    "Requests to external services (Google, OpenAI, feeds) by outcome (ok, error, short_circuited)",
+    ["upstream", "outcome"]
+)
+UPSTREAM_HEDGES = Counter(
+    "urbanpulse_upstream_hedged_requests_total",
+    "Second attempts sent because the first was slower than the hedge percentile",
+    ["upstream"]
+)
+UPSTREAM_FALLBACKS = Counter(
+    "urbanpulse_upstream_fallbacks_total",
+    "Requests answered by a fallback because an upstream failed or its circuit was open",
+    ["upstream", "fallback"]
+)
+CIRCUIT_STATE = Gauge(
+    "urbanpulse_upstream_circuit_state",
+    "Circuit breaker state per upstream (0 closed, 1 half-open, 2 open)",
+    ["upstream"]
+)
+UPSTREAM_LATENCY = Histogram(
+    "urbanpulse_upstream_request_duration_seconds",
+    "Latency of requests to external services",
+    ["upstream"]
+)
+EVENTS_INGESTED = Counter(
+    "urbanpulse_events_ingested_total",
+    "Events stored by ingest, by source",
+    ["source"]
+)
+INCIDENT_REPORTS = Counter(
+    "urbanpulse_incident_reports_total",
+    "Ingested reports by merge outcome (new incident, merged, duplicate)",
+    ["outcome"]
+)
+RELEVANCE_DECISIONS = Counter(
+    "urbanpulse_relevance_decisions_total",
+    "Local relevance prefilter decisions (drop, local, llm)",
+    ["decision"]
+)
+RELEVANCE_AGREEMENT = Counter(
+    "urbanpulse_relevance_agreement_total",
+    "Shadowed local decisions by agreement with the LLM",
+    ["decision", "agreed"]
+)
+LLM_FALLBACKS = Counter(
+    "urbanpulse_llm_fallbacks_total",
+    "Articles classified by the regex fallback instead of the LLM, by reason",
+    ["reason"]
+)
+LLM_RETRIES = Counter(
+    "urbanpulse_llm_retries_total",
+    "Retried LLM calls by reason",
+    ["reason"]
+)
+LLM_CONCURRENCY = Gauge(
+    "urbanpulse_llm_concurrency_limit",
+    "Current adaptive limit on concurrent LLM calls"
+)
+PROMPT_TOKENS_SAVED = Counter(
+    "urbanpulse_llm_prompt_tokens_saved_total",
+    "Estimated article tokens kept out of LLM prompts, by step (cleanup, budget)",
+    ["step"]
+)
+EVENTS_RESCORED = Counter(
+    "urbanpulse_events_rescored_total",
+    "Stored safety scores brought up to date by background rescoring, by collection",
+    ["collection"]
+)
+GEOCODE_LOOKUPS = Counter(
+    "urbanpulse_geocode_lookups_total",
+    "Geocode lookups by resolver (gazetteer exact/prefix/fuzzy/text, google, miss)",
+    ["resolver"]
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "urbanpulse_db_pool_connections",
+    "MongoDB pool connections (open, in_use)",
+    ["state"]
+)
+CITY_SHARD_QUERIES = Counter(
+    "urbanpulse_city_shard_queries_total",
+    "Event reads routed to each city's database",
+    ["city"]
+)
+LOOP_LAG = Histogram(
+    "urbanpulse_event_loop_lag_seconds",
+    "How late the event loop ran a probe scheduled every LOOP_PROBE_SECONDS",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+LOOP_BLOCKS = Counter(
+    "urbanpulse_event_loop_blocks_total",
+    "Stalls where the event loop did not run for LOOP_BLOCK_SECONDS"
+)
+BLOCKING_CALLS = Counter(
+    "urbanpulse_blocking_calls_total",
+    "Synchronous I/O on the event loop thread seen in strict mode, by audit event",
+    ["event"]
+)
+
+
+@contextmanager
+def stage(pipeline: str, name: str):
+    """Time one stage of the ingest or route pipeline."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(pipeline, name).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def upstream(name: str):
+    """Time and count one call to an external service; exceptions count as errors."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_REQUESTS.labels(name, "error").inc()
+        raise
+    else:
+        UPSTREAM_REQUESTS.labels(name, "ok").inc()
+    finally:
+        UPSTREAM_LATENCY.labels(name).observe(time.perf_counter() - start)
+
+
+class PoolMetricsListener(ConnectionPoolListener):
+    """Track open and checked-out MongoDB connections."""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        DB_POOL_CONNECTIONS.labels("open").inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        DB_POOL_CONNECTIONS.labels("open").dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        DB_POOL_CONNECTIONS.labels("in_use").inc()
+
+    def connection_checked_in(self, event):
+        DB_POOL_CONNECTIONS.labels("in_use").dec()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route template.
+
+    Kept as plain ASGI (no BaseHTTPMiddleware) so the /events hot path only
+    pays for two clock reads and one histogram observation.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Dict[object, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_LATENCY.labels(scope["method"], self._route(scope), str(status[0])).observe(
+                time.perf_counter() - start
+            )
+
+    def _route(self, scope) -> str:
+        """Route template for the matched endpoint; raw paths would explode label cardinality."""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            for route in getattr(scope.get("app"), "routes", []):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            else:
+                path = getattr(endpoint, "__name__", "unknown")
+            self._route_paths[endpoint] = path
+        return path
+
+
+def render_latest():
+    """Return (body, content_type) for the /metrics endpoint."""
+    return generate_latest(), CONTENT_TYPE_LATEST
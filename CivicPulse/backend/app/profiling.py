@@ -0,0 +1,145 @@
+"""Opt-in sampled request profiling.
+
+A profiled request gets a sampler thread that records the request's stack every
+PROFILE_INTERVAL_MS. While the request runs on the event loop thread its real
+call stack is recorded (including blocking calls such as requests.get); while
+it is suspended on an await, its coroutine chain is recorded with an
+"[await]" leaf, which attributes upstream and database waits to the awaiting
+call site. Profiles are written in the folded-stack format read by
+flamegraph.pl, speedscope and inferno, into a bounded ring of files.
+
+Profiling is triggered by sampling (PROFILE_SAMPLE_RATE) or per request with an
+X-Profile header carrying PROFILE_TOKEN. With neither configured the middleware
+passes requests straight through.
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "/tmp/urbanpulse-profiles"))
+MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+HEADER = b"x-profile"
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame) -> List[str]:
+    """Root-first labels for a thread's current stack."""
+    stack = []
+    while frame is not None:
+        stack.append(_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _await_stack(coro) -> List[str]:
+    """Root-first labels for a suspended coroutine chain."""
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    stack.append("[await]")
+    return stack
+
+
+class RequestSampler:
+    """Background thread sampling one request's stack at a fixed interval."""
+
+    def __init__(self, task: asyncio.Task, thread_id: int, interval: float):
+        self.coro = task.get_coro()
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if getattr(self.coro, "cr_running", False):
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is None:
+                    continue
+                stack = _thread_stack(frame)
+            else:
+                stack = _await_stack(self.coro)
+            self.samples[";".join(stack)] += 1
+
+
+def write_profile(samples: Counter, name: str) -> Optional[Path]:
+    """Write folded stacks to PROFILE_DIR, then drop the oldest files beyond MAX_FILES."""
+    if not samples:
+        return None
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / f"{name}.folded"
+    path.write_text("".join(f"{stack} {count}\n" for stack, count in samples.items()))
+
+    profiles = sorted(PROFILE_DIR.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+    for old in profiles[:-MAX_FILES] if MAX_FILES > 0 else []:
+        old.unlink(missing_ok=True)
+    return path
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling sampled or explicitly requested HTTP requests."""
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = SAMPLE_RATE > 0 or bool(TOKEN)
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.time()
+        name = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(started))}-{int(started * 1000) % 1000:03d}-" \
+               f"{scope['method']}{scope['path'].replace('/', '_')}"
+        sampler = RequestSampler(asyncio.current_task(), threading.get_ident(), INTERVAL_MS / 1000.0)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", name.encode())]
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            try:
+                await asyncio.to_thread(write_profile, sampler.samples, name)
+            except OSError as e:
+                print(f"Profile write failed: {e}")
+
+    def _selected(self, scope) -> bool:
+        """Requested with the token, else picked by the sample rate (a wrong token is just not a request)."""
+        if TOKEN:
+            for key, value in scope.get("headers", []):
+                if key == HEADER and value.decode() == TOKEN:
+                    return True
+        return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
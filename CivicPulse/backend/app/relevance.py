@@ -0,0 +1,201 @@
+"""Local relevance prefilter run before LLM classification.
+
+A multinomial logistic regression over hashed word uni/bigrams, trained from
+past LLM classifications (scripts/train_relevance.py). Each article gets one of
+three decisions:
+
+- drop:  confidently "other" (not a safety event); skipped without an LLM call
+- local: confidently one event type; classified locally without an LLM call
+- llm:   everything in between goes to the LLM as before
+
+With no model at RELEVANCE_MODEL_PATH every article goes to the LLM.
+"""
+import json
+import math
+import os
+import random
+import re
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+MODEL_PATH = os.getenv("RELEVANCE_MODEL_PATH", "")
+DROP_THRESHOLD = float(os.getenv("RELEVANCE_DROP_THRESHOLD", "0.9"))
+LOCAL_THRESHOLD = float(os.getenv("RELEVANCE_LOCAL_THRESHOLD", "0.9"))
+SHADOW_RATE = float(os.getenv("RELEVANCE_SHADOW_RATE", "0.05"))
+N_BITS = 18
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def features(text: str, n_bits: int = N_BITS) -> List[int]:
+    """Hashed word unigram and bigram feature indices (stable across processes)."""
+    mask = (1 << n_bits) - 1
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return list({zlib.crc32(gram.encode()) & mask for gram in grams})
+
+
+@dataclass
+class Decision:
+    action: str  # "drop", "local" or "llm"
+    label: str
+    confidence: float
+
+
+class RelevanceModel:
+    """Sparse multinomial logistic regression over hashed n-grams."""
+
+    def __init__(self, classes: Sequence[str], n_bits: int = N_BITS):
+        self.classes = list(classes)
+        self.n_bits = n_bits
+        self.bias = [0.0] * len(self.classes)
+        self.weights: Dict[int, List[float]] = {}
+        self.severity: Dict[str, float] = {}
+        self.meta: Dict[str, Any] = {}
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        scores = list(self.bias)
+        n_classes = len(scores)
+        for index in features(text, self.n_bits):
+            row = self.weights.get(index)
+            if row is not None:
+                for k in range(n_classes):
+                    scores[k] += row[k]
+        return dict(zip(self.classes, _softmax(scores)))
+
+    def decide(self, text: str, drop_threshold: float = DROP_THRESHOLD,
+               local_threshold: float = LOCAL_THRESHOLD) -> Decision:
+        proba = self.predict_proba(text)
+        p_other = proba.get("other", 0.0)
+        if p_other >= drop_threshold:
+            return Decision("drop", "other", p_other)
+        label, confidence = max(((c, p) for c, p in proba.items() if c != "other"),
+                                key=lambda item: item[1], default=("other", 0.0))
+        if confidence >= local_threshold:
+            return Decision("local", label, confidence)
+        return Decision("llm", label, confidence)
+
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps({
+            "version": 1,
+            "classes": self.classes,
+            "n_bits": self.n_bits,
+            "bias": self.bias,
+            "severity": self.severity,
+            "meta": self.meta,
+            # Near-zero weights carry no signal; dropping them keeps the file small
+            "weights": {str(i): [round(w, 5) for w in row]
+                        for i, row in self.weights.items() if max(abs(w) for w in row) > 1e-4},
+        }))
+
+    @classmethod
+    def load(cls, path: str) -> "RelevanceModel":
+        data = json.loads(Path(path).read_text())
+        model = cls(data["classes"], data["n_bits"])
+        model.bias = data["bias"]
+        model.severity = data.get("severity", {})
+        model.meta = data.get("meta", {})
+        model.weights = {int(i): row for i, row in data["weights"].items()}
+        return model
+
+
+def _softmax(scores: List[float]) -> List[float]:
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+def train(samples: Sequence[Tuple[str, str, int]], classes: Sequence[str], epochs: int = 8,
+          learning_rate: float = 0.2, l2: float = 1e-6, seed: int = 13) -> RelevanceModel:
+    """
+    Fit a model with SGD on (text, label, severity) samples.
+
+    Labels outside classes are treated as "other".
+    """
+    model = RelevanceModel(classes)
+    class_index = {c: k for k, c in enumerate(model.classes)}
+    other = class_index.get("other", 0)
+    encoded = [(features(text), class_index.get(label, other)) for text, label, _ in samples]
+    n_classes = len(model.classes)
+    rng = random.Random(seed)
+
+    for epoch in range(epochs):
+        rng.shuffle(encoded)
+        rate = learning_rate / (1 + epoch)
+        for indices, target in encoded:
+            scores = list(model.bias)
+            rows = [model.weights.setdefault(i, [0.0] * n_classes) for i in indices]
+            for row in rows:
+                for k in range(n_classes):
+                    scores[k] += row[k]
+            proba = _softmax(scores)
+            for k in range(n_classes):
+                grad = proba[k] - (1.0 if k == target else 0.0)
+                model.bias[k] -= rate * grad
+                for row in rows:
+                    row[k] -= rate * (grad + l2 * row[k])
+
+    # Severity used for local classifications: the LLM's mean per type
+    totals: Dict[str, List[int]] = {}
+    for _, label, severity in samples:
+        totals.setdefault(label, []).append(severity)
+    model.severity = {label: sum(v) / len(v) for label, v in totals.items()}
+    model.meta = {"trained_at": datetime.utcnow().isoformat(), "samples": len(samples)}
+    return model
+
+
+def evaluate(model: RelevanceModel, samples: Iterable[Tuple[str, str, int]],
+             drop_threshold: float = DROP_THRESHOLD, local_threshold: float = LOCAL_THRESHOLD) -> Dict[str, Any]:
+    """
+    Replay labelled samples through decide().
+
+    Reports how many LLM calls the thresholds would avoid and how often the
+    local drop/classify decisions agree with the LLM label.
+    """
+    counts = {"drop": 0, "local": 0, "llm": 0}
+    agreed = {"drop": 0, "local": 0}
+    total = 0
+    for text, label, _ in samples:
+        decision = model.decide(text, drop_threshold, local_threshold)
+        counts[decision.action] += 1
+        total += 1
+        if decision.action in agreed and decision.label == label:
+            agreed[decision.action] += 1
+
+    decided = counts["drop"] + counts["local"]
+    return {
+        "samples": total,
+        "drop_threshold": drop_threshold,
+        "local_threshold": local_threshold,
+        "decisions": counts,
+        "llm_calls_avoided": decided,
+        "llm_calls_avoided_rate": decided / total if total else 0.0,
+        "drop_agreement": agreed["drop"] / counts["drop"] if counts["drop"] else None,
+        "local_agreement": agreed["local"] / counts["local"] if counts["local"] else None,
+        "overall_agreement": (agreed["drop"] + agreed["local"]) / decided if decided else None,
+    }
+
+
+_model: Optional[RelevanceModel] = None
+_model_loaded = False
+
+
+def get_model() -> Optional[RelevanceModel]:
+    """Load the model from RELEVANCE_MODEL_PATH once; None when not configured."""
+    global _model, _model_loaded
+    if not _model_loaded:
+        _model_loaded = True
+        if MODEL_PATH and Path(MODEL_PATH).exists():
+            try:
+                _model = RelevanceModel.load(MODEL_PATH)
+                print(f"Loaded relevance model from {MODEL_PATH} ({_model.meta.get('samples', '?')} samples)")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load relevance model {MODEL_PATH}: {e}")
+        elif MODEL_PATH:
+            print(f"Relevance model {MODEL_PATH} not found, sending every article to the LLM")
+    return _model
@@ -0,0 +1,123 @@
+"""Background rescoring of stored safety scores.
+
+A stored safety_score decays with the event's age:
+
+    safety_score = clip(severity * 10 * exp(-age_hours / 24) + static_score, 0, 100)
+
+Ingest stores static_score and scored_at next to it, so the score can be
+recomputed inside MongoDB with a pipeline update_many, without reading the
+documents. Events are handled in one-hour timestamp buckets. A bucket is
+rescored only where some event's stored score could be more than
+RESCORE_THRESHOLD points off: the youngest possible event (severity 10,
+timestamp at the bucket's end) bounds how far any score in it has drifted
+since scored_at.
+
+Young buckets drift quickly and are rescored often; older ones less and less.
+Past SETTLE_HOURS the decaying part is below SETTLED_DECAY and an event
+counts as decayed to zero, so it is never touched again. Each run therefore
+covers a fixed window of about nine days of events, however large the
+collections grow. Events stored before scored_at existed are backfilled in
+batches of BACKFILL_BATCH.
+"""
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from .db import HOT_RETENTION_HOURS, db
+from .events import DECAY_HOURS, DEFAULT_SEVERITY
+from .metrics import EVENTS_RESCORED
+from .scoring import score_fields
+
+
+RESCORE_THRESHOLD = float(os.getenv("RESCORE_THRESHOLD", "1.0"))
+RESCORE_INTERVAL_MINUTES = int(os.getenv("RESCORE_INTERVAL_MINUTES", "10"))
+BACKFILL_BATCH = int(os.getenv("RESCORE_BACKFILL_BATCH", "1000"))
+BUCKET_HOURS = 1
+MAX_DECAY = 100.0  # severity 10 at age 0
+SETTLED_DECAY = 0.01
+SETTLE_HOURS = DECAY_HOURS * math.log(MAX_DECAY / SETTLED_DECAY)
+
+# Fields backfilling needs to compute score_fields
+BACKFILL_PROJECTION = {"title": 1, "text": 1, "severity": 1, "timestamp": 1}
+
+
+def rescore_cutoff(bucket_end: datetime, now: datetime, threshold: float = RESCORE_THRESHOLD) -> datetime:
+    """
+    Events in a bucket whose scored_at is before this have drifted past threshold.
+
+    The drift of an event at time t scored at s is
+    MAX_DECAY * (exp(-(s - t) / 24h) - exp(-(now - t) / 24h)); it is largest
+    for t = bucket_end, and solving drift = threshold for s gives the cutoff.
+    """
+    age_hours = (now - bucket_end).total_seconds() / 3600.0
+    decayed = math.exp(-age_hours / DECAY_HOURS) + threshold / MAX_DECAY
+    return bucket_end - timedelta(hours=DECAY_HOURS * math.log(decayed))
+
+
+def rescore_buckets(now: datetime, threshold: float = RESCORE_THRESHOLD) -> List[Tuple[datetime, datetime, datetime]]:
+    """(start, end, cutoff) of every bucket that may hold a stale score, newest first."""
+    settled = now - timedelta(hours=SETTLE_HOURS)
+    end = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=BUCKET_HOURS)
+    buckets = []
+    while end > settled:
+        start = end - timedelta(hours=BUCKET_HOURS)
+        cutoff = rescore_cutoff(min(end, now), now, threshold)
+        # No event is scored before it happened
+        if cutoff > start:
+            buckets.append((start, end, cutoff))
+        end = start
+    return buckets
+
+
+def rescore_pipeline(now: datetime) -> List[Dict[str, Any]]:
+    """Update pipeline recomputing safety_score from severity, timestamp and static_score."""
+    severity = {"$cond": [
+        {"$and": [{"$gte": ["$severity", 1]}, {"$lte": ["$severity", 10]}]},
+        "$severity",
+        DEFAULT_SEVERITY
+    ]}
+    # Date subtraction gives milliseconds
+    age_ms = {"$subtract": [now, "$timestamp"]}
+    decay = {"$exp": {"$divide": [{"$multiply": [-1, age_ms]}, DECAY_HOURS * 3600 * 1000]}}
+    raw = {"$add": [{"$multiply": [severity, 10, decay]}, "$static_score"]}
+    return [{"$set": {
+        "safety_score": {"$min": [100, {"$max": [0, raw]}]},
+        "scored_at": now
+    }}]
+
+
+def bucket_filter(start: datetime, end: datetime, cutoff: datetime) -> Dict[str, Any]:
+    return {"timestamp": {"$gte": start, "$lt": end}, "scored_at": {"$lt": cutoff}}
+
+
+async def rescore_events(now: Optional[datetime] = None, threshold: float = RESCORE_THRESHOLD) -> int:
+    """One rescoring pass over hot and (for older buckets) archived events; returns events updated."""
+    now = now or datetime.utcnow()
+    pipeline = rescore_pipeline(now)
+    archive_from = now - timedelta(hours=HOT_RETENTION_HOURS + BUCKET_HOURS)
+    updated = 0
+
+    for start, end, cutoff in rescore_buckets(now, threshold):
+        query = bucket_filter(start, end, cutoff)
+        modified = await db.rescore_events(query, pipeline)
+        EVENTS_RESCORED.labels("events").inc(modified)
+        updated += modified
+        if start < archive_from:
+            modified = await db.rescore_events(query, pipeline, archived=True)
+            EVENTS_RESCORED.labels("events_archive").inc(modified)
+            updated += modified
+
+    updated += await backfill_scores(now)
+    return updated
+
+
+async def backfill_scores(now: datetime, limit: int = BACKFILL_BATCH) -> int:
+    """Give up to limit unsettled events without scored_at their score components."""
+    since = now - timedelta(hours=SETTLE_HOURS)
+    updated = 0
+    for archived in (False, True):
+        docs = await db.events_without_scored_at(since, BACKFILL_PROJECTION, limit, archived=archived)
+        if docs:
+            updated += await db.set_event_fields([(doc["_id"], score_fields(doc)) for doc in docs], archived=archived)
+    return updated
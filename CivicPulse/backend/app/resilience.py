@@ -0,0 +1,302 @@
+"""Deadlines, hedged requests and circuit breakers for upstream calls.
+
+Every call to Google or OpenAI goes through an Upstream, which adds three
+things around metrics.upstream():
+
+- Deadlines. A request gets a deadline when it arrives (DeadlineMiddleware:
+  REQUEST_DEADLINE_SECONDS, or less if the caller sends an
+  X-Request-Deadline header in seconds). It lives in a contextvar, so every
+  upstream call made while serving the request sees it, and each attempt's
+  timeout is cut to the time left instead of its fixed cap. The /ingest and
+  /admin routes run whole jobs and get no deadline.
+- Hedging. For idempotent upstreams listed in HEDGE_UPSTREAMS, when an
+  attempt has not answered by the HEDGE_PERCENTILE latency of recent
+  successful attempts, a second identical attempt is sent and the first
+  answer wins.
+- Circuit breaking. When at least BREAKER_FAILURE_RATE of the last
+  BREAKER_WINDOW calls failed, the breaker opens and calls fail at once with
+  CircuitOpen, so callers go straight to their fallback (the regex
+  classifier, a cached route, the gazetteer). After BREAKER_RESET_SECONDS a
+  single probe call is let through; its outcome closes or reopens it.
+
+Breaker states are exported as urbanpulse_upstream_circuit_state.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import CIRCUIT_STATE, UPSTREAM_HEDGES, UPSTREAM_REQUESTS, upstream
+
+
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "10"))
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+HEDGE_UPSTREAMS = set(filter(None, os.getenv("HEDGE_UPSTREAMS", "google_directions,google_geocode").split(",")))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# Hedging starts once this many successful latencies are known
+HEDGE_MIN_SAMPLES = 20
+LATENCY_SAMPLES = 200
+DEADLINE_HEADER = b"x-request-deadline"
+# Long-running jobs (an ingest pass, archiving) are not requests to cut short
+DEADLINE_EXEMPT_PREFIXES = ("/ingest", "/admin")
+STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("upstream_deadline", default=None)
+# Threads for hedged attempts made from blocking code
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+class DeadlineExceeded(Exception):
+    """No time left for an upstream call under the current deadline."""
+
+
+class CircuitOpen(Exception):
+    """An upstream's circuit breaker is open; use the fallback."""
+
+    def __init__(self, name: str):
+        super().__init__(f"circuit open for {name}")
+        self.name = name
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Run the block under a deadline seconds from now, or the enclosing one if that is sooner."""
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(cap: Optional[float] = None) -> Optional[float]:
+    """Seconds left under the current deadline, at most cap; cap (or None) without a deadline."""
+    at = _deadline.get()
+    if at is None:
+        return cap
+    left = at - time.monotonic()
+    return left if cap is None else min(cap, left)
+
+
+def timeout_for(cap: float) -> float:
+    """Timeout for one attempt: cap cut to the time left; raises DeadlineExceeded when none is."""
+    left = remaining(cap)
+    if left <= 0:
+        raise DeadlineExceeded("request deadline reached")
+    return left
+
+
+class CircuitBreaker:
+    """Failure-rate breaker over the last window calls, with a single half-open probe."""
+
+    def __init__(self, name: str, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 failure_rate: float = BREAKER_FAILURE_RATE, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.reset_seconds = reset_seconds
+        self.outcomes = deque(maxlen=window)
+        self.state = "closed"
+        self.opened_at = 0.0
+        self._probing = False
+        # Blocking callers record outcomes from worker threads
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(STATE_VALUES["closed"])
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; rejected calls are counted as short_circuited."""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._set("half_open")
+            if self.state == "closed" or (self.state == "half_open" and not self._probing):
+                self._probing = self.state == "half_open"
+                return True
+        UPSTREAM_REQUESTS.labels(self.name, "short_circuited").inc()
+        return False
+
+    def record(self, ok: bool):
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+                self.outcomes.clear()
+                self._set("closed" if ok else "open")
+                return
+            self.outcomes.append(ok)
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) >= self.min_calls and failures >= self.failure_rate * len(self.outcomes):
+                self.outcomes.clear()
+                self._set("open")
+
+    def _set(self, state: str):
+        if state == "open":
+            self.opened_at = time.monotonic()
+        if state != self.state:
+            print(f"Circuit for {self.name}: {self.state} -> {state}")
+        self.state = state
+        CIRCUIT_STATE.labels(self.name).set(STATE_VALUES[state])
+
+
+class Upstream:
+    """One external service: its breaker, recent latencies and per-attempt timeout cap."""
+
+    def __init__(self, name: str, timeout: float, hedge: bool = False):
+        self.name = name
+        self.timeout = timeout
+        self.hedge = hedge
+        self.breaker = CircuitBreaker(name)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def hedge_delay(self) -> Optional[float]:
+        """HEDGE_PERCENTILE of recent successful latencies; None while hedging is off or unknown."""
+        if not self.hedge or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))]
+
+    def _begin(self) -> float:
+        if not self.breaker.allow():
+            raise CircuitOpen(self.name)
+        try:
+            return timeout_for(self.timeout)
+        except DeadlineExceeded:
+            # Not the upstream's fault, but a half-open probe must still be resolved
+            self.breaker.record(True)
+            raise
+
+    async def call(self, fn: Callable[[float], Any]) -> Any:
+        """
+        fn(timeout) under the breaker, deadline and hedging.
+
+        fn may be a coroutine function or a blocking one, which then runs in
+        a worker thread so the event loop is not held up.
+        """
+        timeout = self._begin()
+        try:
+            delay = self.hedge_delay()
+            if delay is None or delay >= timeout:
+                result = await self._attempt(fn, timeout)
+            else:
+                result = await self._hedged(fn, timeout, delay)
+        except Exception:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(True)
+        return result
+
+    async def _attempt(self, fn: Callable[[float], Any], timeout: float) -> Any:
+        started = time.monotonic()
+        with upstream(self.name):
+            work = fn(timeout) if asyncio.iscoroutinefunction(fn) else asyncio.to_thread(fn, timeout)
+            result = await asyncio.wait_for(work, timeout)
+        self.latencies.append(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, fn: Callable[[float], Any], timeout: float, delay: float) -> Any:
+        started = time.monotonic()
+        first = asyncio.ensure_future(self._attempt(fn, timeout))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        UPSTREAM_HEDGES.labels(self.name).inc()
+        second = asyncio.ensure_future(self._attempt(fn, timeout - (time.monotonic() - started)))
+        pending, error = {first, second}, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    def call_sync(self, fn: Callable[[float], Any]) -> Any:
+        """call() for blocking callers; hedged attempts run on a small thread pool."""
+        timeout = self._begin()
+        try:
+            delay = self.hedge_delay()
+            if delay is None or delay >= timeout:
+                result = self._attempt_sync(fn, timeout)
+            else:
+                result = self._hedged_sync(fn, timeout, delay)
+        except Exception:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(True)
+        return result
+
+    def _attempt_sync(self, fn: Callable[[float], Any], timeout: float) -> Any:
+        started = time.monotonic()
+        with upstream(self.name):
+            result = fn(timeout)
+        self.latencies.append(time.monotonic() - started)
+        return result
+
+    def _hedged_sync(self, fn: Callable[[float], Any], timeout: float, delay: float) -> Any:
+        started = time.monotonic()
+        first = _hedge_pool.submit(self._attempt_sync, fn, timeout)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+        UPSTREAM_HEDGES.labels(self.name).inc()
+        second = _hedge_pool.submit(self._attempt_sync, fn, timeout - (time.monotonic() - started))
+        pending, error = {first, second}, None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, timeout - (time.monotonic() - started)),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"{self.name} did not answer within {timeout:.1f}s")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+
+_upstreams: Dict[str, Upstream] = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(name: str, timeout: float = 10.0) -> Upstream:
+    """The shared Upstream for name, created with timeout as its per-attempt cap on first use."""
+    with _upstreams_lock:
+        if name not in _upstreams:
+            _upstreams[name] = Upstream(name, timeout, hedge=name in HEDGE_UPSTREAMS)
+        return _upstreams[name]
+
+
+def breaker_states() -> Dict[str, str]:
+    return {name: u.breaker.state for name, u in _upstreams.items()}
+
+
+class DeadlineMiddleware:
+    """ASGI middleware giving every HTTP request, except the exempt job routes, its upstream deadline."""
+
+    def __init__(self, app, seconds: float = REQUEST_DEADLINE_SECONDS,
+                 exempt: tuple = DEADLINE_EXEMPT_PREFIXES):
+        self.app = app
+        self.seconds = seconds
+        self.exempt = exempt
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path", "").startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+        seconds = self.seconds
+        for name, value in scope.get("headers", []):
+            if name == DEADLINE_HEADER:
+                try:
+                    seconds = min(seconds, float(value))
+                except ValueError:
+                    pass
+        with deadline(seconds):
+            await self.app(scope, receive, send)
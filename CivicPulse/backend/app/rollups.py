@@ -0,0 +1,161 @@
+"""Hourly rollups of events per geohash cell and event type.
+
+Ingest keeps one document per (hour, geohash cell, event_type) in the
+event_rollups collection, updated with $inc upserts:
+
+    {_id: "2024-05-01T13|dr5ru7|accident", hour, cell, event_type,
+     count, severity_sum, max_safety_score}
+
+Counts are incidents: a report merged into an existing incident only raises
+its severity and score. /stats answers time series and top-N questions from
+these documents, whose number grows with hours x active cells rather than
+with events. Coarser areas are cell prefixes: every precision-6 cell
+(about 1.2 x 0.6 km) starting with "dr5ru" lies in the same precision-5 cell.
+"""
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+GEOHASH_PRECISION = int(os.getenv("ROLLUP_GEOHASH_PRECISION", "6"))
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Standard base-32 geohash of a point."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        rng, x = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if x >= mid:
+            value = value * 2 + 1
+            rng[0] = mid
+        else:
+            value *= 2
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def geohash_bounds(cell: str) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for ch in cell:
+        value = GEOHASH_ALPHABET.index(ch)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def hour_of(timestamp: datetime) -> datetime:
+    return timestamp.replace(tzinfo=None, minute=0, second=0, microsecond=0)
+
+
+def rollup_key(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Identity of the rollup document an event counts towards."""
+    coords = event["coordinates"]
+    hour = hour_of(event["timestamp"])
+    cell = geohash(coords["lat"], coords["lng"])
+    event_type = event.get("event_type", "other")
+    return {
+        "_id": f"{hour.strftime('%Y-%m-%dT%H')}|{cell}|{event_type}",
+        "hour": hour,
+        "cell": cell,
+        "event_type": event_type
+    }
+
+
+def rollup_update(key: Dict[str, Any], count: int, severity: float, safety_score: float) -> Dict[str, Any]:
+    """$inc upsert adding count incidents and severity to a rollup document."""
+    return {
+        "$inc": {"count": count, "severity_sum": severity},
+        "$max": {"max_safety_score": safety_score},
+        "$setOnInsert": {"hour": key["hour"], "cell": key["cell"], "event_type": key["event_type"]}
+    }
+
+
+def stats_match(
+    since: datetime,
+    until: Optional[datetime] = None,
+    cell: Optional[str] = None,
+    event_type: Optional[str] = None
+) -> Dict[str, Any]:
+    """Filter on rollup documents; cell matches every finer cell inside it."""
+    match: Dict[str, Any] = {"hour": {"$gte": hour_of(since)}}
+    if until is not None:
+        match["hour"]["$lt"] = until
+    if cell:
+        # Anchored prefix regexes use the cell index
+        match["cell"] = {"$regex": f"^{cell}"}
+    if event_type:
+        match["event_type"] = event_type
+    return match
+
+
+def _totals() -> Dict[str, Any]:
+    return {
+        "count": {"$sum": "$count"},
+        "severity_sum": {"$sum": "$severity_sum"},
+        "max_safety_score": {"$max": "$max_safety_score"}
+    }
+
+
+def _finish(group_field: str) -> List[Dict[str, Any]]:
+    return [{"$project": {
+        "_id": 0,
+        group_field: "$_id",
+        "count": 1,
+        "avg_severity": {"$round": [{"$divide": ["$severity_sum", {"$max": ["$count", 1]}]}, 2]},
+        "max_safety_score": {"$round": ["$max_safety_score", 1]}
+    }}]
+
+
+def timeseries_pipeline(match: Dict[str, Any], bucket: str = "hour") -> List[Dict[str, Any]]:
+    """Counts and average severity per hour (or day) bucket."""
+    group_id: Any = "$hour"
+    if bucket == "day":
+        group_id = {"$dateTrunc": {"date": "$hour", "unit": "day"}}
+    return [
+        {"$match": match},
+        {"$group": {"_id": group_id, **_totals()}},
+        {"$sort": {"_id": 1}},
+    ] + _finish("time")
+
+
+def top_pipeline(match: Dict[str, Any], group_by: str = "cell", precision: int = GEOHASH_PRECISION,
+                 limit: int = 10) -> List[Dict[str, Any]]:
+    """Top-N cells (at precision) or event types by incident count."""
+    if group_by == "cell":
+        group_id: Any = {"$substrCP": ["$cell", 0, precision]}
+    else:
+        group_id = "$event_type"
+    return [
+        {"$match": match},
+        {"$group": {"_id": group_id, **_totals()}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": limit},
+    ] + _finish(group_by)
+
+
+def accumulate(rollups: Dict[str, Dict[str, Any]], event: Dict[str, Any]):
+    """Add one stored event to in-memory rollups (used by the rebuild command)."""
+    key = rollup_key(event)
+    doc = rollups.get(key["_id"])
+    if doc is None:
+        doc = rollups[key["_id"]] = {**key, "count": 0, "severity_sum": 0, "max_safety_score": 0.0}
+    doc["count"] += 1
+    doc["severity_sum"] += event.get("severity", 5)
+    doc["max_safety_score"] = max(doc["max_safety_score"], event.get("safety_score", 0.0))
@@ -0,0 +1,393 @@
+"""Offline, risk-aware routing over a local road graph.
+
+scripts/build_road_graph.py turns an OpenStreetMap extract of the service
+area into one graph per travel mode, ROAD_GRAPH_DIR/<mode>.npz:
+
+    node_lat, node_lng   intersections and dead ends
+    indptr, target       CSR adjacency: edges of node u are indptr[u]:indptr[u + 1]
+    length               edge length in meters
+    shape_ptr            edge e's geometry is shape_lat/lng[shape_ptr[e]:shape_ptr[e + 1]]
+    shape_lat, shape_lng points along every edge, at most SHAPE_STEP_METERS apart
+
+Chains of degree-2 nodes are contracted into single edges when the graph is
+built, so A* only expands intersections. An edge costs
+
+    length * (alpha + beta * risk / RISK_SCALE)
+
+where risk is the summed score of events within RISK_RADIUS_METERS of the
+edge, weighted like compute_route_risk (1 at the edge, 0 at the radius), and
+alpha/beta are the RouteRequest weights. Since risk >= 0, alpha times the
+straight-line distance is an admissible A* heuristic.
+
+Edge risk is kept up to date incrementally: update_risk() diffs the current
+event set against the events already applied and only adds or subtracts the
+contributions of events that appeared, changed or expired. Every event's
+severity part decays at the same rate, so the decaying sum of each edge is
+stored relative to one reference time and decayed as a whole when read
+(without compute_score's per-event cap at 100).
+
+Risk updates and searches run in worker threads, off the event loop; a lock
+keeps a search from reading edge risk halfway through an update.
+"""
+import heapq
+import math
+import asyncio
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .db import db
+from .events import DECAY_HOURS, EventColumns
+from .snapshot import _concat_ranges, get_snapshot
+
+
+DEFAULT_DIR = Path(__file__).parent.parent / "data" / "roads"
+ROAD_GRAPH_DIR = os.getenv("ROAD_GRAPH_DIR", str(DEFAULT_DIR))
+RISK_RADIUS_METERS = float(os.getenv("ROUTING_RISK_RADIUS_METERS", "50"))
+# Risk at which an edge costs twice its length at alpha = beta
+RISK_SCALE = float(os.getenv("ROUTING_RISK_SCALE", "25"))
+# Start and end must be this close to the graph
+SNAP_METERS = float(os.getenv("ROUTING_SNAP_METERS", "300"))
+# Without a snapshot, edge risk is re-read from Mongo at most this often
+REFRESH_SECONDS = float(os.getenv("ROUTING_REFRESH_SECONDS", "60"))
+RISK_HOURS = int(os.getenv("ROUTING_RISK_HOURS", os.getenv("EVENTS_HOT_RETENTION_HOURS", "72")))
+SHAPE_STEP_METERS = 20.0
+# Average speeds for durations of local routes, in m/s
+SPEEDS = {"driving": 8.3, "walking": 1.4, "bicycling": 4.2, "transit": 6.0}
+# The decaying sums are re-referenced once their reference time is this old
+REBASE_SECONDS = 7 * 86400
+MAX_GRID_CELLS = 4_000_000
+COST_CACHE_SIZE = 8
+METERS_PER_DEGREE = 111320.0
+EARTH_RADIUS = 6371000.0
+
+GRAPH_ARRAYS = ["node_lat", "node_lng", "indptr", "target", "length", "shape_ptr", "shape_lat", "shape_lng"]
+
+
+def segment_lengths(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """Haversine distance in meters between consecutive points."""
+    phi = np.radians(lat)
+    delta_phi = np.diff(phi)
+    delta_lambda = np.diff(np.radians(lng))
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(delta_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def pack_graph(node_lat: Sequence[float], node_lng: Sequence[float],
+               edges: Sequence[Tuple[int, int, Sequence[Tuple[float, float]]]]) -> Dict[str, np.ndarray]:
+    """
+    Graph arrays from nodes and directed edges (source, target, shape).
+
+    shape is the edge geometry from source to target, both included. Shapes
+    are densified so consecutive points are at most SHAPE_STEP_METERS apart.
+    """
+    edges = sorted(edges, key=lambda edge: edge[0])
+    sources = np.array([u for u, _, _ in edges], dtype=np.int64)
+    sizes = np.array([len(shape) for _, _, shape in edges], dtype=np.int64)
+    points = np.array([point for _, _, shape in edges for point in shape], dtype=np.float64).reshape(-1, 2)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+
+    # Segment j joins points j and j + 1; the last point of an edge starts no segment
+    lengths = np.append(segment_lengths(points[:, 0], points[:, 1]), 0.0) if len(points) else np.zeros(0)
+    lengths[starts + sizes - 1] = 0.0
+    pieces = np.maximum(1, np.ceil(lengths / SHAPE_STEP_METERS)).astype(np.int64)
+    # Point j becomes pieces[j] points at fractions 0, 1/k, ..., (k-1)/k towards point j + 1
+    segment = np.repeat(np.arange(len(points)), pieces)
+    fraction = (np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)) / pieces[segment]
+    following = points[np.minimum(segment + 1, len(points) - 1)]
+    dense = points[segment] + (following - points[segment]) * fraction[:, None]
+    dense_sizes = np.add.reduceat(pieces, starts) if len(edges) else np.zeros(0, dtype=np.int64)
+
+    return {
+        "node_lat": np.asarray(node_lat, dtype=np.float64),
+        "node_lng": np.asarray(node_lng, dtype=np.float64),
+        "indptr": np.searchsorted(sources, np.arange(len(node_lat) + 1)).astype(np.int64),
+        "target": np.array([v for _, v, _ in edges], dtype=np.int32),
+        "length": (np.add.reduceat(lengths, starts) if len(edges) else np.zeros(0)).astype(np.float32),
+        "shape_ptr": np.concatenate(([0], np.cumsum(dense_sizes))).astype(np.int64),
+        "shape_lat": dense[:, 0].copy(),
+        "shape_lng": dense[:, 1].copy(),
+    }
+
+
+class RoadGraph:
+    """A road graph for one travel mode, with live edge risk."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], mode: str = "driving"):
+        self.mode = mode
+        for name in GRAPH_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.edge_count = len(self.target)
+        # A* runs on Python lists: indexing them is much faster than indexing arrays
+        self._indptr = self.indptr.tolist()
+        self._target = self.target.tolist()
+        self._source = np.repeat(np.arange(len(self.node_lat)), np.diff(self.indptr)).tolist()
+        self._node_lat = self.node_lat.tolist()
+        self._node_lng = self.node_lng.tolist()
+        self._leaving = np.flatnonzero(np.diff(self.indptr) > 0)
+        self._arriving = np.flatnonzero(np.bincount(self.target, minlength=len(self.node_lat)) > 0)
+        self._build_point_grid()
+
+        # Edge risk: decaying * exp(-(now - reference) / decay) + static
+        self.reference = time.time()
+        self.decaying = np.zeros(self.edge_count, dtype=np.float64)
+        self.static = np.zeros(self.edge_count, dtype=np.float64)
+        self.applied = set()
+        self.generation = 0
+        self.risk_version = None
+        self.synced_at = 0.0
+        self._costs = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in GRAPH_ARRAYS}
+            mode = str(data["mode"]) if "mode" in data else Path(path).stem
+        return cls(arrays, mode)
+
+    def save(self, path: str):
+        np.savez(path, mode=np.array(self.mode), **{name: getattr(self, name) for name in GRAPH_ARRAYS})
+
+    def _build_point_grid(self):
+        """CSR grid over shape points with cells at least RISK_RADIUS_METERS wide."""
+        lat, lng = self.shape_lat, self.shape_lng
+        self.point_edge = np.repeat(np.arange(self.edge_count), np.diff(self.shape_ptr))
+        south = float(lat.min()) if len(lat) else 0.0
+        west = float(lng.min()) if len(lng) else 0.0
+        self.cos_lat = max(0.01, math.cos(math.radians(float(np.median(lat)) if len(lat) else 0.0)))
+        cell_lat = RISK_RADIUS_METERS / METERS_PER_DEGREE
+        cell_lng = cell_lat / self.cos_lat
+        rows = int((float(lat.max()) - south) / cell_lat) + 1 if len(lat) else 1
+        cols = int((float(lng.max()) - west) / cell_lng) + 1 if len(lng) else 1
+        scale = max(1.0, math.sqrt(rows * cols / MAX_GRID_CELLS))
+        cell_lat, cell_lng = cell_lat * scale, cell_lng * scale
+        self.grid_geometry = {
+            "south": south, "west": west, "cell_lat": cell_lat, "cell_lng": cell_lng,
+            "rows": int(rows / scale) + 1, "cols": int(cols / scale) + 1,
+        }
+        cells = self._cells(lat, lng)
+        order = np.argsort(cells, kind="stable")
+        self.point_order = order
+        self.point_grid = np.searchsorted(cells[order], np.arange(self.grid_geometry["rows"] * self.grid_geometry["cols"] + 1))
+
+    def _cell_coords(self, lat, lng) -> Tuple[np.ndarray, np.ndarray]:
+        g = self.grid_geometry
+        rows = np.floor((np.asarray(lat) - g["south"]) / g["cell_lat"]).astype(np.int64)
+        cols = np.floor((np.asarray(lng) - g["west"]) / g["cell_lng"]).astype(np.int64)
+        return rows, cols
+
+    def _cells(self, lat, lng) -> np.ndarray:
+        rows, cols = self._cell_coords(lat, lng)
+        return rows * self.grid_geometry["cols"] + cols
+
+    def bbox(self) -> Dict[str, Dict[str, float]]:
+        """The graph's extent, so risk reads only reach the cities it covers."""
+        return {
+            "sw": {"lat": float(self.node_lat.min()), "lng": float(self.node_lng.min())},
+            "ne": {"lat": float(self.node_lat.max()), "lng": float(self.node_lng.max())}
+        }
+
+    def nearest_node(self, lat: float, lng: float, arriving: bool = False) -> Tuple[int, float]:
+        """Closest node a route can leave (or, with arriving, reach), and its distance in meters."""
+        nodes = self._arriving if arriving else self._leaving
+        if len(nodes) == 0:
+            return -1, math.inf
+        dy = (self.node_lat[nodes] - lat) * METERS_PER_DEGREE
+        dx = (self.node_lng[nodes] - lng) * METERS_PER_DEGREE * self.cos_lat
+        distances = np.hypot(dx, dy)
+        i = int(np.argmin(distances))
+        return int(nodes[i]), float(distances[i])
+
+    def _event_edges(self, lat: np.ndarray, lng: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(event, edge, weight) for every edge within RISK_RADIUS_METERS of an event, weight as in compute_route_risk."""
+        g = self.grid_geometry
+        rows, cols = self._cell_coords(lat, lng)
+        dr, dc = np.meshgrid(np.arange(-1, 2), np.arange(-1, 2))
+        rows = rows[:, None] + dr.ravel()[None, :]
+        cols = cols[:, None] + dc.ravel()[None, :]
+        inside = (rows >= 0) & (rows < g["rows"]) & (cols >= 0) & (cols < g["cols"])
+        cells = np.where(inside, rows * g["cols"] + cols, 0)
+        lo = np.where(inside, self.point_grid[cells], 0).ravel()
+        hi = np.where(inside, self.point_grid[cells + 1], 0).ravel()
+        points = self.point_order[_concat_ranges(lo, hi)]
+        events = np.repeat(np.repeat(np.arange(len(lat)), 9), np.maximum(hi - lo, 0))
+
+        dy = (self.shape_lat[points] - lat[events]) * METERS_PER_DEGREE
+        dx = (self.shape_lng[points] - lng[events]) * METERS_PER_DEGREE * self.cos_lat
+        weights = 1.0 - np.hypot(dx, dy) / RISK_RADIUS_METERS
+        near = weights >= 0
+        events, edges, weights = events[near], self.point_edge[points[near]], weights[near]
+
+        # An edge counts once per event, at its closest point
+        key = events * self.edge_count + edges
+        order = np.lexsort((-weights, key))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = key[order][1:] != key[order][:-1]
+        keep = order[first]
+        return events[keep], edges[keep], weights[keep]
+
+    def _apply(self, events: np.ndarray, sign: float):
+        """Add (sign 1) or remove (sign -1) the risk of events given as rows of lat, lng, time, severity, static."""
+        if len(events) == 0:
+            return
+        lat, lng, when, severity, static = events.T
+        rows, edges, weights = self._event_edges(lat, lng)
+        decay = severity[rows] * 10.0 * np.exp((when[rows] - self.reference) / 3600.0 / DECAY_HOURS)
+        self.decaying += sign * np.bincount(edges, weights * decay, minlength=self.edge_count)
+        self.static += sign * np.bincount(edges, weights * static[rows], minlength=self.edge_count)
+
+    def update_risk(self, events: EventColumns, version: Any = None, now: Optional[float] = None) -> Tuple[int, int]:
+        """Make edge risk reflect exactly these events; returns (added, removed)."""
+        with self._lock:
+            return self._update_risk(events, version, now)
+
+    def _update_risk(self, events: EventColumns, version: Any, now: Optional[float]) -> Tuple[int, int]:
+        now = time.time() if now is None else now
+        if now - self.reference > REBASE_SECONDS:
+            self.decaying *= math.exp(-(now - self.reference) / 3600.0 / DECAY_HOURS)
+            self.reference = now
+
+        # An event whose severity or text changes is removed and added again
+        current = set(zip(events.lat.tolist(), events.lng.tolist(), events.time.tolist(),
+                          events.severity.tolist(), events.static_score.tolist()))
+        current = {key for key in current if not (math.isnan(key[0]) or math.isnan(key[1]))}
+        added, removed = current - self.applied, self.applied - current
+        self._apply(np.array(sorted(removed), dtype=np.float64).reshape(-1, 5), -1.0)
+        self._apply(np.array(sorted(added), dtype=np.float64).reshape(-1, 5), 1.0)
+        self.applied = current
+        self.risk_version = version
+        self.synced_at = time.monotonic()
+        if added or removed:
+            self.generation += 1
+            self._costs.clear()
+        return len(added), len(removed)
+
+    def edge_risk(self, now: Optional[float] = None) -> np.ndarray:
+        now = time.time() if now is None else now
+        decay = math.exp(-(now - self.reference) / 3600.0 / DECAY_HOURS)
+        return np.maximum(self.decaying * decay + self.static, 0.0)
+
+    def edge_costs(self, alpha: float, beta: float, now: Optional[float] = None) -> List[float]:
+        """Edge costs as a list, cached per weights and minute."""
+        now = time.time() if now is None else now
+        key = (round(alpha, 4), round(beta, 4), self.generation, int(now // 60))
+        costs = self._costs.get(key)
+        if costs is None:
+            with self._lock:
+                if len(self._costs) >= COST_CACHE_SIZE:
+                    self._costs.clear()
+                costs = (self.length * (alpha + beta * self.edge_risk(now) / RISK_SCALE)).tolist()
+                self._costs[key] = costs
+        return costs
+
+    def shortest_path(self, start: Dict[str, float], end: Dict[str, float], alpha: float, beta: float,
+                      now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        A* from the node nearest start to the node nearest end.
+
+        Returns coordinates, distance_meters and risk_cost (the summed
+        length * risk / RISK_SCALE), or None when an endpoint is off the graph
+        or no path exists.
+        """
+        source, source_distance = self.nearest_node(start["lat"], start["lng"])
+        goal, goal_distance = self.nearest_node(end["lat"], end["lng"], arriving=True)
+        if source_distance > SNAP_METERS or goal_distance > SNAP_METERS:
+            return None
+        costs = self.edge_costs(alpha, beta, now)
+        indptr, target, node_lat, node_lng = self._indptr, self._target, self._node_lat, self._node_lng
+
+        # Equirectangular distance; slightly scaled down so it never exceeds haversine
+        goal_lat, goal_lng = node_lat[goal], node_lng[goal]
+        h_lat = alpha * METERS_PER_DEGREE * 0.995
+        h_lng = h_lat * self.cos_lat * 0.995
+        best = {source: 0.0}
+        via = {}
+        closed = set()
+        heap = [(0.0, 0.0, source)]
+        while heap:
+            _, cost, u = heapq.heappop(heap)
+            if u == goal:
+                break
+            if u in closed:
+                continue
+            closed.add(u)
+            for e in range(indptr[u], indptr[u + 1]):
+                v = target[e]
+                new_cost = cost + costs[e]
+                if new_cost < best.get(v, math.inf):
+                    best[v] = new_cost
+                    via[v] = e
+                    heuristic = math.hypot((node_lat[v] - goal_lat) * h_lat, (node_lng[v] - goal_lng) * h_lng)
+                    heapq.heappush(heap, (new_cost + heuristic, new_cost, v))
+        if goal not in best:
+            return None
+
+        path = []
+        node = goal
+        while node != source:
+            e = via[node]
+            path.append(e)
+            node = self._source[e]
+        path.reverse()
+        return self._describe(path, now)
+
+    def _describe(self, path: List[int], now: Optional[float]) -> Dict[str, Any]:
+        edges = np.asarray(path, dtype=np.int64)
+        if len(edges):
+            points = _concat_ranges(self.shape_ptr[edges], self.shape_ptr[edges + 1])
+            # Consecutive edges share their joint; keep it once
+            joints = self.shape_ptr[edges[1:]] if len(edges) > 1 else np.zeros(0, dtype=np.int64)
+            points = points[~np.isin(points, joints)]
+            coordinates = list(zip(self.shape_lat[points].tolist(), self.shape_lng[points].tolist()))
+        else:
+            coordinates = []
+        lengths = self.length[edges].astype(np.float64)
+        return {
+            "coordinates": coordinates,
+            "distance_meters": float(lengths.sum()),
+            "risk_cost": float((lengths * self.edge_risk(now)[edges]).sum() / RISK_SCALE),
+            "edges": path,
+        }
+
+
+_graphs: Dict[str, Optional[RoadGraph]] = {}
+
+
+def get_road_graph(mode: str = "driving") -> Optional[RoadGraph]:
+    """Load ROAD_GRAPH_DIR/<mode>.npz once; None when there is no graph for the mode."""
+    if mode not in _graphs:
+        path = Path(ROAD_GRAPH_DIR) / f"{mode}.npz"
+        graph = None
+        if path.exists():
+            try:
+                started = time.perf_counter()
+                graph = RoadGraph.load(str(path))
+                print(f"Loaded road graph {path} ({len(graph.node_lat)} nodes, {graph.edge_count} edges) "
+                      f"in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                print(f"Could not load road graph {path}: {e}")
+        _graphs[mode] = graph
+    return _graphs[mode]
+
+
+async def sync_edge_risk(graph: RoadGraph):
+    """
+    Bring a graph's edge risk up to date with the current events.
+
+    A new snapshot version (app/snapshot.py) is applied as soon as it is
+    published; without snapshots the events are read from Mongo every
+    REFRESH_SECONDS. Either way only the difference is applied.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        if graph.risk_version != snapshot.version:
+            await asyncio.to_thread(graph.update_risk, snapshot.columns(snapshot.query()), snapshot.version)
+    elif time.monotonic() - graph.synced_at > REFRESH_SECONDS:
+        # Every event, not query_events' capped page: a missing event would be missing from edge risk
+        events = await db.risk_events(graph.bbox(), since_hours=RISK_HOURS)
+        await asyncio.to_thread(graph.update_risk, EventColumns.from_docs(events))
@@ -2,8 +2,10 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import asyncio
-from .scraper import run_one_shot
-from .main import ingest_one_shot
+import os
+from .db import db
+from .ingest import run_ingest
+from .rescoring import RESCORE_INTERVAL_MINUTES, rescore_events
 
 # Global scheduler instance
 scheduler = AsyncIOScheduler()
@@ -12,17 +14,31 @@ scheduler = AsyncIOScheduler()
 async def scheduled_ingest():
     """Wrapper for scheduled ingestion."""
     try:
-        # Call the FastAPI endpoint logic directly
-        articles = run_one_shot()
-        # Note: This would need access to db, llm, geocode, scoring modules
-        # For now, this is a placeholder - actual implementation would
-        # call the same logic as the /ingest/one-shot endpoint
-        print("Scheduled ingestion completed")
+        counts = await run_ingest()
+        print(f"Scheduled ingestion completed: {counts}")
     except Exception as e:
         print(f"Scheduled ingestion error: {e}")
 
 
-def start_scheduler(interval_hours: int = 6):
+async def scheduled_archive():
+    """Move cold events from the hot collection to the archive."""
+    try:
+        await db.archive_cold_events()
+    except Exception as e:
+        print(f"Scheduled archive error: {e}")
+
+
+async def scheduled_rescore():
+    """Bring stored safety scores up to date with event age."""
+    try:
+        updated = await rescore_events()
+        if updated:
+            print(f"Rescored {updated} events")
+    except Exception as e:
+        print(f"Scheduled rescore error: {e}")
+
+
+def start_scheduler(interval_hours: float = 6):
     """Start the background scheduler for periodic ingestion."""
     if scheduler.running:
         print("Scheduler already running")
@@ -37,6 +53,25 @@ def start_scheduler(interval_hours: int = 6):
         replace_existing=True
     )
     
+    # Keep the hot events collection small
+    archive_minutes = int(os.getenv("EVENTS_ARCHIVE_INTERVAL_MINUTES", "60"))
+    scheduler.add_job(
+        scheduled_archive,
+        trigger=IntervalTrigger(minutes=archive_minutes),
+        id='periodic_archive',
+        name='Periodic Event Archiving',
+        replace_existing=True
+    )
+    
+    # Stored safety scores decay with event age
+    scheduler.add_job(
+        scheduled_rescore,
+        trigger=IntervalTrigger(minutes=RESCORE_INTERVAL_MINUTES),
+        id='periodic_rescore',
+        name='Periodic Safety Score Rescoring',
+        replace_existing=True
+    )
+    
     scheduler.start()
     print(f"Scheduler started - will run ingestion every {interval_hours} hours")
 
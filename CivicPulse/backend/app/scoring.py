@@ -1,8 +1,12 @@
 """Safety scoring module for events and routes."""
 import math
+import time
 from datetime import datetime
-from typing import Dict, Any, List, Tuple
-import polyline
+from typing import Dict, Any, List, Tuple, Union
+
+import numpy as np
+
+from .events import EventColumns, decayed_score, epoch_seconds, haversine_matrix, static_score, valid_severity
 
 
 def compute_score(event: Dict[str, Any]) -> float:
@@ -17,117 +21,191 @@ def compute_score(event: Dict[str, Any]) -> float:
     - normalized_score = min(100, max(0, raw_score))
     """
     # Extract severity from LLM analysis (1-10 scale)
-    severity = event.get("severity", 5)
-    if not isinstance(severity, (int, float)) or severity < 1 or severity > 10:
-        severity = 5
-    
-    severity_score = (severity / 10.0) * 100.0
-    
-    # Apply recency decay
-    timestamp = event.get("timestamp")
-    if isinstance(timestamp, str):
-        try:
-            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-        except:
-            timestamp = datetime.utcnow()
-    elif not isinstance(timestamp, datetime):
-        timestamp = datetime.utcnow()
-    
-    hours_since = (datetime.utcnow() - timestamp.replace(tzinfo=None)).total_seconds() / 3600.0
-    decay = math.exp(-hours_since / 24.0)  # Exponential decay over 24 hours
-    
-    # Keyword impact (additional risk from keywords)
-    keyword_impact = 0.0
-    text = (event.get("title", "") + " " + event.get("text", "")).lower()
-    
-    # High-risk keywords
-    high_risk_keywords = ["shooting", "murder", "homicide", "stabbing", "fire", "explosion"]
-    if any(kw in text for kw in high_risk_keywords):
-        keyword_impact += 15.0
-    
-    # Medium-risk keywords
-    medium_risk_keywords = ["assault", "robbery", "accident", "crash", "emergency"]
-    if any(kw in text for kw in medium_risk_keywords):
-        keyword_impact += 8.0
-    
-    # Compute raw score
-    raw_score = severity_score * decay + keyword_impact
-    
-    # Normalize to 0-100
-    normalized_score = max(0.0, min(100.0, raw_score))
+    severity = valid_severity(event.get("severity", 5))
     
-    return normalized_score
+    # Recency decay applies to the severity part; keyword impact is added on top
+    age_seconds = time.time() - epoch_seconds(event.get("timestamp"))
+    return decayed_score(severity, static_score(event), age_seconds)
 
 
-def decode_polyline(encoded_polyline: str) -> List[Tuple[float, float]]:
-    """Decode Google Maps polyline to list of (lat, lng) tuples."""
+def score_fields(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    safety_score plus the parts background rescoring recomputes it from.
+
+    static_score is the time-independent keyword impact; scored_at is when
+    safety_score was last brought up to date (see app/rescoring.py).
+    """
+    return {
+        "safety_score": compute_score(event),
+        "static_score": static_score(event),
+        "scored_at": datetime.utcnow()
+    }
+
+
+def decode_polyline(encoded_polyline: str) -> np.ndarray:
+    """
+    Decode a Google Maps polyline into an (n, 2) array of lat, lng.
+
+    Every value is a run of 5-bit chunks, least significant first, with 0x20
+    set on all but the last; all runs are decoded at once instead of
+    character by character.
+    """
     try:
-        decoded = polyline.decode(encoded_polyline)
-        return [(lat, lng) for lat, lng in decoded]
+        chunks = np.frombuffer(encoded_polyline.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+        if len(chunks) == 0:
+            return np.zeros((0, 2))
+        if chunks.min() < 0 or chunks[-1] & 0x20:
+            raise ValueError("invalid or truncated polyline")
+        last = (chunks & 0x20) == 0
+        # Value index of every chunk, and the chunk's position within its value
+        value = np.concatenate(([0], np.cumsum(last)[:-1]))
+        starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+        position = np.arange(len(chunks)) - starts[value]
+        values = np.add.reduceat((chunks & 0x1f) << (5 * position), starts)
+        if len(values) % 2:
+            raise ValueError("odd number of values")
+        deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+        return np.cumsum(deltas.reshape(-1, 2), axis=0) / 1e5
     except Exception as e:
         print(f"Polyline decode error: {e}")
-        return []
+        return np.zeros((0, 2))
+
+
+def encode_polyline(coordinates) -> str:
+    """Encode (lat, lng) pairs (a list of tuples or an (n, 2) array) as a Google Maps polyline."""
+    points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0:
+        return ""
+    # Python's round() halves away from zero, as the reference encoder does
+    scaled = np.sign(points) * np.floor(np.abs(points) * 1e5 + 0.5)
+    deltas = np.diff(scaled.astype(np.int64), axis=0, prepend=0).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    # Up to 7 chunks of 5 bits per value; a value uses as many as its highest set bit needs
+    shifts = 5 * np.arange(7)
+    chunks = (values[:, None] >> shifts[None, :]) & 0x1f
+    needed = np.maximum(1, np.ceil(np.log2(values + 1) / 5).astype(np.int64))
+    used = np.arange(7)[None, :] < needed[:, None]
+    more = np.arange(7)[None, :] < needed[:, None] - 1
+    encoded = (chunks | np.where(more, 0x20, 0)) + 63
+    return encoded[used].astype(np.uint8).tobytes().decode("ascii")
+
+
+def simplify_polyline(points, tolerance_meters: float) -> np.ndarray:
+    """
+    Douglas-Peucker simplification of an (n, 2) lat/lng array.
+
+    Keeps the fewest points such that no dropped point is more than
+    tolerance_meters from the simplified line; the ends are always kept.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 3 or tolerance_meters <= 0:
+        return points
+    # Local planar coordinates in meters
+    meters_per_degree = 111320.0
+    y = points[:, 0] * meters_per_degree
+    x = points[:, 1] * meters_per_degree * math.cos(math.radians(float(points[:, 0].mean())))
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length_sq = dx * dx + dy * dy
+        # Distance to the segment (to the first point when both ends coincide)
+        t = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0) if length_sq > 0 else 0.0
+        distances = np.hypot(px - t * dx, py - t * dy)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_meters:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def resample_polyline(points, spacing_meters: float, max_points: int = 0) -> np.ndarray:
+    """
+    Evenly spaced points along an (n, 2) lat/lng polyline, at most spacing_meters apart.
+
+    The ends are kept; max_points (when set) caps the count, widening the spacing.
+    Simplified shapes are resampled like this before risk sampling, since a
+    straight street simplifies to its two ends.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 2 or spacing_meters <= 0:
+        return points
+    meters_per_degree = 111320.0
+    cos_lat = math.cos(math.radians(float(points[:, 0].mean())))
+    dy = np.diff(points[:, 0]) * meters_per_degree
+    dx = np.diff(points[:, 1]) * meters_per_degree * cos_lat
+    along = np.concatenate(([0.0], np.cumsum(np.hypot(dx, dy))))
+    count = max(2, int(math.ceil(along[-1] / spacing_meters)) + 1)
+    if max_points:
+        count = min(count, max(2, max_points))
+    at = np.linspace(0.0, along[-1], count)
+    return np.column_stack((np.interp(at, along, points[:, 0]), np.interp(at, along, points[:, 1])))
+
+
+def events_near(points, events: EventColumns, radius_meters: float, block: int = 20_000) -> EventColumns:
+    """Events within radius_meters of any point, checked block events at a time to bound the distance matrix."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0 or len(events) == 0:
+        return EventColumns.empty()
+    keep = np.zeros(len(events), dtype=bool)
+    for start in range(0, len(events), block):
+        end = min(start + block, len(events))
+        distances = haversine_matrix(points[:, 0], points[:, 1], events.lat[start:end], events.lng[start:end])
+        keep[start:end] = (distances <= radius_meters).any(axis=0)
+    return events.take(keep)
 
 
 def compute_route_risk(
-    route_coordinates: List[Tuple[float, float]],
-    nearby_events: List[Dict[str, Any]],
-    radius_meters: float = 50.0
+    route_coordinates: Union[np.ndarray, List[Tuple[float, float]]],
+    nearby_events: Union[EventColumns, List[Dict[str, Any]]],
+    radius_meters: float = 50.0,
+    sample: bool = True
 ) -> Tuple[float, int]:
     """
     Compute aggregate risk for a route by sampling points and checking nearby events.
     
+    nearby_events may be event documents or EventColumns; all sampled points
+    are checked against all events in one array operation. With sample=False
+    every given point is used (points already from resample_polyline).
+    
     Returns:
         (aggregate_risk_score, event_count)
     """
-    if not route_coordinates:
+    if len(route_coordinates) == 0:
         return 0.0, 0
     
     # Sample points along the route (every 100m or so)
-    sampled_points = []
-    if len(route_coordinates) <= 10:
+    if len(route_coordinates) <= 10 or not sample:
         sampled_points = route_coordinates
     else:
         # Sample evenly along route
         step = max(1, len(route_coordinates) // 20)
         sampled_points = route_coordinates[::step]
     
-    total_risk = 0.0
-    event_count = 0
-    
-    # For each sampled point, find nearby events and aggregate risk
-    for lat, lng in sampled_points:
-        # Find events within radius
-        nearby = []
-        for event in nearby_events:
-            event_coords = event.get("coordinates", {})
-            event_lat = event_coords.get("lat")
-            event_lng = event_coords.get("lng")
-            
-            if event_lat is None or event_lng is None:
-                continue
-            
-            # Calculate distance (Haversine formula, simplified for small distances)
-            distance = haversine_distance(lat, lng, event_lat, event_lng)
-            
-            if distance <= radius_meters:
-                nearby.append((event, distance))
-        
-        # Weight risk by distance (closer = higher weight)
-        for event, distance in nearby:
-            event_risk = compute_score(event)
-            # Weight decreases with distance
-            weight = 1.0 - (distance / radius_meters)
-            total_risk += event_risk * weight
-            event_count += 1
+    events = nearby_events if isinstance(nearby_events, EventColumns) else EventColumns.from_docs(nearby_events)
+    if len(events) == 0:
+        return 0.0, 0
     
-    # Average risk across sampled points
-    if len(sampled_points) > 0:
-        aggregate_risk = total_risk / len(sampled_points)
-    else:
-        aggregate_risk = 0.0
+    points = np.asarray(sampled_points, dtype=np.float64)
+    distances = haversine_matrix(points[:, 0], points[:, 1], events.lat, events.lng)
+    
+    # Events without coordinates have NaN distances and never count
+    within = distances <= radius_meters
     
-    return aggregate_risk, event_count
+    # Weight risk by distance (closer = higher weight)
+    weights = np.where(within, 1.0 - distances / radius_meters, 0.0)
+    total_risk = float((weights @ events.scores()).sum())
+    event_count = int(within.sum())
+    
+    # Average risk across sampled points
+    return total_risk / len(sampled_points), event_count
 
 
 def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
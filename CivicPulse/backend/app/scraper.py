@@ -3,9 +3,25 @@ import feedparser
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import re
 
+from .cities import City, get_city
+from .compaction import clean_text, strip_html
+from .keywords import SAFETY_KEYWORDS, keyword_matcher
+from .resilience import CircuitOpen, get_upstream
+
+
+FEED_TIMEOUT_SECONDS = 10.0
+
+
+def fetch_feed(feed_url: str):
+    """Parsed feed; feedparser does not raise on HTTP or parse failures, so this does."""
+    feed = feedparser.parse(feed_url)
+    if feed.get("status", 200) >= 400 or (feed.bozo and not feed.entries):
+        raise RuntimeError(f"feed fetch failed: {feed.get('status') or feed.get('bozo_exception')}")
+    return feed
+
 
 def scrape_rss_feeds(feed_urls: List[str]) -> List[Dict[str, Any]]:
     """Scrape RSS feeds and return list of articles."""
@@ -13,7 +29,10 @@ def scrape_rss_feeds(feed_urls: List[str]) -> List[Dict[str, Any]]:
     
     for feed_url in feed_urls:
         try:
-            feed = feedparser.parse(feed_url)
+            # feedparser takes no timeout; the breaker still skips a feed that keeps failing
+            feed = get_upstream(f"feed:{feed_url}", FEED_TIMEOUT_SECONDS).call_sync(
+                lambda timeout: fetch_feed(feed_url)
+            )
             for entry in feed.entries:
                 published = None
                 if hasattr(entry, 'published_parsed') and entry.published_parsed:
@@ -23,22 +42,24 @@ def scrape_rss_feeds(feed_urls: List[str]) -> List[Dict[str, Any]]:
                 else:
                     published = datetime.utcnow()
                 
-                # Combine title and summary for text
-                text = ""
-                if hasattr(entry, 'title'):
-                    text += entry.title + " "
-                if hasattr(entry, 'summary'):
-                    text += entry.summary
-                if hasattr(entry, 'description'):
-                    text += " " + entry.description
+                # Combine title, summary and description as plain text, without
+                # the markup and the sentences they repeat from each other
+                text = clean_text([
+                    getattr(entry, 'title', None),
+                    getattr(entry, 'summary', None),
+                    getattr(entry, 'description', None)
+                ])
                 
                 articles.append({
                     "source": f"rss:{feed_url}",
-                    "title": getattr(entry, 'title', 'No title'),
-                    "text": text.strip(),
+                    "title": strip_html(getattr(entry, 'title', 'No title')),
+                    "text": text,
                     "published": published,
                     "url": getattr(entry, 'link', '')
                 })
+        except CircuitOpen:
+            print(f"Skipping RSS feed {feed_url}: circuit open")
+            continue
         except Exception as e:
             print(f"Error scraping RSS feed {feed_url}: {e}")
             continue
@@ -55,11 +76,9 @@ def scrape_reddit_rss(subreddit: str) -> List[Dict[str, Any]]:
 def scrape_police_blotter(url: str, keywords: List[str] = None) -> List[Dict[str, Any]]:
     """Scrape HTML police blotter page for safety-related content."""
     if keywords is None:
-        keywords = [
-            "arrest", "robbery", "assault", "theft", "burglary",
-            "accident", "crash", "collision", "fire", "emergency",
-            "incident", "crime", "violence", "shooting", "stabbing"
-        ]
+        matcher, category = SAFETY_KEYWORDS, "blotter"
+    else:
+        matcher, category = keyword_matcher(tuple(keywords)), "match"
     
     articles = []
     
@@ -67,22 +86,28 @@ def scrape_police_blotter(url: str, keywords: List[str] = None) -> List[Dict[str
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        def fetch(timeout: float):
+            response = requests.get(url, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            return response
         
-        # Find all paragraphs and divs
-        text_elements = soup.find_all(['p', 'div', 'article', 'section'])
+        response = get_upstream(f"feed:{url}", FEED_TIMEOUT_SECONDS).call_sync(fetch)
         
-        for element in text_elements:
+        soup = BeautifulSoup(response.content, 'html.parser')
+        
+        # Find all paragraphs and divs, skipping very short text
+        text_elements = []
+        for element in soup.find_all(['p', 'div', 'article', 'section']):
             text = element.get_text(strip=True)
-            if not text or len(text) < 50:  # Skip very short text
-                continue
-            
-            # Check if text contains any keywords
-            text_lower = text.lower()
-            if any(keyword.lower() in text_lower for keyword in keywords):
+            if text and len(text) >= 50:
+                text_elements.append((element, text))
+        
+        # Check all texts for keywords in one batch
+        hits = matcher.match_many(text for _, text in text_elements)
+        
+        for (element, text), element_hits in zip(text_elements, hits):
+            if category in element_hits:
                 # Try to extract title from parent or heading
                 title = "Police Blotter Entry"
                 heading = element.find_previous(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
@@ -123,16 +148,12 @@ def scrape_police_blotter(url: str, keywords: List[str] = None) -> List[Dict[str
     return articles
 
 
-def run_one_shot() -> List[Dict[str, Any]]:
-    """Run a one-shot scrape of all configured sources."""
+def run_one_shot(city: Optional[City] = None) -> List[Dict[str, Any]]:
+    """Run a one-shot scrape of a city's sources (this process's city by default)."""
+    city = city or get_city()
     all_articles = []
-    
-    # Sample RSS feeds (can be configured via env)
-    rss_feeds = [
-        "https://www.nyc.gov/rss/feeds/cityhall.rss",
-        "https://www1.nyc.gov/nyc-resources/feeds/all.rss",
-        # Add more city-specific feeds
-    ]
+    # A source listed twice is still scraped once
+    rss_feeds = list(dict.fromkeys(city.rss_feeds))
     
     # Scrape RSS feeds
     print("Scraping RSS feeds...")
@@ -140,20 +161,18 @@ def run_one_shot() -> List[Dict[str, Any]]:
     all_articles.extend(rss_articles)
     print(f"Found {len(rss_articles)} RSS articles")
     
-    # Scrape Reddit (example: NYC subreddit)
-    print("Scraping Reddit...")
-    try:
-        reddit_articles = scrape_reddit_rss("nyc")
-        all_articles.extend(reddit_articles)
-        print(f"Found {len(reddit_articles)} Reddit posts")
-    except Exception as e:
-        print(f"Reddit scraping failed: {e}")
+    # Scrape Reddit
+    for subreddit in dict.fromkeys(city.subreddits):
+        print(f"Scraping Reddit r/{subreddit}...")
+        try:
+            reddit_articles = scrape_reddit_rss(subreddit)
+            all_articles.extend(reddit_articles)
+            print(f"Found {len(reddit_articles)} Reddit posts")
+        except Exception as e:
+            print(f"Reddit scraping failed: {e}")
     
-    # Scrape sample police blotter (example URL - user should configure)
-    police_blotter_urls = [
-        # Add actual police blotter URLs here
-        # "https://example.com/police-blotter"
-    ]
+    # Scrape police blotters
+    police_blotter_urls = dict.fromkeys(city.blotter_urls)
     
     for url in police_blotter_urls:
         print(f"Scraping police blotter: {url}")
@@ -164,5 +183,5 @@ def run_one_shot() -> List[Dict[str, Any]]:
         except Exception as e:
             print(f"Police blotter scraping failed: {e}")
     
-    print(f"Total articles scraped: {len(all_articles)}")
+    print(f"Total articles scraped for {city.name}: {len(all_articles)}")
     return all_articles
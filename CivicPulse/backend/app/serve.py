@@ -0,0 +1,54 @@
+"""Multi-worker serving: one snapshot refresher plus one API worker per core.
+
+    python -m app.serve
+
+starts the refresher (app/snapshot.py) in its own process, then uvicorn with
+WEB_CONCURRENCY workers (default: one per CPU) serving SERVE_APP, by default
+the read API (app/api.py); ingestion runs separately (python -m app.ingest).
+Every worker maps the same snapshot files from SNAPSHOT_DIR, so /events and route scoring read one
+shared copy of recent events instead of each worker querying Mongo. Until
+the first snapshot is published, workers fall back to Mongo.
+
+/dev/shm is used when available so snapshots live in RAM, not on disk.
+"""
+import asyncio
+import multiprocessing
+import os
+import tempfile
+
+import uvicorn
+
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+SERVE_APP = os.getenv("SERVE_APP", "app.api:app")
+
+
+def default_snapshot_dir() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "urbanpulse-snapshot")
+
+
+def run_refresher(directory: str):
+    """Entry point of the refresher process."""
+    from .snapshot import refresh_forever
+    asyncio.run(refresh_forever(directory))
+
+
+def main():
+    directory = os.environ.setdefault("SNAPSHOT_DIR", default_snapshot_dir())
+    # Workers are spawned after this point and inherit SNAPSHOT_DIR
+    refresher = multiprocessing.Process(target=run_refresher, args=(directory,), name="snapshot-refresher",
+                                        daemon=True)
+    refresher.start()
+    print(f"Serving with {WORKERS} workers, event snapshots in {directory}")
+    try:
+        uvicorn.run(SERVE_APP, host=HOST, port=PORT, workers=WORKERS)
+    finally:
+        refresher.terminate()
+        refresher.join(5)
+
+
+if __name__ == "__main__":
+    main()
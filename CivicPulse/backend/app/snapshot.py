@@ -0,0 +1,331 @@
+"""Versioned, memory-mapped snapshots of recent events shared by all workers.
+
+In multi-worker serving (app/serve.py) one refresher process reads the hot
+events from Mongo every SNAPSHOT_REFRESH_SECONDS and publishes them under
+SNAPSHOT_DIR as one directory per version:
+
+    v<version>/events.npy       structured array: lat, lng, time, severity,
+                                static_score, safety_score, type_code
+    v<version>/grid.npy         CSR offsets: events of grid cell c are rows
+                                grid[c]:grid[c + 1] (events are sorted by cell)
+    v<version>/docs.bin         /events JSON of every row, concatenated
+    v<version>/doc_offsets.npy  byte offsets of row i's JSON in docs.bin
+    v<version>/meta.json        version, window and grid geometry
+    CURRENT                     name of the newest complete version
+
+A version directory is complete before it is renamed into place, and CURRENT
+is replaced atomically, so readers never see a partial snapshot. Workers map
+the files read-only (np.load(mmap_mode="r")): every worker shares the same
+page-cache copy, and a worker picks up a new version by swapping one module
+global. Old versions stay mapped until no longer referenced; the refresher
+deletes all but the newest SNAPSHOT_KEEP_VERSIONS directories (mappings of a
+deleted file stay valid on Linux).
+
+A snapshot lags ingest by up to one refresh interval. One older than
+SNAPSHOT_MAX_AGE_SECONDS (the refresher has stopped) is treated as absent, so
+/events and route scoring fall back to Mongo instead of serving it forever.
+"""
+import asyncio
+import json
+import math
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .db import db
+from .events import EventRecord, EventColumns
+
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "")
+SNAPSHOT_HOURS = int(os.getenv("SNAPSHOT_HOURS", os.getenv("EVENTS_HOT_RETENTION_HOURS", "72")))
+REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "15"))
+GRID_DEGREES = float(os.getenv("SNAPSHOT_GRID_DEGREES", "0.01"))
+KEEP_VERSIONS = int(os.getenv("SNAPSHOT_KEEP_VERSIONS", "3"))
+MAX_AGE_SECONDS = float(os.getenv("SNAPSHOT_MAX_AGE_SECONDS", str(REFRESH_SECONDS * 4)))
+# How often a worker checks CURRENT for a new version
+POLL_SECONDS = 1.0
+# The grid is coarsened until it has at most this many cells
+MAX_GRID_CELLS = 1_000_000
+METERS_PER_DEGREE = 111320.0
+
+EVENT_DTYPE = np.dtype([
+    ("lat", "<f8"),
+    ("lng", "<f8"),
+    ("time", "<f8"),
+    ("severity", "<f4"),
+    ("static_score", "<f4"),
+    ("safety_score", "<f4"),
+    ("type_code", "i1"),
+])
+
+
+def map_event(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """An event as /events returns it."""
+    coords = doc.get("coordinates", {})
+    timestamp = doc.get("timestamp")
+    return {
+        "_id": str(doc.get("_id")),
+        "source": doc.get("source", ""),
+        "title": doc.get("title", ""),
+        "text": doc.get("text", "")[:200],
+        "timestamp": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp,
+        "coordinates": {
+            "lat": coords.get("lat") if isinstance(coords, dict) else None,
+            "lng": coords.get("lng") if isinstance(coords, dict) else None
+        },
+        "safety_score": doc.get("safety_score", 0),
+        "event_type": doc.get("event_type", "other"),
+        "severity": doc.get("severity", 5),
+        "report_count": doc.get("report_count", 1)
+    }
+
+
+def grid_geometry(lats: np.ndarray, lngs: np.ndarray, cell_degrees: float = GRID_DEGREES) -> Dict[str, Any]:
+    """Origin, cell size and shape of a grid covering every point."""
+    if len(lats) == 0:
+        return {"south": 0.0, "west": 0.0, "cell_degrees": cell_degrees, "rows": 1, "cols": 1}
+    south = math.floor(lats.min() / cell_degrees) * cell_degrees
+    west = math.floor(lngs.min() / cell_degrees) * cell_degrees
+    while True:
+        rows = int((lats.max() - south) // cell_degrees) + 1
+        cols = int((lngs.max() - west) // cell_degrees) + 1
+        if rows * cols <= MAX_GRID_CELLS:
+            return {"south": south, "west": west, "cell_degrees": cell_degrees, "rows": rows, "cols": cols}
+        cell_degrees *= 2
+
+
+def _cell_coords(geometry: Dict[str, Any], lats, lngs) -> Tuple[np.ndarray, np.ndarray]:
+    size = geometry["cell_degrees"]
+    rows = np.floor((np.asarray(lats) - geometry["south"]) / size).astype(np.int64)
+    cols = np.floor((np.asarray(lngs) - geometry["west"]) / size).astype(np.int64)
+    return rows, cols
+
+
+def build_snapshot(docs: Iterable[Dict[str, Any]], cell_degrees: float = GRID_DEGREES) -> Dict[str, Any]:
+    """Sorted event rows, grid offsets and /events JSON for a set of event documents."""
+    records, rendered = [], []
+    for doc in docs:
+        record = EventRecord.from_doc(doc)
+        if math.isnan(record.lat) or math.isnan(record.lng):
+            continue
+        records.append((record, doc.get("safety_score", 0) or 0))
+        rendered.append(json.dumps(map_event(doc), default=str).encode())
+
+    events = np.zeros(len(records), dtype=EVENT_DTYPE)
+    for i, (record, safety_score) in enumerate(records):
+        events[i] = (record.lat, record.lng, record.time, record.severity, record.static_score,
+                     safety_score, record.type_code)
+
+    geometry = grid_geometry(events["lat"], events["lng"], cell_degrees)
+    rows, cols = _cell_coords(geometry, events["lat"], events["lng"])
+    cells = rows * geometry["cols"] + cols
+    order = np.argsort(cells, kind="stable")
+    events = events[order]
+    grid = np.searchsorted(cells[order], np.arange(geometry["rows"] * geometry["cols"] + 1)).astype(np.int64)
+
+    rendered = [rendered[i] for i in order]
+    offsets = np.zeros(len(rendered) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(doc) for doc in rendered])
+    return {"events": events, "grid": grid, "docs": b"".join(rendered), "doc_offsets": offsets,
+            "geometry": geometry}
+
+
+def publish_snapshot(built: Dict[str, Any], directory: str, window_hours: float = SNAPSHOT_HOURS,
+                     keep: int = KEEP_VERSIONS) -> str:
+    """Write a built snapshot as a new version and point CURRENT at it."""
+    os.makedirs(directory, exist_ok=True)
+    version = f"v{time.time_ns()}"
+    staging = os.path.join(directory, f".{version}.tmp")
+    os.makedirs(staging)
+    np.save(os.path.join(staging, "events.npy"), built["events"])
+    np.save(os.path.join(staging, "grid.npy"), built["grid"])
+    np.save(os.path.join(staging, "doc_offsets.npy"), built["doc_offsets"])
+    with open(os.path.join(staging, "docs.bin"), "wb") as f:
+        f.write(built["docs"])
+    meta = {
+        "version": version,
+        "created_at": time.time(),
+        "window_hours": window_hours,
+        "count": int(len(built["events"])),
+        "grid": built["geometry"]
+    }
+    with open(os.path.join(staging, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    os.rename(staging, os.path.join(directory, version))
+
+    current = os.path.join(directory, ".CURRENT.tmp")
+    with open(current, "w") as f:
+        f.write(version)
+    os.replace(current, os.path.join(directory, "CURRENT"))
+
+    versions = sorted(name for name in os.listdir(directory) if name.startswith("v"))
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return version
+
+
+class Snapshot:
+    """One published version, mapped read-only."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.version = self.meta["version"]
+        self.window_hours = self.meta["window_hours"]
+        self.created_at = self.meta["created_at"]
+        self.geometry = self.meta["grid"]
+        self.events = np.load(os.path.join(path, "events.npy"), mmap_mode="r")
+        self.grid = np.load(os.path.join(path, "grid.npy"), mmap_mode="r")
+        self.doc_offsets = np.load(os.path.join(path, "doc_offsets.npy"), mmap_mode="r")
+        docs_path = os.path.join(path, "docs.bin")
+        # np.memmap cannot map an empty file
+        if os.path.getsize(docs_path):
+            self.docs = np.memmap(docs_path, dtype=np.uint8, mode="r")
+        else:
+            self.docs = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def covers(self, since_hours: Optional[float]) -> bool:
+        """Whether a since_hours window lies entirely inside the snapshot's window."""
+        return since_hours is not None and 0 < since_hours <= self.window_hours
+
+    def _rows_in_cells(self, row_lo: int, row_hi: int, col_lo: int, col_hi: int) -> np.ndarray:
+        """Event rows of every cell in an inclusive rectangle of cells."""
+        g = self.geometry
+        row_lo, row_hi = max(row_lo, 0), min(row_hi, g["rows"] - 1)
+        col_lo, col_hi = max(col_lo, 0), min(col_hi, g["cols"] - 1)
+        if row_lo > row_hi or col_lo > col_hi or len(self) == 0:
+            return np.zeros(0, dtype=np.int64)
+        # Cells of one grid row are contiguous, so each row is one slice
+        starts = np.arange(row_lo, row_hi + 1) * g["cols"]
+        lo = np.asarray(self.grid[starts + col_lo])
+        hi = np.asarray(self.grid[starts + col_hi + 1])
+        return _concat_ranges(lo, hi)
+
+    def query(self, bbox: Optional[Dict[str, Dict[str, float]]] = None,
+              since_hours: Optional[float] = None, limit: Optional[int] = None,
+              now: Optional[float] = None) -> np.ndarray:
+        """Rows inside bbox (sw/ne corners) and the last since_hours hours."""
+        if bbox:
+            south, west = bbox["sw"]["lat"], bbox["sw"]["lng"]
+            north, east = bbox["ne"]["lat"], bbox["ne"]["lng"]
+            (row_lo, row_hi), (col_lo, col_hi) = _cell_coords(self.geometry, [south, north], [west, east])
+            rows = self._rows_in_cells(int(row_lo), int(row_hi), int(col_lo), int(col_hi))
+            lat, lng = self.events["lat"][rows], self.events["lng"][rows]
+            rows = rows[(lat >= south) & (lat <= north) & (lng >= west) & (lng <= east)]
+        else:
+            rows = np.arange(len(self))
+        if since_hours:
+            now = time.time() if now is None else now
+            rows = rows[self.events["time"][rows] >= now - since_hours * 3600]
+        return rows[:limit] if limit is not None else rows
+
+    def near(self, points: List[Tuple[float, float]], radius_meters: float) -> np.ndarray:
+        """Rows in every grid cell within radius_meters of any point (a superset of the events in range)."""
+        if len(points) == 0 or len(self) == 0:
+            return np.zeros(0, dtype=np.int64)
+        g = self.geometry
+        pts = np.asarray(points, dtype=np.float64)
+        rows, cols = _cell_coords(g, pts[:, 0], pts[:, 1])
+        lat_span = math.ceil(radius_meters / METERS_PER_DEGREE / g["cell_degrees"])
+        cos_lat = max(0.01, float(np.cos(np.radians(np.abs(pts[:, 0]).max()))))
+        lng_span = math.ceil(radius_meters / (METERS_PER_DEGREE * cos_lat) / g["cell_degrees"])
+        dr, dc = np.meshgrid(np.arange(-lat_span, lat_span + 1), np.arange(-lng_span, lng_span + 1))
+        rows = (rows[:, None] + dr.ravel()[None, :]).ravel()
+        cols = (cols[:, None] + dc.ravel()[None, :]).ravel()
+        inside = (rows >= 0) & (rows < g["rows"]) & (cols >= 0) & (cols < g["cols"])
+        cells = np.unique(rows[inside] * g["cols"] + cols[inside])
+        return _concat_ranges(np.asarray(self.grid[cells]), np.asarray(self.grid[cells + 1]))
+
+    def columns(self, rows: np.ndarray) -> EventColumns:
+        """EventColumns for scoring; ids are snapshot row numbers."""
+        events = self.events[rows]
+        return EventColumns([str(row) for row in rows], events["lat"], events["lng"], events["time"],
+                            events["severity"], events["static_score"], events["type_code"])
+
+    def events_json(self, rows: np.ndarray) -> bytes:
+        """{"events": [...], "count": n} for the given rows, straight from the mapped JSON."""
+        starts = self.doc_offsets[rows]
+        ends = self.doc_offsets[rows + 1]
+        docs = self.docs
+        body = b",".join(docs[start:end].tobytes() for start, end in zip(starts.tolist(), ends.tolist()))
+        return b'{"events":[' + body + b'],"count":' + str(len(rows)).encode() + b"}"
+
+
+def _concat_ranges(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(lo[i], hi[i]) for every i."""
+    lengths = hi - lo
+    keep = lengths > 0
+    lo, lengths = lo[keep], lengths[keep]
+    if len(lo) == 0:
+        return np.zeros(0, dtype=np.int64)
+    # Offset of each position from the start of its range
+    starts = np.repeat(lo - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return starts + np.arange(lengths.sum())
+
+
+_snapshot: Optional[Snapshot] = None
+_checked_at = 0.0
+_stale_version: Optional[str] = None
+
+
+def get_snapshot(directory: Optional[str] = None) -> Optional[Snapshot]:
+    """
+    Newest published snapshot, or None outside multi-worker serving.
+
+    CURRENT is re-read at most every POLL_SECONDS; a new version replaces the
+    module global in one assignment, so requests already holding the old
+    Snapshot finish on it. A snapshot older than SNAPSHOT_MAX_AGE_SECONDS
+    gives None.
+    """
+    global _snapshot, _checked_at
+    directory = directory if directory is not None else SNAPSHOT_DIR
+    if not directory:
+        return None
+    now = time.monotonic()
+    if now - _checked_at < POLL_SECONDS and _snapshot is not None:
+        return _fresh(_snapshot)
+    _checked_at = now
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            version = f.read().strip()
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = Snapshot(os.path.join(directory, version))
+    except (OSError, ValueError, KeyError) as e:
+        if _snapshot is None:
+            print(f"No event snapshot available: {e}")
+    return _fresh(_snapshot)
+
+
+def _fresh(snapshot: Optional[Snapshot], max_age: Optional[float] = None) -> Optional[Snapshot]:
+    """The snapshot, or None once it is older than max_age (SNAPSHOT_MAX_AGE_SECONDS)."""
+    global _stale_version
+    max_age = MAX_AGE_SECONDS if max_age is None else max_age
+    if snapshot is None or time.time() - snapshot.created_at <= max_age:
+        return snapshot
+    if _stale_version != snapshot.version:
+        _stale_version = snapshot.version
+        print(f"Event snapshot {snapshot.version} is {time.time() - snapshot.created_at:.0f}s old, "
+              f"reading from Mongo until a new one is published")
+    return None
+
+
+async def refresh_forever(directory: str, interval: float = REFRESH_SECONDS, window_hours: int = SNAPSHOT_HOURS):
+    """Publish a new snapshot of the last window_hours of events every interval seconds."""
+    await db.connect()
+    while True:
+        started = time.monotonic()
+        try:
+            docs = await db.snapshot_events(window_hours)
+            version = publish_snapshot(build_snapshot(docs), directory, window_hours)
+            print(f"Published event snapshot {version}: {len(docs)} events "
+                  f"in {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            print(f"Snapshot refresh failed: {e}")
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,245 @@
+"""Micro-benchmarks for the scoring and geometry hot paths.
+
+Usage:
+    python scripts/bench_scoring.py                      # run and print
+    python scripts/bench_scoring.py --save               # store as baseline
+    python scripts/bench_scoring.py --compare            # fail on regressions
+    python scripts/bench_scoring.py --quick --only compute_score
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+# Add parent directory to path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from app.events import EventColumns
+from app.keywords import (
+    BLOTTER_KEYWORDS,
+    EVENT_CATEGORY_KEYWORDS,
+    HIGH_RISK_KEYWORDS,
+    MEDIUM_RISK_KEYWORDS,
+    SAFETY_KEYWORDS,
+)
+from app.scoring import (
+    compute_score,
+    compute_route_risk,
+    decode_polyline,
+    encode_polyline,
+    haversine_distance,
+    normalize_route_metrics,
+    simplify_polyline,
+)
+from scripts.synthetic import CENTER_LAT, CENTER_LNG, SyntheticCity
+
+
+DEFAULT_BASELINE = backend_path / "benchmarks" / "baseline_scoring.json"
+EVENT_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+ROUTE_SIZES = [10, 100, 1_000, 10_000]
+QUICK_MAX_EVENTS = 10_000
+
+# Events cluster around hotspots on a street grid; routes walk the same grid
+CITY = SyntheticCity(seed=42)
+
+
+def synthetic_events(n: int) -> List[Dict[str, Any]]:
+    """Build n event documents shaped like the ones ingest stores."""
+    return CITY.events(n, score=False)
+
+
+def synthetic_route(n_points: int, seed: int = 7) -> List[Tuple[float, float]]:
+    """Street-following route of n_points about 10 m apart."""
+    return CITY.route_points(n_points, stream=seed)
+
+
+def legacy_keyword_scan(text: str) -> Tuple[str, bool, bool, bool]:
+    """The per-caller any() scans the shared matcher replaced (classifier, scorer, scraper)."""
+    text_lower = text.lower()
+    event_type = "other"
+    for category, keywords in EVENT_CATEGORY_KEYWORDS.items():
+        if any(kw in text_lower for kw in keywords):
+            event_type = category
+            break
+    score_text = text.lower()
+    high = any(kw in score_text for kw in HIGH_RISK_KEYWORDS)
+    medium = any(kw in score_text for kw in MEDIUM_RISK_KEYWORDS)
+    blotter = any(kw.lower() in text_lower for kw in BLOTTER_KEYWORDS)
+    return event_type, high, medium, blotter
+
+
+def time_case(fn: Callable[[], Any], min_time: float = 0.2, max_repeats: int = 7) -> Dict[str, float]:
+    """Run fn until min_time has elapsed (at least once) and return timings."""
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < max_repeats:
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+        if time.perf_counter() - start >= min_time:
+            break
+    return {
+        "best_seconds": min(timings),
+        "median_seconds": statistics.median(timings),
+        "repeats": len(timings),
+    }
+
+
+def build_cases(event_sizes: List[int], route_sizes: List[int]) -> List[Tuple[str, int, Callable[[], Any]]]:
+    """
+    Return (case_id, items, callable) tuples for every workload.
+
+    A case may carry a fourth element, a setup callable run (untimed) right
+    before the case is timed, e.g. to warm a cache the previous case cleared.
+    """
+    cases = []
+    max_events = max(event_sizes)
+    all_events = synthetic_events(max_events)
+    mid_route = synthetic_route(1_000)
+
+    for n in event_sizes:
+        events = all_events[:n]
+        cases.append((f"compute_score/events={n}", n, lambda events=events: [compute_score(e) for e in events]))
+
+    for n in event_sizes:
+        coords = [(e["coordinates"]["lat"], e["coordinates"]["lng"]) for e in all_events[:n]]
+        cases.append((
+            f"haversine_distance/pairs={n}", n,
+            lambda coords=coords: [haversine_distance(CENTER_LAT, CENTER_LNG, lat, lng) for lat, lng in coords]
+        ))
+
+    for n in event_sizes:
+        events = all_events[:n]
+        cases.append((
+            f"compute_route_risk/points=1000/events={n}", n,
+            lambda events=events: compute_route_risk(mid_route, events, radius_meters=50.0)
+        ))
+
+    for n in event_sizes:
+        columns = EventColumns.from_docs(all_events[:n])
+        cases.append((
+            f"compute_route_risk_columns/points=1000/events={n}", n,
+            lambda columns=columns: compute_route_risk(mid_route, columns, radius_meters=50.0)
+        ))
+        cases.append((f"event_columns_from_docs/events={n}", n, lambda n=n: EventColumns.from_docs(all_events[:n])))
+
+    route_events = all_events[:1_000]
+    for n in route_sizes:
+        if n == 1_000 and 1_000 in event_sizes:
+            continue  # Same workload as the 1000-event case above
+        route = synthetic_route(n)
+        cases.append((
+            f"compute_route_risk/points={n}/events=1000", n,
+            lambda route=route: compute_route_risk(route, route_events, radius_meters=50.0)
+        ))
+
+    for n in route_sizes:
+        encoded = encode_polyline(synthetic_route(n))
+        cases.append((f"decode_polyline/points={n}", n, lambda encoded=encoded: decode_polyline(encoded)))
+        points = decode_polyline(encoded)
+        cases.append((f"encode_polyline/points={n}", n, lambda points=points: encode_polyline(points)))
+        cases.append((f"simplify_polyline/points={n}/tolerance=5m", n,
+                      lambda points=points: simplify_polyline(points, 5.0)))
+
+    for n in [n for n in event_sizes if n <= 100_000]:
+        texts = [f"{e['title']} {e['text']}" for e in all_events[:n]]
+        cases.append((f"keywords/legacy_scans/texts={n}", n, lambda texts=texts: [legacy_keyword_scan(t) for t in texts]))
+        cases.append((f"keywords/matcher_uncached/texts={n}", n,
+                      lambda texts=texts: [SAFETY_KEYWORDS._match(t) for t in texts]))
+        # Cold: an empty cache and distinct texts (synthetic ones repeat), so every text misses
+        unique = [f"{text} #{i}" for i, text in enumerate(texts)]
+        cases.append((f"keywords/matcher_cold/texts={n}", n,
+                      lambda unique=unique: (SAFETY_KEYWORDS._cached_match.cache_clear(), SAFETY_KEYWORDS.match_many(unique))))
+        # Warm: the same texts matched again, as when events are rescored per route
+        cases.append((f"keywords/matcher_warm/texts={n}", n, lambda texts=texts: SAFETY_KEYWORDS.match_many(texts),
+                      lambda texts=texts: SAFETY_KEYWORDS.match_many(texts)))
+
+    for n in [3, 100, 10_000]:
+        rng = random.Random(n)
+        routes = [
+            {"distance_meters": rng.uniform(500, 20_000), "aggregate_risk": rng.uniform(0, 100)}
+            for _ in range(n)
+        ]
+        cases.append((f"normalize_route_metrics/routes={n}", n, lambda routes=routes: normalize_route_metrics(routes)))
+
+    return cases
+
+
+def run(event_sizes: List[int], route_sizes: List[int], only: List[str]) -> Dict[str, Any]:
+    """Run all selected cases and return a results document."""
+    results = {}
+    for case_id, items, fn, *setup in build_cases(event_sizes, route_sizes):
+        if only and not any(case_id.startswith(name) for name in only):
+            continue
+        for prepare in setup:
+            prepare()
+        timing = time_case(fn)
+        timing["items"] = items
+        timing["ns_per_item"] = timing["best_seconds"] / items * 1e9
+        results[case_id] = timing
+        print(f"{case_id:<50} {timing['best_seconds'] * 1000:>12.3f} ms  {timing['ns_per_item']:>12.1f} ns/item")
+
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return a description of every case slower than baseline by more than threshold."""
+    regressions = []
+    for case_id, result in current["results"].items():
+        base = baseline.get("results", {}).get(case_id)
+        if not base:
+            continue
+        ratio = result["best_seconds"] / base["best_seconds"]
+        if ratio > 1.0 + threshold:
+            regressions.append(f"{case_id}: {ratio:.2f}x baseline "
+                               f"({base['best_seconds'] * 1000:.3f} ms -> {result['best_seconds'] * 1000:.3f} ms)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scoring and geometry hot paths")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON path")
+    parser.add_argument("--save", action="store_true", help="Write results to the baseline file")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline file")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown before failing (0.15 = 15%%)")
+    parser.add_argument("--quick", action="store_true", help=f"Cap event workloads at {QUICK_MAX_EVENTS}")
+    parser.add_argument("--only", nargs="*", default=[], help="Run only cases starting with these names")
+    args = parser.parse_args()
+
+    event_sizes = [n for n in EVENT_SIZES if not args.quick or n <= QUICK_MAX_EVENTS]
+    current = run(event_sizes, ROUTE_SIZES, args.only)
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(current, indent=2))
+        print(f"\nBaseline written to {args.baseline}")
+
+    if args.compare:
+        if not args.baseline.exists():
+            print(f"\nNo baseline at {args.baseline}; run with --save first")
+            sys.exit(2)
+        regressions = compare(current, json.loads(args.baseline.read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Startup time and resident memory of each entry point.
+
+Every run imports one module in a fresh interpreter and reports the import
+time, the process's peak RSS and which heavy dependencies were loaded. The
+read API (app.api) must not load any of HEAVY_MODULES.
+
+Usage:
+    python scripts/bench_startup.py                  # all entry points, 5 runs each
+    python scripts/bench_startup.py --runs 10 --only app.api
+    python scripts/bench_startup.py --check          # exit 1 if app.api loads a heavy module
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+backend_path = Path(__file__).parent.parent
+
+ENTRY_POINTS = ["app.api", "app.serve", "app.ingest", "app.main"]
+HEAVY_MODULES = ["openai", "bs4", "feedparser", "apscheduler", "requests", "app.scraper", "app.llm"]
+LEAN_ENTRY_POINTS = ["app.api", "app.serve"]
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   "modules": len(sys.modules), "heavy": heavy}}))
+"""
+
+
+def probe(module: str) -> dict:
+    """Import module in a fresh interpreter and return its measurements."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=backend_path, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(module: str, runs: int) -> dict:
+    samples = [probe(module) for _ in range(runs)]
+    return {
+        "module": module,
+        "import_ms": statistics.median(s["seconds"] for s in samples) * 1000,
+        "max_rss_mb": statistics.median(s["max_rss_kb"] for s in samples) / 1024,
+        "modules": samples[-1]["modules"],
+        "heavy": samples[-1]["heavy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark entry point startup time and RSS")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per entry point")
+    parser.add_argument("--only", nargs="*", default=[], help="Entry points to measure")
+    parser.add_argument("--check", action="store_true", help="Fail if a lean entry point loads a heavy module")
+    args = parser.parse_args()
+
+    results = [measure(module, args.runs) for module in (args.only or ENTRY_POINTS)]
+
+    print(f"{'entry point':<14} {'import ms':>10} {'peak RSS MB':>12} {'modules':>8}  heavy modules loaded")
+    for r in results:
+        print(f"{r['module']:<14} {r['import_ms']:>10.0f} {r['max_rss_mb']:>12.1f} {r['modules']:>8}  "
+              f"{', '.join(r['heavy']) or '-'}")
+
+    if args.check:
+        bloated = [r for r in results if r["module"] in LEAN_ENTRY_POINTS and r["heavy"]]
+        for r in bloated:
+            print(f"FAIL: {r['module']} imports {', '.join(r['heavy'])}")
+        sys.exit(1 if bloated else 0)
+
+
+if __name__ == "__main__":
+    main()
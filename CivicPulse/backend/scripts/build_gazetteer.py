@@ -0,0 +1,96 @@
+"""Build a gazetteer CSV for app/gazetteer.py from a GeoNames dump.
+
+Usage:
+    python scripts/build_gazetteer.py US.txt --bbox 40.49,-74.27,40.92,-73.68 \
+        --output data/gazetteer/nyc.csv
+    python scripts/build_gazetteer.py US.txt --bbox ... --merge data/gazetteer/nyc.csv
+
+The input is a GeoNames country or cities file (tab-separated, from
+download.geonames.org/export/dump/). Places inside the bounding box are kept
+and mapped to gazetteer kinds: boroughs and neighborhoods from populated
+places and sections, streets from road features, landmarks from spots,
+parks, buildings and transport. --merge keeps hand-curated rows from an
+existing file; they win over GeoNames rows with the same name.
+"""
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from app.gazetteer import normalize
+
+
+# GeoNames feature codes (column 8) kept, by gazetteer kind
+FEATURE_KINDS = {
+    "PPLA2": "borough", "PPLA3": "borough", "ADM2": "borough",
+    "PPL": "neighborhood", "PPLX": "neighborhood", "PPLL": "neighborhood",
+    "RD": "street", "ST": "street", "RDJCT": "street",
+    "BLDG": "landmark", "PRK": "landmark", "SQR": "landmark", "BDG": "landmark", "AIRP": "landmark",
+    "RSTN": "landmark", "MTRO": "landmark", "STDM": "landmark", "HSP": "landmark", "MUS": "landmark",
+    "UNIV": "landmark", "CH": "landmark", "MNMT": "landmark", "PIER": "landmark", "TRMNL": "landmark",
+}
+FIELDS = ["name", "kind", "lat", "lng", "aliases"]
+
+
+def parse_bbox(value: str):
+    south, west, north, east = (float(v) for v in value.split(","))
+    return south, west, north, east
+
+
+def read_geonames(path: str, bbox, max_aliases: int):
+    """Gazetteer rows for GeoNames features inside bbox."""
+    south, west, north, east = bbox
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 8:
+                continue
+            kind = FEATURE_KINDS.get(cols[7])
+            if kind is None:
+                continue
+            lat, lng = float(cols[4]), float(cols[5])
+            if not (south <= lat <= north and west <= lng <= east):
+                continue
+            # Alternate names include other scripts and languages; keep ASCII ones
+            aliases = [a for a in cols[3].split(",") if a and a.isascii() and a != cols[1]][:max_aliases]
+            yield {"name": cols[1], "kind": kind, "lat": f"{lat:.5f}", "lng": f"{lng:.5f}",
+                   "aliases": "|".join(aliases)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("geonames", help="GeoNames dump (tab-separated)")
+    parser.add_argument("--bbox", required=True, help="south,west,north,east of the service area")
+    parser.add_argument("--output", default="data/gazetteer/city.csv")
+    parser.add_argument("--merge", help="existing gazetteer CSV whose rows take precedence")
+    parser.add_argument("--max-aliases", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = {}
+    if args.merge:
+        with open(args.merge, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                rows[normalize(row["name"])] = row
+    curated = len(rows)
+
+    added = 0
+    for row in read_geonames(args.geonames, parse_bbox(args.bbox), args.max_aliases):
+        key = normalize(row["name"])
+        if key and key not in rows:
+            rows[key] = row
+            added += 1
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows.values())
+    print(f"Wrote {len(rows)} places to {args.output} ({curated} curated, {added} from GeoNames)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Build the road graphs for app/routing.py from an OpenStreetMap extract.
+
+Usage:
+    python scripts/build_road_graph.py nyc.osm.bz2 --output-dir data/roads
+    python scripts/build_road_graph.py nyc.osm --modes walking --bbox 40.49,-74.27,40.92,-73.68
+
+The input is OSM XML (.osm, optionally .gz or .bz2), e.g. from the Overpass
+API or a Geofabrik extract converted with osmium. Two streaming passes keep
+memory small: the first collects the ways usable in each mode, the second the
+coordinates of their nodes. Nodes shared by several ways and way ends become
+graph nodes; the nodes between them only shape the edge. Oneway streets are
+one directed edge, except for walking. Only the largest connected component
+is kept, so every start and end snaps to a node that can reach the rest.
+"""
+import argparse
+import bz2
+import gzip
+import sys
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from pathlib import Path
+
+# Add parent directory to path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from app.routing import RoadGraph, pack_graph
+
+
+# highway=* values each mode may use
+HIGHWAYS = {
+    "driving": {
+        "motorway", "motorway_link", "trunk", "trunk_link", "primary", "primary_link", "secondary",
+        "secondary_link", "tertiary", "tertiary_link", "unclassified", "residential", "living_street", "service",
+    },
+    "walking": {
+        "primary", "primary_link", "secondary", "secondary_link", "tertiary", "tertiary_link", "unclassified",
+        "residential", "living_street", "service", "pedestrian", "footway", "path", "steps", "track", "crossing",
+    },
+    "bicycling": {
+        "primary", "primary_link", "secondary", "secondary_link", "tertiary", "tertiary_link", "unclassified",
+        "residential", "living_street", "service", "cycleway", "path", "track",
+    },
+}
+MODES = list(HIGHWAYS)
+
+
+def open_extract(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def parse_bbox(value: str):
+    south, west, north, east = (float(v) for v in value.split(","))
+    return south, west, north, east
+
+
+def direction(tags, mode: str) -> int:
+    """1 forward only, -1 backward only, 0 both ways."""
+    if mode == "walking":
+        return 0
+    if mode == "bicycling" and tags.get("oneway:bicycle") == "no":
+        return 0
+    oneway = tags.get("oneway")
+    if oneway in ("yes", "true", "1") or (oneway is None and tags.get("junction") == "roundabout"):
+        return 1
+    if oneway == "-1":
+        return -1
+    return 0
+
+
+def read_ways(path: str, modes):
+    """{mode: [(node ids, direction)]} for every way usable in a mode."""
+    ways = {mode: [] for mode in modes}
+    with open_extract(path) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                refs = [int(nd.get("ref")) for nd in elem.iter("nd")]
+                highway = tags.get("highway")
+                if highway and len(refs) >= 2 and tags.get("area") != "yes":
+                    for mode in modes:
+                        if highway in HIGHWAYS[mode] and tags.get("access") not in ("no", "private"):
+                            ways[mode].append((refs, direction(tags, mode)))
+                elem.clear()
+            elif elem.tag in ("node", "relation"):
+                elem.clear()
+    return ways
+
+
+def read_nodes(path: str, wanted):
+    """{node id: (lat, lng)} for the wanted nodes."""
+    coords = {}
+    with open_extract(path) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == "node":
+                node_id = int(elem.get("id"))
+                if node_id in wanted:
+                    coords[node_id] = (float(elem.get("lat")), float(elem.get("lon")))
+            if elem.tag in ("node", "way", "relation"):
+                elem.clear()
+    return coords
+
+
+def largest_component(node_count: int, edges):
+    """Nodes of the largest weakly connected component."""
+    parent = list(range(node_count))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for u, v, _ in edges:
+        ru, rv = find(u), find(v)
+        if ru != rv:
+            parent[ru] = rv
+    roots = Counter(find(x) for x in range(node_count))
+    if not roots:
+        return set()
+    biggest = roots.most_common(1)[0][0]
+    return {x for x in range(node_count) if find(x) == biggest}
+
+
+def build_mode(ways, coords, bbox=None):
+    """Packed graph arrays for one mode's ways."""
+    if bbox:
+        south, west, north, east = bbox
+        coords = {n: c for n, c in coords.items() if south <= c[0] <= north and west <= c[1] <= east}
+
+    # Split ways into runs of nodes that have coordinates
+    runs = []
+    for refs, way_direction in ways:
+        run = []
+        for ref in refs + [None]:
+            if ref is not None and ref in coords:
+                run.append(ref)
+            else:
+                if len(run) >= 2:
+                    runs.append((run, way_direction))
+                run = []
+
+    # Graph nodes: way ends and nodes shared by several ways
+    uses = Counter(ref for run, _ in runs for ref in run)
+    ends = {ref for run, _ in runs for ref in (run[0], run[-1])}
+    index = {}
+    edges = []
+    for run, way_direction in runs:
+        start = 0
+        for i in range(1, len(run)):
+            if i == len(run) - 1 or uses[run[i]] > 1 or run[i] in ends:
+                piece = run[start:i + 1]
+                u = index.setdefault(piece[0], len(index))
+                v = index.setdefault(piece[-1], len(index))
+                shape = [coords[ref] for ref in piece]
+                if way_direction >= 0:
+                    edges.append((u, v, shape))
+                if way_direction <= 0:
+                    edges.append((v, u, shape[::-1]))
+                start = i
+
+    keep = largest_component(len(index), edges)
+    renumber = {old: new for new, old in enumerate(sorted(keep))}
+    node_ids = sorted(index, key=index.get)
+    node_lat = [coords[node_ids[old]][0] for old in sorted(keep)]
+    node_lng = [coords[node_ids[old]][1] for old in sorted(keep)]
+    edges = [(renumber[u], renumber[v], shape) for u, v, shape in edges if u in keep and u != v]
+    return pack_graph(node_lat, node_lng, edges)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build local road graphs from an OSM extract")
+    parser.add_argument("extract", help="OSM XML file (.osm, .osm.gz, .osm.bz2)")
+    parser.add_argument("--output-dir", default=str(backend_path / "data" / "roads"))
+    parser.add_argument("--modes", default=",".join(MODES), help=f"comma-separated subset of {','.join(MODES)}")
+    parser.add_argument("--bbox", type=parse_bbox, help="south,west,north,east to clip to")
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    unknown = [mode for mode in modes if mode not in HIGHWAYS]
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(unknown)}")
+
+    started = time.perf_counter()
+    ways = read_ways(args.extract, modes)
+    wanted = {ref for mode in modes for refs, _ in ways[mode] for ref in refs}
+    coords = read_nodes(args.extract, wanted)
+    print(f"Read {sum(len(w) for w in ways.values())} ways and {len(coords)} nodes "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for mode in modes:
+        graph = RoadGraph(build_mode(ways[mode], coords, args.bbox), mode)
+        path = output_dir / f"{mode}.npz"
+        graph.save(str(path))
+        print(f"{mode}: {len(graph.node_lat)} nodes, {graph.edge_count} edges -> {path}")
+
+
+if __name__ == "__main__":
+    main()
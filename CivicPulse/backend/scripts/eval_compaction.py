@@ -0,0 +1,152 @@
+"""Measure prompt compaction: tokens saved and classification agreement.
+
+Usage:
+    python scripts/eval_compaction.py                      # tests/fixtures/compaction_corpus.jsonl
+    python scripts/eval_compaction.py --jsonl corpus.jsonl --budget 150 --llm
+    python scripts/eval_compaction.py --mongo --limit 500  # from MongoDB classifications
+
+Each JSONL line holds an article as the scraper sees it: title, summary and
+description (raw, HTML allowed), or just text. Every article is classified
+twice: with the pinned pre-compaction prompt (LEGACY_SYSTEM and LEGACY_PROMPT
+around text[:2000]) and with the current compacted one, and the report shows
+tokens per prompt before and after and how often the two classifications
+agree. The regex fallback classifier is used unless --llm is given (needs
+OPENAI_API_KEY). The shipped corpus is small and meant as a smoke check;
+evaluate on a real sample before changing the budget.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from app.compaction import TEXT_TOKEN_BUDGET, clean_text, estimate_tokens, fit_token_budget
+from app.llm import analyze_signal, analyze_signal_fallback, build_messages
+
+
+DEFAULT_CORPUS = backend_path / "tests" / "fixtures" / "compaction_corpus.jsonl"
+
+# Prompt as sent before compaction, pinned so the "before" side stays the baseline
+LEGACY_PROMPT = """Analyze the following news article or social media post about a safety-related event. Extract key information and classify it.
+
+Text:
+{text}  # Limit text length
+
+Please provide a JSON response with the following structure:
+{{
+    "type": one of ["major_crime", "minor_crime", "accident", "environmental", "infrastructure", "public_disorder", "other"],
+    "severity": integer from 1-10 (1=very minor, 10=very severe),
+    "address_hint": any address, street name, neighborhood, or location mentioned in the text (or null if none),
+    "notes": brief summary of the event,
+    "urgency": integer from -100 to 100 representing urgency/impact (-100=very safe/positive, 0=neutral, 100=very urgent/dangerous)
+}}
+
+Focus on:
+- Classifying the event type accurately
+- Assessing severity based on potential harm to public safety
+- Extracting any location information (addresses, street names, neighborhoods, landmarks)
+- Determining urgency based on recency, severity, and potential impact
+
+Return ONLY valid JSON, no additional text."""
+LEGACY_SYSTEM = "You are a safety analysis expert. Always return valid JSON."
+
+
+def legacy_messages(text: str):
+    """Chat messages the service sent before compaction."""
+    return [
+        {"role": "system", "content": LEGACY_SYSTEM},
+        {"role": "user", "content": LEGACY_PROMPT.format(text=text[:2000])},
+    ]
+
+
+def legacy_text(article) -> str:
+    """Article text the way the scraper used to assemble it."""
+    if "text" in article and not any(k in article for k in ("title", "summary", "description")):
+        return article["text"]
+    return " ".join(article.get(k, "") for k in ("title", "summary", "description")).strip()
+
+
+def compacted_text(article) -> str:
+    if "text" in article and not any(k in article for k in ("title", "summary", "description")):
+        return clean_text([article["text"]])
+    return clean_text([article.get("title"), article.get("summary"), article.get("description")])
+
+
+def load_jsonl(path: str):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def load_from_mongo(limit: int):
+    from app.db import db
+
+    await db.connect()
+    return [{"text": r["text"]} for r in await db.classification_samples(limit)]
+
+
+async def classify(texts, use_llm: bool, legacy: bool):
+    """Classifications of texts, from the legacy prompt or the compacted one as analyze_signal sends it."""
+    if not use_llm:
+        return [analyze_signal_fallback(text if legacy else fit_token_budget(text)) for text in texts]
+    if legacy:
+        return await asyncio.gather(*(analyze_signal(text, legacy_messages(text)) for text in texts))
+    return await asyncio.gather(*(analyze_signal(text) for text in texts))
+
+
+async def evaluate(articles, budget: int, use_llm: bool):
+    import app.compaction as compaction
+    compaction.TEXT_TOKEN_BUDGET = budget
+
+    before_texts = [legacy_text(a)[:2000] for a in articles]
+    after_texts = [compacted_text(a) for a in articles]
+
+    before_tokens = sum(sum(estimate_tokens(m["content"]) for m in legacy_messages(t)) for t in before_texts)
+    after_tokens = sum(
+        sum(estimate_tokens(m["content"]) for m in build_messages(t)) for t in after_texts
+    )
+
+    # The legacy text goes through the pinned prompt, the compacted one within the budget
+    before = await classify(before_texts, use_llm, legacy=True)
+    after = await classify(after_texts, use_llm, legacy=False)
+    type_agreement = sum(b["type"] == a["type"] for b, a in zip(before, after))
+    hint_agreement = sum(bool(b.get("address_hint")) == bool(a.get("address_hint")) for b, a in zip(before, after))
+
+    n = len(articles)
+    return {
+        "articles": n,
+        "classifier": "llm" if use_llm else "fallback",
+        "token_budget": budget,
+        "prompt_tokens_before": before_tokens,
+        "prompt_tokens_after": after_tokens,
+        "tokens_saved": before_tokens - after_tokens,
+        "tokens_saved_rate": round(1 - after_tokens / before_tokens, 3) if before_tokens else 0.0,
+        "type_agreement": round(type_agreement / n, 3) if n else None,
+        "address_hint_agreement": round(hint_agreement / n, 3) if n else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jsonl", default=str(DEFAULT_CORPUS), help="corpus of raw articles")
+    parser.add_argument("--mongo", action="store_true", help="evaluate stored MongoDB classifications instead")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--budget", type=int, default=TEXT_TOKEN_BUDGET, help="article token budget")
+    parser.add_argument("--llm", action="store_true", help="classify with the LLM instead of the regex fallback")
+    args = parser.parse_args()
+
+    async def run():
+        articles = await load_from_mongo(args.limit) if args.mongo else load_jsonl(args.jsonl)[:args.limit]
+        if not articles:
+            print("No articles to evaluate")
+            sys.exit(1)
+        return await evaluate(articles, args.budget, args.llm)
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""Bulk import historical incidents from CSV or JSONL exports.
+
+Usage:
+    python scripts/import_history.py complaints.csv --source nypd_complaints
+    python scripts/import_history.py incidents.jsonl.gz --source city_311 --workers 8
+    python scripts/import_history.py data.csv --source x --field lat=Latitude --field time=CMPLNT_FR_DT
+    python scripts/import_history.py data.csv --source x --restart   # ignore the checkpoint
+    python scripts/import_history.py data.csv --source x --timezone America/New_York
+
+The file is streamed in --chunk-size rows. Worker processes parse rows,
+classify them with the fallback classifier and score them with score_fields;
+the main process writes each chunk with unordered bulk inserts. Events past
+the hot retention window go straight to the archive collection, and the
+hourly rollups behind /stats are incremented for every inserted event.
+
+Timestamps with an offset (and epoch numbers) are converted to UTC. Naive
+timestamps, the norm in city exports, are read in --timezone, which
+defaults to UTC; pass the city's zone for local-time exports.
+
+Columns are found by common names (lat/latitude, lng/lon/longitude,
+timestamp/date, type/category, title/description, id/unique_key); --field
+name=column overrides one (dotted paths reach into JSON objects).
+
+After each chunk is written, rows done are saved to <file>.checkpoint.json,
+and a rerun resumes after them. Event ids are derived from --source and the
+row id (or the row's contents), so rows re-read after a crash between write
+and checkpoint are skipped as duplicates rather than stored twice. Before a
+chunk is written the checkpoint records it as in progress; when a rerun
+finds such a chunk it re-reads exactly that chunk and applies rollups for
+all of its events, including those the interrupted run already inserted, so
+a crash between the inserts and the rollup increments loses no counts. (A
+crash after the increments but before the checkpoint is saved, a single
+local file write, would count that chunk twice.)
+
+Archived events expire after EVENTS_ARCHIVE_RETENTION_DAYS; their rollups,
+the long-term baseline, are kept.
+"""
+import argparse
+import asyncio
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+# Add parent directory to path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from app.db import db
+from app.events import EVENT_TYPES
+from app.incidents import new_incident
+from app.llm import analyze_signal_fallback
+from app.rollups import accumulate, rollup_update
+from app.scoring import score_fields
+
+
+# Candidate columns per field, matched case-insensitively
+FIELD_CANDIDATES = {
+    "id": ["id", "_id", "incident_id", "unique_key", "cmplnt_num", "case_number"],
+    "lat": ["lat", "latitude", "y"],
+    "lng": ["lng", "lon", "long", "longitude", "x"],
+    "time": ["timestamp", "datetime", "date", "occurred_at", "created_date", "cmplnt_fr_dt", "date_time"],
+    "type": ["event_type", "type", "category", "offense", "ofns_desc", "complaint_type", "primary_type"],
+    "title": ["title", "summary", "ofns_desc", "complaint_type", "primary_type", "description"],
+    "text": ["text", "description", "details", "descriptor", "pd_desc", "narrative"],
+    "severity": ["severity"],
+    "url": ["url", "link"],
+}
+TIME_FORMATS = ["%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M", "%m/%d/%Y", "%Y-%m-%d %H:%M:%S"]
+CHUNK_SIZE = 5000
+
+
+def open_text(path: Path):
+    if path.suffix == ".gz":
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def file_format(path: Path) -> str:
+    suffixes = [s for s in path.suffixes if s != ".gz"]
+    return "jsonl" if suffixes and suffixes[-1] in (".jsonl", ".ndjson", ".json") else "csv"
+
+
+def read_rows(f, fmt: str) -> Tuple[Optional[List[str]], Iterator[Any]]:
+    """(CSV header or None, iterator of raw rows): CSV field lists or JSONL lines."""
+    if fmt == "csv":
+        reader = csv.reader(f)
+        return next(reader, []), reader
+    return None, (line for line in f if line.strip())
+
+
+def resolve_fields(columns: List[str], overrides: Dict[str, str]) -> Dict[str, str]:
+    """Column (or dotted path) used for each field."""
+    by_lower = {column.lower(): column for column in columns}
+    fields = {}
+    for field, candidates in FIELD_CANDIDATES.items():
+        if field in overrides:
+            fields[field] = overrides[field]
+            continue
+        for candidate in candidates:
+            if candidate in by_lower:
+                fields[field] = by_lower[candidate]
+                break
+    return fields
+
+
+def lookup(row: Dict[str, Any], path: Optional[str]) -> Any:
+    if not path:
+        return None
+    value: Any = row
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return None if value == "" else value
+
+
+def parse_time(value: Any, tz: str = "UTC") -> Optional[datetime]:
+    """Naive UTC datetime from ISO strings, common export formats or epoch (ms) numbers; naive values are in tz."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace(".", "", 1).isdigit()):
+        seconds = float(value)
+        if seconds > 1e11:
+            seconds /= 1000
+        return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+    value = str(value).strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        parsed = None
+    for fmt in TIME_FORMATS if parsed is None else []:
+        try:
+            parsed = datetime.strptime(value, fmt)
+            break
+        except ValueError:
+            continue
+    if parsed is None:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=ZoneInfo(tz))
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def event_type_of(raw_type: Any, text: str) -> Tuple[str, int]:
+    """(event_type, severity): the dataset's own type when it is one of ours, else the fallback classifier's."""
+    fallback = analyze_signal_fallback(f"{raw_type or ''} {text}".lower())
+    if raw_type:
+        name = str(raw_type).strip().lower().replace(" ", "_")
+        if name in EVENT_TYPES:
+            return name, fallback["severity"] if fallback["type"] == name else 5
+    return fallback["type"], fallback["severity"]
+
+
+def to_event(row: Dict[str, Any], fields: Dict[str, str], source: str, raw: str,
+             tz: str = "UTC") -> Optional[Dict[str, Any]]:
+    """Event document for one row, or None when it has no usable location or time."""
+    try:
+        lat = float(lookup(row, fields.get("lat")))
+        lng = float(lookup(row, fields.get("lng")))
+    except (TypeError, ValueError):
+        return None
+    timestamp = parse_time(lookup(row, fields.get("time")), tz)
+    if timestamp is None or not (-90 <= lat <= 90 and -180 <= lng <= 180) or (lat == 0 and lng == 0):
+        return None
+
+    title = str(lookup(row, fields.get("title")) or "")
+    text = str(lookup(row, fields.get("text")) or title)
+    event_type, severity = event_type_of(lookup(row, fields.get("type")), f"{title} {text}")
+    try:
+        severity = int(lookup(row, fields.get("severity")) or severity)
+    except (TypeError, ValueError):
+        pass
+    row_id = lookup(row, fields.get("id")) or hashlib.sha1(raw.encode()).hexdigest()
+
+    event = {
+        "_id": f"import:{source}:{row_id}",
+        "source": source,
+        "title": title,
+        "text": text,
+        "url": str(lookup(row, fields.get("url")) or ""),
+        "timestamp": timestamp,
+        "coordinates": {"type": "Point", "coordinates": [lng, lat], "lat": lat, "lng": lng},
+        "event_type": event_type,
+        "severity": severity,
+        "urgency": severity * 10 - 50,
+        "address_hint": None,
+        "notes": "Historical import",
+        "analyzer": "import",
+    }
+    event.update(score_fields(event))
+    return new_incident(event)
+
+
+def parse_chunk(rows: List[Any], header: Optional[List[str]], fields: Dict[str, str],
+                source: str, tz: str = "UTC") -> Tuple[List[Dict[str, Any]], int]:
+    """Runs in a worker process: (events, rejected row count) for one chunk."""
+    events, rejected = [], 0
+    for raw in rows:
+        try:
+            if header is not None:
+                row = dict(zip(header, raw))
+                raw = "\x1f".join(raw)
+            else:
+                row = json.loads(raw)
+            event = to_event(row, fields, source, raw, tz)
+        except (ValueError, TypeError, AttributeError):
+            event = None
+        if event is None:
+            rejected += 1
+        else:
+            events.append(event)
+    return events, rejected
+
+
+def checkpoint_path(path: Path) -> Path:
+    return path.with_name(path.name + ".checkpoint.json")
+
+
+def load_checkpoint(path: Path, restart: bool) -> Dict[str, Any]:
+    fresh = {"rows_done": 0, "inserted": 0, "skipped": 0, "rejected": 0, "size": path.stat().st_size}
+    checkpoint_file = checkpoint_path(path)
+    if restart or not checkpoint_file.exists():
+        return fresh
+    saved = json.loads(checkpoint_file.read_text())
+    if saved.get("size") != fresh["size"]:
+        print(f"{checkpoint_file} is for a different version of {path.name}; starting over")
+        return fresh
+    return saved
+
+
+def save_checkpoint(path: Path, checkpoint: Dict[str, Any]):
+    checkpoint_file = checkpoint_path(path)
+    tmp = checkpoint_file.with_suffix(".tmp")
+    tmp.write_text(json.dumps({**checkpoint, "updated_at": datetime.utcnow().isoformat()}))
+    os.replace(tmp, checkpoint_file)
+
+
+async def write_chunk(events: List[Dict[str, Any]], rollups: bool, redo: bool = False) -> int:
+    """
+    Store a parsed chunk; returns the number of new events.
+
+    redo: the chunk's previous write was interrupted before its rollups were
+    applied, so every event is counted, already-stored ones included.
+    """
+    inserted = await db.import_events(events)
+    counted = events if redo else inserted
+    if rollups and counted:
+        docs: Dict[str, Dict[str, Any]] = {}
+        for event in counted:
+            accumulate(docs, event)
+        await db.increment_rollups([
+            (doc, rollup_update(doc, doc["count"], doc["severity_sum"], doc["max_safety_score"]))
+            for doc in docs.values()
+        ])
+    return len(inserted)
+
+
+async def run(path: Path, source: str, overrides: Dict[str, str], workers: int, chunk_size: int,
+              restart: bool, rollups: bool, tz: str = "UTC"):
+    checkpoint = load_checkpoint(path, restart)
+    # Rows of a chunk whose write was cut short; it is re-read as one chunk
+    interrupted = checkpoint.get("writing_until", 0) - checkpoint["rows_done"]
+    await db.connect()
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    rows_this_run = 0
+
+    with open_text(path) as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        fmt = file_format(path)
+        header, rows = read_rows(f, fmt)
+        if header is not None:
+            columns = header
+        else:
+            first = next(rows, None)
+            columns = list(json.loads(first)) if first else []
+            rows = _prepend(first, rows)
+        fields = resolve_fields(columns, overrides)
+        missing = [field for field in ("lat", "lng", "time") if field not in fields]
+        if missing:
+            raise SystemExit(f"No column found for {', '.join(missing)}; pass --field {missing[0]}=<column>")
+        print(f"Importing {path.name} as source {source!r} with fields {fields}")
+        if checkpoint["rows_done"] or interrupted > 0:
+            print(f"Resuming after {checkpoint['rows_done']:,} rows")
+            for _ in islice(rows, checkpoint["rows_done"]):
+                pass
+
+        # Chunks parse in the pool while earlier ones are written, oldest first,
+        # so the checkpoint always covers a contiguous prefix of the file
+        pending: deque = deque()
+
+        async def finish_oldest():
+            nonlocal rows_this_run
+            count, future, redo = pending.popleft()
+            events, rejected = await future
+            checkpoint["writing_until"] = checkpoint["rows_done"] + count
+            save_checkpoint(path, checkpoint)
+            inserted = await write_chunk(events, rollups, redo)
+            checkpoint["rows_done"] += count
+            checkpoint["inserted"] += inserted
+            checkpoint["skipped"] += len(events) - inserted
+            checkpoint["rejected"] += rejected
+            save_checkpoint(path, checkpoint)
+            rows_this_run += count
+            rate = rows_this_run / max(time.monotonic() - started, 1e-9)
+            print(f"{checkpoint['rows_done']:>12,} rows  {checkpoint['inserted']:>12,} inserted  "
+                  f"{checkpoint['skipped']:>9,} already stored  {checkpoint['rejected']:>9,} rejected  "
+                  f"{rate:>9,.0f} rows/s")
+
+        while True:
+            redo = interrupted > 0
+            chunk = list(islice(rows, interrupted if redo else chunk_size))
+            interrupted = 0
+            if not chunk:
+                break
+            future = loop.run_in_executor(pool, parse_chunk, chunk, header, fields, source, tz)
+            pending.append((len(chunk), future, redo))
+            if len(pending) >= workers * 2:
+                await finish_oldest()
+        while pending:
+            await finish_oldest()
+
+    elapsed = time.monotonic() - started
+    print(f"Done: {rows_this_run:,} rows in {elapsed:.1f}s ({rows_this_run / max(elapsed, 1e-9):,.0f} rows/s), "
+          f"{checkpoint['inserted']:,} events inserted in total")
+
+
+def _prepend(first: Optional[str], rows: Iterator[Any]) -> Iterator[Any]:
+    if first is not None:
+        yield first
+    yield from rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import historical incidents from CSV or JSONL")
+    parser.add_argument("path", type=Path, help="CSV or JSONL file, optionally .gz")
+    parser.add_argument("--source", required=True, help="Source name stored on every event")
+    parser.add_argument("--field", action="append", default=[], metavar="NAME=COLUMN",
+                        help=f"Column for a field ({', '.join(FIELD_CANDIDATES)})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per parse and write batch")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--timezone", default="UTC",
+                        help="IANA zone of timestamps without an offset (default UTC)")
+    parser.add_argument("--no-rollups", action="store_true", help="Leave /stats rollups to scripts/rebuild_rollups.py")
+    args = parser.parse_args()
+
+    overrides = dict(item.split("=", 1) for item in args.field)
+    unknown = set(overrides) - set(FIELD_CANDIDATES)
+    if unknown:
+        parser.error(f"unknown field(s): {', '.join(sorted(unknown))}")
+    try:
+        ZoneInfo(args.timezone)
+    except (KeyError, ValueError):
+        parser.error(f"unknown timezone {args.timezone!r}")
+    asyncio.run(run(args.path, args.source, overrides, max(1, args.workers), args.chunk_size,
+                    args.restart, not args.no_rollups, args.timezone))
+
+
+if __name__ == "__main__":
+    main()
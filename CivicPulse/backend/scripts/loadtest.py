@@ -0,0 +1,456 @@
+"""Offline end-to-end load test with local stand-ins for Google Maps and OpenAI.
+
+Starts a stand-in HTTP server for the Directions, Geocoding and chat-completion
+APIs (plus an RSS feed for ingest), launches the API against it and a local
+MongoDB, then drives mixed /events, /route and /ingest traffic at fixed rates
+and reports throughput and latency percentiles per endpoint. No network access
+is needed. Query points and stand-in routes come from the same synthetic city
+(scripts/synthetic.py) that --seed-events loads, so /events and /route hit
+realistic hotspots.
+
+Usage:
+    python scripts/loadtest.py --duration 60 --rates events=50,route=5,ingest=0.1
+    python scripts/loadtest.py --start-mongod --latency llm=800 --errors directions=0.02
+    python scripts/loadtest.py --app-url http://127.0.0.1:8000   # drive a running app
+    python scripts/loadtest.py --start-mongod --seed-events 1000000 --no-prime
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+import httpx
+
+# Add parent directory to path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from app.llm import EVENT_TYPES
+from app.scoring import encode_polyline, haversine_distance
+from scripts.synthetic import CENTER_LAT, CENTER_LNG, STREETS, SyntheticCity, load_into_mongo
+
+
+# Query points and stand-in routes follow the synthetic city's streets and hotspots
+CITY = SyntheticCity(seed=42)
+QUERY_POINTS = CITY.points(10_000)
+INCIDENTS = [
+    "Shooting reported near", "Car crash blocks traffic on", "Theft reported at a store on",
+    "Water main break floods", "Protest gathers on", "Street fair planned on",
+]
+DEFAULT_LATENCY_MS = {"directions": 150, "geocode": 40, "llm": 700, "feed": 20}
+DEFAULT_ERRORS = {"directions": 0.0, "geocode": 0.0, "llm": 0.0, "feed": 0.0}
+DEFAULT_RATES = {"events": 20.0, "route": 2.0, "ingest": 0.05}
+SPEED_MPS = {"driving": 8.0, "bicycling": 4.5, "transit": 6.0, "walking": 1.4}
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering like the upstream APIs the app calls."""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms: Dict[str, float], error_rates: Dict[str, float],
+                 feed_items: int, seed: int):
+        super().__init__(address, StandInHandler)
+        self.latency_ms = latency_ms
+        self.error_rates = error_rates
+        self.feed_items = feed_items
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.feed_requests = 0
+
+    def draw(self, upstream: str) -> Tuple[float, bool]:
+        """Return (delay_seconds, fail) for one upstream call."""
+        with self.rng_lock:
+            mean = self.latency_ms.get(upstream, 0) / 1000.0
+            delay = self.rng.uniform(0.5 * mean, 1.5 * mean) if mean else 0.0
+            fail = self.rng.random() < self.error_rates.get(upstream, 0.0)
+        return delay, fail
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: StandInServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep load test output readable
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path.endswith("/directions/json"):
+            self._respond("directions", lambda: directions_response(params))
+        elif url.path.endswith("/geocode/json"):
+            self._respond("geocode", lambda: geocode_response(params))
+        elif url.path.startswith("/rss"):
+            self._respond("feed", self._feed, content_type="application/rss+xml")
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.endswith("/chat/completions"):
+            self._respond("llm", lambda: chat_completion_response(body))
+        else:
+            self._send(404, {"error": "not found"})
+
+    def _feed(self) -> str:
+        self.server.feed_requests += 1
+        return rss_feed(self.server.feed_items, self.server.feed_requests)
+
+    def _respond(self, upstream: str, build, content_type: str = "application/json"):
+        delay, fail = self.server.draw(upstream)
+        time.sleep(delay)
+        if fail:
+            if upstream == "llm":
+                self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                           headers={"retry-after": "1"})
+            else:
+                self._send(500, {"status": "UNKNOWN_ERROR"})
+            return
+        self._send(200, build(), content_type=content_type)
+
+    def _send(self, status: int, payload: Any, content_type: str = "application/json",
+              headers: Optional[Dict[str, str]] = None):
+        body = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def directions_response(params: Dict[str, str]) -> Dict[str, Any]:
+    """Three alternative street-following routes between origin and destination."""
+    start = [float(x) for x in params.get("origin", f"{CENTER_LAT},{CENTER_LNG}").split(",")]
+    end = [float(x) for x in params.get("destination", f"{CENTER_LAT},{CENTER_LNG}").split(",")]
+    speed = SPEED_MPS.get(params.get("mode", "driving"), SPEED_MPS["driving"])
+    routes = []
+    for variant in range(3):
+        points = CITY.route(tuple(start), tuple(end), variant)
+        distance = sum(haversine_distance(*a, *b) for a, b in zip(points, points[1:]))
+        routes.append({
+            "summary": "stand-in",
+            "legs": [{
+                "distance": {"value": round(distance), "text": f"{distance / 1000:.1f} km"},
+                "duration": {"value": round(distance / speed), "text": f"{distance / speed / 60:.0f} mins"},
+            }],
+            "overview_polyline": {"points": encode_polyline(points)},
+        })
+    return {"status": "OK", "routes": routes}
+
+
+def geocode_response(params: Dict[str, str]) -> Dict[str, Any]:
+    """Deterministic location within a few km of the center for any address."""
+    seed = zlib.crc32(params.get("address", params.get("latlng", "")).encode())
+    rng = random.Random(seed)
+    lat = CENTER_LAT + rng.uniform(-0.04, 0.04)
+    lng = CENTER_LNG + rng.uniform(-0.04, 0.04)
+    return {
+        "status": "OK",
+        "results": [{
+            "formatted_address": f"{params.get('address', 'Stand-in')}, New York, NY",
+            "geometry": {"location": {"lat": lat, "lng": lng}},
+        }],
+    }
+
+
+def chat_completion_response(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Chat completion whose content is a classification derived from the prompt."""
+    prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+    rng = random.Random(zlib.crc32(prompt.encode()))
+    severity = rng.randint(1, 10)
+    content = json.dumps({
+        "type": rng.choice(EVENT_TYPES),
+        "severity": severity,
+        "address_hint": rng.choice(STREETS),
+        "notes": "Stand-in classification",
+        "urgency": severity * 10 - 50,
+    })
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-standin-{rng.getrandbits(32):08x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-3.5-turbo"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def rss_feed(n_items: int, generation: int) -> str:
+    """RSS document with n_items incidents; each fetch yields a fresh set."""
+    rng = random.Random(generation)
+    now = datetime.utcnow()
+    items = []
+    for i in range(n_items):
+        title = f"{rng.choice(INCIDENTS)} {rng.choice(STREETS)}"
+        published = format_datetime(now - timedelta(minutes=rng.randint(0, 600)))
+        items.append(
+            f"<item><title>{escape(title)}</title>"
+            f"<description>{escape(title)}. Officials responded to the scene.</description>"
+            f"<link>http://standin.local/{generation}/{i}</link>"
+            f"<pubDate>{published} GMT</pubDate></item>"
+        )
+    return ("<?xml version=\"1.0\"?><rss version=\"2.0\"><channel><title>Stand-in feed</title>"
+            + "".join(items) + "</channel></rss>")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mongod() -> Tuple[subprocess.Popen, str, str]:
+    """Start a throwaway mongod on a free port; returns (process, uri, dbpath)."""
+    binary = shutil.which("mongod")
+    if not binary:
+        sys.exit("mongod not found on PATH; install MongoDB or pass --mongo-uri")
+    dbpath = tempfile.mkdtemp(prefix="urbanpulse-loadtest-")
+    port = free_port()
+    proc = subprocess.Popen(
+        [binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return proc, f"mongodb://127.0.0.1:{port}/urbanpulse_loadtest", dbpath
+
+
+def start_app(standin_url: str, mongo_uri: str) -> Tuple[subprocess.Popen, str]:
+    """Launch the API with every upstream pointed at the stand-ins."""
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "MONGO_URI": mongo_uri,
+        "GOOGLE_MAPS_API_KEY": "loadtest",
+        "GOOGLE_MAPS_API_URL": f"{standin_url}/maps/api",
+        "OPENAI_API_KEY": "loadtest",
+        "OPENAI_BASE_URL": f"{standin_url}/v1",
+        "INGEST_RSS_FEEDS": f"{standin_url}/rss/feed.xml",
+        "INGEST_SUBREDDITS": "",
+        "INGEST_BLOTTER_URLS": "",
+    })
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=str(backend_path), env=env
+    )
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def wait_for_health(app_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{app_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    sys.exit(f"App at {app_url} did not become healthy within {timeout:.0f}s")
+
+
+def random_point(rng: random.Random) -> Dict[str, float]:
+    lat, lng = rng.choice(QUERY_POINTS)
+    return {"lat": lat, "lng": lng}
+
+
+def build_request(endpoint: str, rng: random.Random) -> Tuple[str, str, Dict[str, Any]]:
+    """Return (method, path, httpx kwargs) for one request to endpoint."""
+    if endpoint == "events":
+        center = random_point(rng)
+        half = rng.uniform(0.005, 0.03)
+        return "GET", "/events", {"params": {
+            "sw_lat": center["lat"] - half, "sw_lng": center["lng"] - half,
+            "ne_lat": center["lat"] + half, "ne_lng": center["lng"] + half,
+            "since_hours": 24,
+        }}
+    if endpoint == "route":
+        return "POST", "/route", {"json": {
+            "start": random_point(rng), "end": random_point(rng),
+            "mode": rng.choice(["driving", "walking"]), "preference": rng.choice(["safest", "fastest"]),
+        }}
+    return "POST", "/ingest/one-shot", {}
+
+
+async def drive(app_url: str, rates: Dict[str, float], duration: float, seed: int,
+                max_connections: int) -> Dict[str, List[Tuple[float, bool]]]:
+    """Send Poisson-arrival traffic per endpoint; latency counts from the scheduled send time."""
+    samples: Dict[str, List[Tuple[float, bool]]] = {endpoint: [] for endpoint in rates}
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    async with httpx.AsyncClient(base_url=app_url, timeout=120.0, limits=limits) as client:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tasks = []
+
+        async def one(endpoint: str, scheduled: float, method: str, path: str, kwargs: Dict[str, Any]):
+            try:
+                response = await client.request(method, path, **kwargs)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            samples[endpoint].append((loop.time() - scheduled, ok))
+
+        async def schedule(endpoint: str, rps: float, rng: random.Random):
+            next_at = start + rng.expovariate(rps)
+            while next_at < start + duration:
+                await asyncio.sleep(max(0.0, next_at - loop.time()))
+                method, path, kwargs = build_request(endpoint, rng)
+                tasks.append(asyncio.create_task(one(endpoint, next_at, method, path, kwargs)))
+                next_at += rng.expovariate(rps)
+
+        await asyncio.gather(*(
+            schedule(endpoint, rps, random.Random(f"{seed}:{endpoint}"))
+            for endpoint, rps in rates.items() if rps > 0
+        ))
+        await asyncio.gather(*tasks)
+    return samples
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples: Dict[str, List[Tuple[float, bool]]], duration: float) -> Dict[str, Dict[str, float]]:
+    report = {}
+    for endpoint, results in samples.items():
+        latencies = sorted(latency for latency, _ in results)
+        ok = sum(1 for _, success in results if success)
+        report[endpoint] = {
+            "requests": len(results),
+            "ok": ok,
+            "errors": len(results) - ok,
+            "throughput_rps": ok / duration if duration else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+        }
+    return report
+
+
+def parse_pairs(value: str, defaults: Dict[str, float]) -> Dict[str, float]:
+    """Parse 'a=1,b=2' into a copy of defaults with those keys overridden."""
+    result = dict(defaults)
+    for pair in filter(None, (p.strip() for p in value.split(","))):
+        key, _, number = pair.partition("=")
+        if key not in defaults:
+            raise argparse.ArgumentTypeError(f"unknown key '{key}', expected one of {sorted(defaults)}")
+        result[key] = float(number)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the Urban Pulse API")
+    parser.add_argument("--duration", type=float, default=60.0, help="Traffic duration in seconds")
+    parser.add_argument("--rates", default="", help="Requests/second per endpoint, e.g. events=50,route=5,ingest=0.1")
+    parser.add_argument("--latency", default="", help="Stand-in mean latency in ms, e.g. directions=150,llm=700")
+    parser.add_argument("--errors", default="", help="Stand-in error rates, e.g. directions=0.01,llm=0.05")
+    parser.add_argument("--feed-items", type=int, default=20, help="Items per stand-in RSS fetch")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for traffic and stand-in behaviour")
+    parser.add_argument("--max-connections", type=int, default=200, help="Client connection pool size")
+    parser.add_argument("--mongo-uri", default=os.getenv("LOADTEST_MONGO_URI",
+                                                          "mongodb://127.0.0.1:27017/urbanpulse_loadtest"))
+    parser.add_argument("--start-mongod", action="store_true", help="Start a throwaway local mongod")
+    parser.add_argument("--app-url", help="Drive an already running app instead of starting one")
+    parser.add_argument("--no-prime", action="store_true", help="Skip the initial ingest that seeds events")
+    parser.add_argument("--seed-events", type=int, default=0,
+                        help="Bulk-load this many synthetic events (scripts/synthetic.py) before driving")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    rates = parse_pairs(args.rates, DEFAULT_RATES)
+    latency = parse_pairs(args.latency, DEFAULT_LATENCY_MS)
+    errors = parse_pairs(args.errors, DEFAULT_ERRORS)
+
+    standin = StandInServer(("127.0.0.1", 0), latency, errors, args.feed_items, args.seed)
+    threading.Thread(target=standin.serve_forever, daemon=True).start()
+    standin_url = f"http://127.0.0.1:{standin.server_address[1]}"
+    print(f"Stand-in upstreams at {standin_url}")
+
+    processes = []
+    dbpath = None
+    try:
+        mongo_uri = args.mongo_uri
+        if args.start_mongod:
+            mongod, mongo_uri, dbpath = start_mongod()
+            processes.append(mongod)
+
+        app_url = args.app_url
+        if not app_url:
+            app, app_url = start_app(standin_url, mongo_uri)
+            processes.append(app)
+        wait_for_health(app_url)
+        print(f"App at {app_url}, MongoDB at {mongo_uri}")
+
+        if args.seed_events:
+            os.environ["MONGO_URI"] = mongo_uri
+            started = time.monotonic()
+            inserted = asyncio.run(load_into_mongo(CITY, args.seed_events))
+            print(f"Seeded {inserted:,} synthetic events in {time.monotonic() - started:.1f}s")
+
+        if not args.no_prime:
+            response = httpx.post(f"{app_url}/ingest/one-shot", timeout=300.0)
+            print(f"Primed with ingest: {response.status_code} {response.text[:200]}")
+
+        print(f"Driving {rates} for {args.duration:.0f}s...")
+        started = time.monotonic()
+        samples = asyncio.run(drive(app_url, rates, args.duration, args.seed, args.max_connections))
+        elapsed = time.monotonic() - started
+        report = summarize(samples, elapsed)
+
+        print(f"\n{'endpoint':<10}{'requests':>10}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for endpoint, row in report.items():
+            print(f"{endpoint:<10}{row['requests']:>10}{row['errors']:>8}{row['throughput_rps']:>9.2f}"
+                  f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+
+        if args.output:
+            args.output.write_text(json.dumps({
+                "config": {"duration": args.duration, "rates": rates, "latency_ms": latency,
+                           "error_rates": errors, "seed": args.seed},
+                "elapsed_seconds": elapsed,
+                "endpoints": report,
+            }, indent=2))
+            print(f"\nReport written to {args.output}")
+    finally:
+        for proc in reversed(processes):
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        standin.shutdown()
+        if dbpath:
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
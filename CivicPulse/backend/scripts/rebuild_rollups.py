@@ -0,0 +1,79 @@
+"""Rebuild the hourly event rollups behind /stats from stored events.
+
+Usage:
+    python scripts/rebuild_rollups.py                 # everything, hot + archive
+    python scripts/rebuild_rollups.py --since-days 30
+
+Run after backfilling or importing events, changing ROLLUP_GEOHASH_PRECISION,
+or whenever rollups may have drifted (ingest updates them best effort). The
+window is processed one day at a time: that day's rollups are deleted and
+rewritten from the events and archive collections, so memory stays bounded
+by one day of rollups at any history length.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from app.db import db
+from app.rollups import accumulate, hour_of
+
+
+PROJECTION = {"timestamp": 1, "coordinates.lat": 1, "coordinates.lng": 1, "event_type": 1,
+              "severity": 1, "safety_score": 1}
+
+
+async def first_event_time():
+    times = []
+    for collection in (db.collection, db.archive):
+        doc = await collection.find_one({"timestamp": {"$type": "date"}}, {"timestamp": 1}, sort=[("timestamp", 1)])
+        if doc:
+            times.append(doc["timestamp"])
+    return min(times) if times else None
+
+
+async def rebuild_day(start: datetime, end: datetime) -> int:
+    rollups = {}
+    query = {"timestamp": {"$gte": start, "$lt": end}}
+    for collection in (db.collection, db.archive):
+        async for event in collection.find(query, PROJECTION):
+            coords = event.get("coordinates") or {}
+            if coords.get("lat") is None or coords.get("lng") is None:
+                continue
+            accumulate(rollups, event)
+    await db.rollups.delete_many({"hour": {"$gte": start, "$lt": end}})
+    return await db.replace_rollups(list(rollups.values()))
+
+
+async def main(since_days: int):
+    await db.connect()
+    now = datetime.utcnow()
+    if since_days:
+        start = now - timedelta(days=since_days)
+    else:
+        start = await first_event_time()
+        if start is None:
+            print("No events to roll up")
+            return
+    day = hour_of(start).replace(hour=0)
+
+    started = time.perf_counter()
+    written = 0
+    while day <= now:
+        written += await rebuild_day(day, day + timedelta(days=1))
+        day += timedelta(days=1)
+    print(f"Rebuilt {written} rollup documents from {hour_of(start).date()} in {time.perf_counter() - started:.1f}s")
+    await db.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since-days", type=int, default=0, help="only rebuild the last N days (default: all)")
+    args = parser.parse_args()
+    asyncio.run(main(args.since_days))
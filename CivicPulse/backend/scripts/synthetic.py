@@ -0,0 +1,353 @@
+"""Seeded synthetic events and routes for benchmarks and load tests.
+
+Usage:
+    python scripts/synthetic.py events --n 1000000 --out events.jsonl.gz
+    python scripts/synthetic.py events --n 1000000 --days 30 --mongo     # bulk-load into MONGO_URI
+    python scripts/synthetic.py routes --n 1000 --points 200 --out routes.jsonl
+
+A SyntheticCity is a street grid (rotated like Manhattan's) around a center
+with hotspots of Pareto-distributed weight. Events fall around a hotspot
+(or, for a small share, anywhere in the city) and are snapped onto an avenue
+or cross street; times follow a diurnal profile over the last --days days;
+event types and severities follow TYPE_MIX and SEVERITY_MEAN. Routes walk the
+same grid, so they pass through the same hotspots.
+
+Everything is reproducible from the seed: events are generated in fixed
+chunks of CHUNK_SIZE, each with its own generator, so the first n events are
+the same whatever n is. Event files are flat JSONL that
+scripts/import_history.py can load as well.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import math
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Add parent directory to path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from app.events import EPOCH, EVENT_TYPES
+from app.scoring import encode_polyline, score_fields
+
+
+# Midtown Manhattan
+CENTER_LAT, CENTER_LNG = 40.7549, -73.9840
+CITY_RADIUS_M = 8000.0
+GRID_ANGLE_DEG = 29.0          # Manhattan's avenues run 29 degrees east of north
+AVENUE_SPACING_M = 270.0
+STREET_SPACING_M = 80.0
+HOTSPOTS = 40
+BACKGROUND_FRACTION = 0.15     # events not tied to a hotspot
+ON_STREET_FRACTION = 0.9       # events snapped onto a street
+ON_AVENUE_FRACTION = 0.4       # of those, events on an avenue rather than a cross street
+CHUNK_SIZE = 100_000
+METERS_PER_DEGREE = 111320.0
+
+TYPE_MIX = {
+    "minor_crime": 0.32,
+    "accident": 0.22,
+    "public_disorder": 0.12,
+    "infrastructure": 0.12,
+    "other": 0.10,
+    "major_crime": 0.07,
+    "environmental": 0.05,
+}
+SEVERITY_MEAN = {
+    "major_crime": 8.5,
+    "minor_crime": 4.0,
+    "accident": 6.0,
+    "environmental": 6.5,
+    "infrastructure": 4.5,
+    "public_disorder": 5.5,
+    "other": 3.0,
+}
+# Share of events per hour of day (local time), peaking in the evening
+DIURNAL = np.array([3, 2, 2, 1.5, 1, 1, 1.5, 2.5, 3.5, 4, 4, 4.5,
+                    5, 5, 5, 5.5, 6, 6.5, 7, 7, 6.5, 5.5, 4.5, 3.5])
+DIURNAL = DIURNAL / DIURNAL.sum()
+
+STREETS = [
+    "Broadway", "5th Avenue", "Lexington Avenue", "West 42nd Street", "Canal Street",
+    "Houston Street", "Park Avenue", "Amsterdam Avenue", "Flatbush Avenue", "Atlantic Avenue",
+    "8th Avenue", "East 14th Street", "Delancey Street", "Madison Avenue", "West 125th Street",
+]
+TITLES = {
+    "major_crime": ["Shooting reported on {street}", "Stabbing near {street}", "Armed robbery at store on {street}"],
+    "minor_crime": ["Theft reported on {street}", "Burglary at apartment on {street}", "Vandalism on {street}"],
+    "accident": ["Car crash blocks traffic on {street}", "Collision injures cyclist on {street}",
+                 "Traffic accident on {street}"],
+    "environmental": ["Fire in building on {street}", "Flooding reported on {street}", "Storm damage on {street}"],
+    "infrastructure": ["Water main break floods {street}", "Power outage along {street}",
+                       "Road closure on {street} for construction"],
+    "public_disorder": ["Protest gathers on {street}", "Disturbance reported on {street}",
+                        "Large crowd on {street}"],
+    "other": ["Street fair planned on {street}", "Community meeting near {street}", "Parade route along {street}"],
+}
+
+
+def _rng(seed: int, *stream: int) -> np.random.Generator:
+    return np.random.default_rng([seed, *stream])
+
+
+def _near_line(x: float, spacing: float, tolerance: float) -> bool:
+    return abs(x - round(x / spacing) * spacing) < tolerance
+
+
+class SyntheticCity:
+    """Street grid, hotspots and generators for events and routes."""
+
+    def __init__(self, seed: int = 42, center: Tuple[float, float] = (CENTER_LAT, CENTER_LNG),
+                 radius_m: float = CITY_RADIUS_M, hotspots: int = HOTSPOTS, days: float = 3.0,
+                 now: Optional[datetime] = None):
+        self.seed = seed
+        self.center = center
+        self.radius_m = radius_m
+        self.days = days
+        self.now = (now or datetime.utcnow()).replace(tzinfo=None)
+        angle = math.radians(GRID_ANGLE_DEG)
+        self._cos, self._sin = math.cos(angle), math.sin(angle)
+        self._m_per_deg_lng = METERS_PER_DEGREE * math.cos(math.radians(center[0]))
+
+        rng = _rng(seed, 0)
+        self.hotspot_u = rng.uniform(-0.7, 0.7, hotspots) * radius_m
+        self.hotspot_v = rng.uniform(-0.7, 0.7, hotspots) * radius_m
+        self.hotspot_sigma = rng.lognormal(math.log(150.0), 0.5, hotspots)
+        weights = rng.pareto(1.2, hotspots) + 0.05
+        self.hotspot_weight = weights / weights.sum()
+
+    # Grid frame: u runs along the avenues, v across them, both in meters from the center
+
+    def to_latlng(self, u, v) -> Tuple[np.ndarray, np.ndarray]:
+        east = np.asarray(u) * self._sin + np.asarray(v) * self._cos
+        north = np.asarray(u) * self._cos - np.asarray(v) * self._sin
+        return self.center[0] + north / METERS_PER_DEGREE, self.center[1] + east / self._m_per_deg_lng
+
+    def to_grid(self, lat: float, lng: float) -> Tuple[float, float]:
+        north = (lat - self.center[0]) * METERS_PER_DEGREE
+        east = (lng - self.center[1]) * self._m_per_deg_lng
+        return north * self._cos + east * self._sin, east * self._cos - north * self._sin
+
+    def _grid_points(self, rng: np.random.Generator, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        which = rng.choice(len(self.hotspot_weight), size=n, p=self.hotspot_weight)
+        u = self.hotspot_u[which] + rng.normal(0, 1, n) * self.hotspot_sigma[which]
+        v = self.hotspot_v[which] + rng.normal(0, 1, n) * self.hotspot_sigma[which]
+        background = rng.random(n) < BACKGROUND_FRACTION
+        u = np.where(background, rng.uniform(-self.radius_m, self.radius_m, n), u)
+        v = np.where(background, rng.uniform(-self.radius_m, self.radius_m, n), v)
+        # Snap onto an avenue (fixed v) or a cross street (fixed u), a few meters off the centerline
+        on_street = rng.random(n) < ON_STREET_FRACTION
+        on_avenue = rng.random(n) < ON_AVENUE_FRACTION
+        jitter = rng.normal(0, 5, n)
+        v = np.where(on_street & on_avenue, np.round(v / AVENUE_SPACING_M) * AVENUE_SPACING_M + jitter, v)
+        u = np.where(on_street & ~on_avenue, np.round(u / STREET_SPACING_M) * STREET_SPACING_M + jitter, u)
+        return u, v
+
+    def points(self, n: int, stream: int = 9) -> List[Tuple[float, float]]:
+        """n (lat, lng) points distributed like events, e.g. for query centers."""
+        lat, lng = self.to_latlng(*self._grid_points(_rng(self.seed, stream), n))
+        return list(zip(lat.tolist(), lng.tolist()))
+
+    def _chunk_columns(self, k: int, n: int) -> Dict[str, np.ndarray]:
+        """First n events of chunk k; the whole chunk is drawn so prefixes do not depend on n."""
+        rng = _rng(self.seed, 1, k)
+        n, size = CHUNK_SIZE, n
+        lat, lng = self.to_latlng(*self._grid_points(rng, n))
+
+        # Day uniform over the window, hour from the diurnal profile, wrapped into [start, now)
+        window = self.days * 86400.0
+        now = (self.now - EPOCH).total_seconds()
+        start = now - window
+        midnight = math.floor(start / 86400.0) * 86400.0
+        t = (midnight + rng.integers(0, math.ceil(self.days) + 1, n) * 86400.0
+             + rng.choice(24, size=n, p=DIURNAL) * 3600.0 + rng.uniform(0, 3600.0, n))
+        t = start + np.mod(t - start, window)
+
+        types = list(TYPE_MIX)
+        type_index = rng.choice(len(types), size=n, p=np.array(list(TYPE_MIX.values())))
+        means = np.array([SEVERITY_MEAN[name] for name in types])[type_index]
+        severity = np.clip(np.round(rng.normal(means, 1.5)), 1, 10).astype(np.int64)
+        columns = {
+            "lat": lat, "lng": lng, "time": t, "severity": severity,
+            "type_code": np.array([EVENT_TYPES.index(name) for name in types])[type_index],
+            "title": rng.integers(0, 3, n), "street": rng.integers(0, len(STREETS), n),
+        }
+        return {name: values[:size] for name, values in columns.items()}
+
+    def columns(self, n: int) -> Dict[str, np.ndarray]:
+        """First n events as arrays (lat, lng, epoch time, severity, type_code)."""
+        parts = [self._chunk_columns(k, min(CHUNK_SIZE, n - k * CHUNK_SIZE))
+                 for k in range(math.ceil(n / CHUNK_SIZE))]
+        if not parts:
+            return {name: np.zeros(0) for name in ("lat", "lng", "time", "severity", "type_code")}
+        return {name: np.concatenate([p[name] for p in parts]) for name in ("lat", "lng", "time", "severity", "type_code")}
+
+    def iter_events(self, n: int, score: bool = True) -> Iterator[List[Dict[str, Any]]]:
+        """First n events as event documents, one CHUNK_SIZE list at a time."""
+        for k in range(math.ceil(n / CHUNK_SIZE)):
+            size = min(CHUNK_SIZE, n - k * CHUNK_SIZE)
+            cols = self._chunk_columns(k, size)
+            docs = []
+            for i in range(size):
+                event_type = EVENT_TYPES[cols["type_code"][i]]
+                lat, lng = float(cols["lat"][i]), float(cols["lng"][i])
+                title = TITLES[event_type][cols["title"][i]].format(street=STREETS[cols["street"][i]])
+                severity = int(cols["severity"][i])
+                doc = {
+                    "_id": f"synthetic:{self.seed}:{k * CHUNK_SIZE + i}",
+                    "source": "synthetic",
+                    "title": title,
+                    "text": f"{title}. Police and emergency services responded to the scene.",
+                    "url": "",
+                    "timestamp": EPOCH + timedelta(seconds=float(cols["time"][i])),
+                    "coordinates": {"type": "Point", "coordinates": [lng, lat], "lat": lat, "lng": lng},
+                    "event_type": event_type,
+                    "severity": severity,
+                    "urgency": severity * 10 - 50,
+                    "report_count": 1,
+                }
+                if score:
+                    doc.update(score_fields(doc))
+                docs.append(doc)
+            yield docs
+
+    def events(self, n: int, score: bool = True) -> List[Dict[str, Any]]:
+        return [doc for chunk in self.iter_events(n, score) for doc in chunk]
+
+    def _densify(self, corners: List[Tuple[float, float]], step_m: float) -> List[Tuple[float, float]]:
+        u, v = [], []
+        for (u0, v0), (u1, v1) in zip(corners, corners[1:]):
+            steps = max(1, int(math.hypot(u1 - u0, v1 - v0) // step_m))
+            t = np.arange(steps) / steps
+            u.extend(u0 + (u1 - u0) * t)
+            v.extend(v0 + (v1 - v0) * t)
+        u.append(corners[-1][0])
+        v.append(corners[-1][1])
+        lat, lng = self.to_latlng(np.array(u), np.array(v))
+        return list(zip(np.round(lat, 5).tolist(), np.round(lng, 5).tolist()))
+
+    def route(self, start: Tuple[float, float], end: Tuple[float, float], variant: int = 0,
+              step_m: float = 25.0) -> List[Tuple[float, float]]:
+        """
+        Street-following route between two points.
+
+        variant 0 goes along the avenue first, 1 along the cross street first,
+        2 zig-zags in blocks of a few streets; all stay on the grid.
+        """
+        (u0, v0), (u1, v1) = self.to_grid(*start), self.to_grid(*end)
+        # Walk from the nearest avenue/street intersections
+        su, sv = round(u0 / STREET_SPACING_M) * STREET_SPACING_M, round(v0 / AVENUE_SPACING_M) * AVENUE_SPACING_M
+        eu, ev = round(u1 / STREET_SPACING_M) * STREET_SPACING_M, round(v1 / AVENUE_SPACING_M) * AVENUE_SPACING_M
+        corners = [(u0, v0), (su, sv)]
+        if variant == 0:
+            corners.append((eu, sv))
+        elif variant == 1:
+            corners.append((su, ev))
+        else:
+            # Staircase: alternate a few blocks along the avenue with one avenue across
+            hops = max(1, round(abs(ev - sv) / AVENUE_SPACING_M))
+            for h in range(1, hops + 1):
+                u = round((su + (eu - su) * h / hops) / STREET_SPACING_M) * STREET_SPACING_M
+                corners += [(u, corners[-1][1]), (u, sv + (ev - sv) * h / hops)]
+        corners += [(eu, ev), (u1, v1)]
+        return self._densify(corners, step_m)
+
+    def route_points(self, n_points: int, stream: int = 7, step_m: float = 10.0) -> List[Tuple[float, float]]:
+        """Exactly n_points along a grid walk from a hotspot, step_m apart, turning at intersections."""
+        rng = _rng(self.seed, 2, stream)
+        u, v = self._grid_points(rng, 1)
+        u = float(np.round(u[0] / STREET_SPACING_M) * STREET_SPACING_M)
+        v = float(np.round(v[0] / AVENUE_SPACING_M) * AVENUE_SPACING_M)
+        du, dv = (step_m, 0.0) if rng.random() < 0.5 else (0.0, step_m)
+        us, vs = [], []
+        for _ in range(n_points):
+            us.append(u)
+            vs.append(v)
+            u, v = u + du, v + dv
+            on_street = _near_line(u, STREET_SPACING_M, step_m / 2)
+            on_avenue = _near_line(v, AVENUE_SPACING_M, step_m / 2)
+            if on_street and on_avenue and rng.random() < 0.3:
+                du, dv = (dv, du) if rng.random() < 0.5 else (-dv, -du)
+        lat, lng = self.to_latlng(np.array(us), np.array(vs))
+        return list(zip(np.round(lat, 5).tolist(), np.round(lng, 5).tolist()))
+
+    def routes(self, n: int, n_points: int) -> Iterator[Dict[str, Any]]:
+        for i in range(n):
+            points = self.route_points(n_points, stream=100 + i)
+            yield {"id": i, "start": points[0], "end": points[-1], "points": len(points),
+                   "polyline": encode_polyline(points)}
+
+
+def flat_record(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Event as one JSONL line (the columns scripts/import_history.py looks for)."""
+    return {
+        "id": doc["_id"],
+        "timestamp": doc["timestamp"].isoformat(),
+        "lat": doc["coordinates"]["lat"],
+        "lng": doc["coordinates"]["lng"],
+        "event_type": doc["event_type"],
+        "severity": doc["severity"],
+        "title": doc["title"],
+        "text": doc["text"],
+    }
+
+
+def open_output(path: Path):
+    return gzip.open(path, "wt") if path.suffix == ".gz" else open(path, "w")
+
+
+async def load_into_mongo(city: SyntheticCity, n: int, batch_size: int = 10_000) -> int:
+    """Bulk-load n events (and their rollups) into MONGO_URI; returns events inserted."""
+    from app.db import db
+    from scripts.import_history import write_chunk
+
+    await db.connect()
+    inserted = 0
+    for chunk in city.iter_events(n):
+        for i in range(0, len(chunk), batch_size):
+            inserted += await write_chunk(chunk[i:i + batch_size], rollups=True)
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic events and routes")
+    parser.add_argument("kind", choices=["events", "routes"])
+    parser.add_argument("--n", type=int, default=100_000, help="Events or routes to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=float, default=3.0, help="Events span the last N days")
+    parser.add_argument("--hotspots", type=int, default=HOTSPOTS)
+    parser.add_argument("--points", type=int, default=200, help="Points per route")
+    parser.add_argument("--out", type=Path, help="JSONL output (.gz to compress)")
+    parser.add_argument("--mongo", action="store_true", help="Bulk-load events into MONGO_URI")
+    args = parser.parse_args()
+    if not args.out and not args.mongo:
+        parser.error("pass --out and/or --mongo")
+
+    city = SyntheticCity(seed=args.seed, hotspots=args.hotspots, days=args.days)
+    started = time.monotonic()
+    if args.kind == "routes":
+        if args.mongo:
+            parser.error("routes are written to --out only")
+        with open_output(args.out) as f:
+            for route in city.routes(args.n, args.points):
+                f.write(json.dumps(route) + "\n")
+    elif args.mongo:
+        inserted = asyncio.run(load_into_mongo(city, args.n))
+        print(f"Inserted {inserted:,} events")
+    if args.kind == "events" and args.out:
+        with open_output(args.out) as f:
+            for chunk in city.iter_events(args.n, score=False):
+                f.writelines(json.dumps(flat_record(doc)) + "\n" for doc in chunk)
+    elapsed = time.monotonic() - started
+    print(f"Generated {args.n:,} {args.kind} in {elapsed:.1f}s ({args.n / max(elapsed, 1e-9):,.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Train the local relevance prefilter from stored LLM classifications.
+
+Usage:
+    python scripts/train_relevance.py --output models/relevance.json
+    python scripts/train_relevance.py --jsonl labelled.jsonl --drop-threshold 0.95
+
+Samples come from the `classifications` collection (every LLM output recorded by
+ingest) plus stored events the LLM classified. A JSONL file with text, type and
+severity fields can be used instead. The report shows, on a held-out split,
+how many LLM calls the thresholds would avoid and how often the local
+decisions agree with the LLM.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from app.llm import EVENT_TYPES
+from app.relevance import DROP_THRESHOLD, LOCAL_THRESHOLD, MODEL_PATH, evaluate, train
+
+
+async def load_from_mongo(limit: int):
+    """(text, type, severity) samples from LLM classifications and LLM-classified events."""
+    from app.db import db
+
+    await db.connect()
+    samples = [
+        (r["text"], r.get("type", "other"), r.get("severity", 5))
+        for r in await db.classification_samples(limit)
+    ]
+    # Events stored before classifications were recorded; fallback labels are not LLM output
+    cursor = db.collection.find(
+        {"analyzer": {"$in": ["llm", None]}, "notes": {"$ne": "Fallback regex analysis"}},
+        {"title": 1, "text": 1, "event_type": 1, "severity": 1}
+    ).limit(limit)
+    async for event in cursor:
+        samples.append((event.get("text") or event.get("title", ""), event.get("event_type", "other"),
+                        event.get("severity", 5)))
+    await db.disconnect()
+    return samples
+
+
+def load_from_jsonl(path: Path):
+    samples = []
+    with path.open() as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                samples.append((row["text"], row.get("type", "other"), row.get("severity", 5)))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local relevance prefilter")
+    parser.add_argument("--output", default=MODEL_PATH or "models/relevance.json", help="Model file to write")
+    parser.add_argument("--jsonl", type=Path, help="Train from a JSONL file instead of MongoDB")
+    parser.add_argument("--limit", type=int, default=100000, help="Maximum samples per Mongo source")
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction held out for the report")
+    parser.add_argument("--drop-threshold", type=float, default=DROP_THRESHOLD)
+    parser.add_argument("--local-threshold", type=float, default=LOCAL_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    samples = load_from_jsonl(args.jsonl) if args.jsonl else asyncio.run(load_from_mongo(args.limit))
+
+    # Same text seen twice (re-scraped feeds) would leak into the holdout
+    unique = list({text: (text, label, severity) for text, label, severity in samples if text}.values())
+    if len(unique) < 20:
+        print(f"Only {len(unique)} labelled samples; need at least 20 to train")
+        sys.exit(1)
+
+    random.Random(args.seed).shuffle(unique)
+    split = int(len(unique) * (1 - args.holdout))
+    train_set, holdout = unique[:split], unique[split:]
+    print(f"Training on {len(train_set)} samples, evaluating on {len(holdout)}")
+
+    model = train(train_set, EVENT_TYPES, epochs=args.epochs, seed=args.seed)
+    report = evaluate(model, holdout, args.drop_threshold, args.local_threshold)
+    print(json.dumps(report, indent=2))
+
+    # Ship a model trained on everything; the holdout report stands for it
+    model = train(unique, EVENT_TYPES, epochs=args.epochs, seed=args.seed)
+    model.meta["holdout_report"] = report
+    model.save(args.output)
+    print(f"Model written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
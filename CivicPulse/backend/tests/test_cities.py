@@ -0,0 +1,87 @@
+"""Unit tests for city configuration and shard routing."""
+import json
+import os
+import tempfile
+import unittest
+from app import cities
+from app.cities import City, load_cities
+from app.db import Database
+
+
+def box(south, west, north, east):
+    return {"sw": {"lat": south, "lng": west}, "ne": {"lat": north, "lng": east}}
+
+
+# An L-shaped area: the top-right quarter of its envelope is outside
+L_AREA = [[0, 0], [2, 0], [2, 1], [1, 1], [1, 2], [0, 2]]
+
+
+class TestCities(unittest.TestCase):
+
+    def test_area_contains_and_intersects(self):
+        city = City("l", area=L_AREA)
+        self.assertTrue(city.contains(0.5, 1.5))
+        self.assertFalse(city.contains(1.5, 1.5))
+        self.assertTrue(city.intersects(box(1.5, 0.5, 1.6, 0.6)))
+        self.assertFalse(city.intersects(box(1.2, 1.2, 1.8, 1.8)))   # in the envelope, not the area
+        self.assertTrue(city.intersects(box(0.5, -1, 0.6, 3)))       # crosses without a vertex inside
+        self.assertFalse(city.intersects(box(5, 5, 6, 6)))
+        self.assertTrue(City("anywhere").intersects(box(5, 5, 6, 6)))
+
+    def test_load_cities_gives_each_a_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cities.json")
+            with open(path, "w") as f:
+                json.dump([{"name": "a", "area": L_AREA},
+                           {"name": "b", "mongo_uri": "mongodb://b-db:27017/city_b"}], f)
+            a, b = load_cities(path)
+        self.assertEqual(a.database, "urbanpulse_a")
+        self.assertEqual((b.mongo_uri, b.database), ("mongodb://b-db:27017/city_b", "city_b"))
+
+    def test_reads_go_only_to_intersecting_shards(self):
+        configured = [City("a", area=L_AREA), City("b", area=[[10, 10], [11, 10], [11, 11]])]
+        saved, cities._cities = cities._cities, configured
+        try:
+            db = Database("a")
+            self.assertEqual(db.shards_for(box(0.5, 0.5, 0.6, 0.6)), [db])
+            self.assertEqual([s.city.name for s in db.shards_for(box(12, 12, 13, 13))], [])
+            self.assertEqual([s.city.name for s in db.shards_for(box(0, 0, 10.5, 10.9))], ["a", "b"])
+            self.assertEqual([s.city.name for s in db.shards_for()], ["a", "b"])
+        finally:
+            cities._cities = saved
+
+    def test_fan_out_keeps_newest_and_snapshots_need_every_shard(self):
+        import asyncio
+        from app import db as db_module
+        configured = [City("a"), City("b")]
+        saved_cities, cities._cities = cities._cities, configured
+        saved_limit, db_module.QUERY_LIMIT = db_module.QUERY_LIMIT, 3
+        try:
+            db = Database("a")
+            other = db.shards_for()[1]
+
+            async def old_events(*args):
+                return [{"timestamp": f"2024-01-0{day}T00:00:00"} for day in (1, 2, 3)]
+
+            async def new_events(*args):
+                return [{"timestamp": f"2024-02-0{day}T00:00:00"} for day in (1, 2)]
+
+            async def down(*args):
+                raise ConnectionError("shard b down")
+
+            db._query_events, other._query_events = old_events, new_events
+            events = asyncio.run(db.query_events())
+            self.assertEqual([e["timestamp"][:7] for e in events], ["2024-02", "2024-02", "2024-01"])
+
+            db._snapshot_events, other._snapshot_events = old_events, down
+            with self.assertRaises(ConnectionError):
+                asyncio.run(db.snapshot_events())
+            other._query_events = down
+            self.assertEqual(len(asyncio.run(db.query_events())), 3)  # reads tolerate a missing city
+        finally:
+            cities._cities = saved_cities
+            db_module.QUERY_LIMIT = saved_limit
+
+
+if __name__ == '__main__':
+    unittest.main()
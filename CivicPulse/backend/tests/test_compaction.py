@@ -0,0 +1,77 @@
+"""Unit tests for article text compaction."""
+import asyncio
+import json
+import sys
+import unittest
+from pathlib import Path
+from app.compaction import clean_text, estimate_tokens, fit_token_budget, strip_html
+
+
+class TestCompaction(unittest.TestCase):
+
+    def test_strip_html(self):
+        """Tags, scripts and entities go; block tags become line breaks."""
+        html = "<p>Crash on <b>FDR Drive</b> &amp; 23rd St.</p><script>track()</script><p>Two lanes closed.</p>"
+        self.assertEqual(strip_html(html), "Crash on FDR Drive & 23rd St.\nTwo lanes closed.")
+
+    def test_clean_text_drops_repeated_segments(self):
+        """Title, summary and description repeating each other appear once."""
+        summary = "<p>Fire in Harlem leaves three injured. Firefighters responded on West 125th Street.</p>"
+        text = clean_text(["Fire in Harlem", summary, summary + "<p>The cause is under investigation.</p>"])
+        self.assertEqual(text.split("\n"), [
+            "Fire in Harlem leaves three injured.",
+            "Firefighters responded on West 125th Street.",
+            "The cause is under investigation.",
+        ])
+
+    def test_budget_keeps_location_and_incident(self):
+        """Over budget, filler sentences go before the ones naming the place and event."""
+        text = "\n".join([
+            "Residents were talking about it all week long and many shared their thoughts online.",
+            "A shooting was reported near Canal Street at 2 a.m.",
+            "Some said they had seen similar things happen before in other cities they lived in.",
+            "Officials promised to share more information in the coming days as it becomes available.",
+        ])
+        fitted = fit_token_budget(text, token_budget=30)
+        self.assertLessEqual(estimate_tokens(fitted), 30)
+        self.assertIn("Canal Street", fitted)
+        self.assertEqual(fit_token_budget("Short text.", token_budget=30), "Short text.")
+
+
+class TestCompactionEval(unittest.TestCase):
+
+    def setUp(self):
+        sys.path.insert(0, str(Path(__file__).parent.parent))
+        from scripts import eval_compaction
+        self.script = eval_compaction
+        self.articles = eval_compaction.load_jsonl(eval_compaction.DEFAULT_CORPUS)
+
+    def test_fixture_corpus_saves_tokens(self):
+        report = asyncio.run(self.script.evaluate(self.articles, 250, use_llm=False))
+        self.assertEqual(report["articles"], len(self.articles))
+        self.assertGreater(report["tokens_saved_rate"], 0)
+        self.assertIsNotNone(report["type_agreement"])
+
+    def test_baseline_uses_pinned_legacy_prompt(self):
+        """The before side is sent with the pre-compaction prompt, the after side with the current one."""
+        import app.llm as llm
+        sent = []
+
+        class Client:
+            async def complete(self, messages, max_tokens=300, temperature=0.3):
+                sent.append(messages)
+                return json.dumps({"type": "accident", "severity": 5})
+
+        saved, llm.get_llm_client = llm.get_llm_client, lambda: Client()
+        try:
+            asyncio.run(self.script.evaluate(self.articles[:1], 250, use_llm=True))
+        finally:
+            llm.get_llm_client = saved
+        before, after = sent
+        self.assertEqual(before[0]["content"], self.script.LEGACY_SYSTEM)
+        self.assertTrue(before[1]["content"].startswith("Analyze the following news article"))
+        self.assertEqual(after[0]["content"], llm.SYSTEM_PROMPT)
+
+
+if __name__ == '__main__':
+    unittest.main()
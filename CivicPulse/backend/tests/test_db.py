@@ -0,0 +1,151 @@
+"""Unit tests for database helpers that need no server."""
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+from pymongo.errors import ConnectionFailure, OperationFailure, ServerSelectionTimeoutError
+from app import db as db_module
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def limit(self, n):
+        return FakeCursor(self.docs[:n])
+
+    async def to_list(self, length=None):
+        return [dict(doc) for doc in self.docs[:length]]
+
+
+class FakeCollection:
+    """In-memory stand-in for the few collection methods the archive path uses."""
+
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.queries = []
+
+    def find(self, query=None, projection=None):
+        self.queries.append(query)
+        cutoff = (query or {}).get("timestamp", {})
+        docs = [doc for doc in self.docs
+                if ("$lt" not in cutoff or doc["timestamp"] < cutoff["$lt"])
+                and ("$gte" not in cutoff or doc["timestamp"] >= cutoff["$gte"])]
+        return FakeCursor(docs)
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.extend(dict(doc) for doc in docs)
+
+    async def delete_many(self, query):
+        ids = set(query["_id"]["$in"])
+        self.docs = [doc for doc in self.docs if doc["_id"] not in ids]
+
+
+def fake_database(hot=(), archived=()):
+    """A Database whose hot and archive collections are in memory."""
+    database = db_module.Database()
+
+    async def connected():
+        pass
+
+    database._ensure_connected = connected
+    database.collection = database.read_collection = FakeCollection(hot)
+    database.archive = database.read_archive = FakeCollection(archived)
+    return database
+
+
+def event(_id, hours_ago, now=NOW):
+    return {"_id": _id, "timestamp": now - timedelta(hours=hours_ago)}
+
+
+class TestDatabaseHelpers(unittest.TestCase):
+
+    def test_index_fingerprint_follows_ttl_settings(self):
+        before = db_module.index_fingerprint()
+        ttl = db_module.ARCHIVE_INDEXES[-1]
+        saved = ttl["options"]
+        ttl["options"] = {"expireAfterSeconds": 30 * 86400}  # EVENTS_ARCHIVE_RETENTION_DAYS=30
+        try:
+            self.assertNotEqual(db_module.index_fingerprint(), before)
+        finally:
+            ttl["options"] = saved
+        self.assertEqual(db_module.index_fingerprint(), before)
+
+    def test_failed_connects_back_off_whatever_the_error(self):
+        """Server selection timeouts and command failures start the backoff like connection failures."""
+        for error in (ServerSelectionTimeoutError("no servers"), OperationFailure("auth failed")):
+            database = db_module.Database()
+            attempts = []
+
+            async def failing_open():
+                attempts.append(1)
+                raise error
+
+            database._open = failing_open
+
+            async def twice():
+                for _ in range(2):
+                    try:
+                        await database._ensure_connected()
+                    except (ConnectionFailure, OperationFailure) as e:
+                        last = e
+                return last
+
+            last = asyncio.run(twice())
+            self.assertEqual(len(attempts), 1)
+            self.assertEqual(database._connect_failures, 1)
+            self.assertIn("next reconnect attempt", str(last))
+
+    def test_archive_cutoff_and_filter(self):
+        cutoff = db_module.archive_cutoff(NOW)
+        self.assertEqual(cutoff, NOW - timedelta(hours=db_module.HOT_RETENTION_HOURS))
+        self.assertEqual(db_module.archive_filter(cutoff), {"timestamp": {"$lt": cutoff}})
+        self.assertLess(abs((datetime.utcnow() - db_module.archive_cutoff()) -
+                            timedelta(hours=db_module.HOT_RETENTION_HOURS)), timedelta(minutes=1))
+
+    def test_windows_past_hot_retention_read_the_archive(self):
+        hours = db_module.HOT_RETENTION_HOURS
+        self.assertFalse(db_module.reads_archive(24))
+        self.assertFalse(db_module.reads_archive(hours))
+        self.assertTrue(db_module.reads_archive(hours + 1))
+        self.assertTrue(db_module.reads_archive(None))
+
+        # events_filter measures the window from the real clock
+        now = datetime.utcnow()
+        database = fake_database(hot=[event("hot", 1, now)], archived=[event("cold", hours + 24, now)])
+        short = asyncio.run(database._query_events(since_hours=24))
+        self.assertEqual([e["_id"] for e in short], ["hot"])
+        self.assertEqual(database.read_archive.queries, [])
+
+        long = asyncio.run(database._query_events(since_hours=hours * 3))
+        self.assertEqual([e["_id"] for e in long], ["hot", "cold"])
+        everything = asyncio.run(database._query_events())
+        self.assertEqual([e["_id"] for e in everything], ["hot", "cold"])
+
+    def test_archive_cold_events_moves_only_past_the_cutoff(self):
+        hours = db_module.HOT_RETENTION_HOURS
+        saved = db_module.ARCHIVE_BATCH_SIZE
+        db_module.ARCHIVE_BATCH_SIZE = 2
+        try:
+            database = fake_database(hot=[event(i, hours + i) for i in range(-2, 3)])
+            moved = asyncio.run(database.archive_cold_events(now=NOW))
+        finally:
+            db_module.ARCHIVE_BATCH_SIZE = saved
+
+        self.assertEqual(moved, 2)
+        self.assertEqual(sorted(doc["_id"] for doc in database.collection.docs), [-2, -1, 0])
+        self.assertEqual(sorted(doc["_id"] for doc in database.archive.docs), [1, 2])
+        self.assertTrue(all(doc["archived_at"] == NOW for doc in database.archive.docs))
+
+    def test_import_sends_old_events_straight_to_the_archive(self):
+        hours = db_module.HOT_RETENTION_HOURS
+        database = fake_database()
+        inserted = asyncio.run(database.import_events([event("new", 1), event("old", hours + 1)], now=NOW))
+        self.assertEqual(len(inserted), 2)
+        self.assertEqual([doc["_id"] for doc in database.collection.docs], ["new"])
+        self.assertEqual([doc["_id"] for doc in database.archive.docs], ["old"])
+
+
+if __name__ == '__main__':
+    unittest.main()
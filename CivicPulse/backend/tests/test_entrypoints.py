@@ -0,0 +1,67 @@
+"""The read API entry point stays free of ingest-only dependencies."""
+import json
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+HEAVY_MODULES = ["openai", "bs4", "feedparser", "apscheduler", "requests", "app.scraper", "app.llm"]
+
+
+class TestEntryPoints(unittest.TestCase):
+
+    def test_api_does_not_import_ingest_dependencies(self):
+        code = f"import json, sys, app.api; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+        result = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent.parent,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(json.loads(result.stdout.strip().splitlines()[-1]), [])
+
+    def test_main_serves_read_and_ingest_routes(self):
+        from app.main import app
+        paths = {route.path for route in app.routes}
+        self.assertTrue({"/events", "/route", "/stats", "/ingest/one-shot", "/admin/archive"} <= paths)
+
+    def test_ingest_pass_scrapes_each_source_once(self):
+        import asyncio
+        from app import ingest
+        calls = []
+
+        def scrape(*args):
+            calls.append(args)
+            return []
+
+        saved, ingest.run_one_shot = ingest.run_one_shot, scrape
+        try:
+            counts = asyncio.run(ingest.run_ingest())
+        finally:
+            ingest.run_one_shot = saved
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(counts["events_processed"], 0)
+
+    def test_overlapping_ingest_calls_share_one_pass(self):
+        """A second run_ingest while one is running joins it instead of scraping again."""
+        import asyncio
+        import time
+        from app import ingest
+        calls = []
+
+        def scrape(*args):
+            calls.append(args)
+            time.sleep(0.05)
+            return []
+
+        async def overlap():
+            return await asyncio.gather(ingest.run_ingest(), ingest.run_ingest())
+
+        saved, ingest.run_one_shot = ingest.run_one_shot, scrape
+        try:
+            first, second = asyncio.run(overlap())
+            asyncio.run(ingest.run_ingest())
+        finally:
+            ingest.run_one_shot = saved
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 2)  # one for the overlapping pair, one for the later pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Unit tests for the compact event representations."""
+import math
+import unittest
+from datetime import datetime, timedelta
+from app.events import EventColumns, EventRecord
+from app.scoring import compute_route_risk, compute_score
+
+
+def doc(i, hours_ago, severity=7, text="Car accident reported"):
+    return {
+        "_id": f"id{i}",
+        "title": f"Event {i}",
+        "text": text,
+        "timestamp": datetime.utcnow() - timedelta(hours=hours_ago),
+        "coordinates": {"type": "Point", "coordinates": [-73.9855, 40.758 + i * 0.0001],
+                        "lat": 40.758 + i * 0.0001, "lng": -73.9855},
+        "severity": severity,
+        "event_type": "accident",
+    }
+
+
+class TestEvents(unittest.TestCase):
+
+    def test_record_from_doc(self):
+        """Records keep the numbers scoring needs and score like compute_score."""
+        event = doc(1, hours_ago=3, text="Shooting near the station")
+        record = EventRecord.from_doc(event)
+        self.assertEqual((record.id, record.event_type, record.severity), ("id1", "accident", 7))
+        self.assertEqual(record.static_score, 15.0)
+        self.assertAlmostEqual(record.score(), compute_score(event), places=3)
+        self.assertFalse(hasattr(record, "__dict__"))
+
+        missing = EventRecord.from_doc({"severity": 42, "event_type": "unknown"})
+        self.assertTrue(math.isnan(missing.lat))
+        self.assertEqual((missing.severity, missing.event_type), (5, "other"))
+
+    def test_columns_score_and_route_risk(self):
+        """Columnar scores and route risk match values worked out by hand."""
+        now = datetime(2024, 5, 1, 12)
+        quiet = "Street fair reported"
+        docs = [
+            dict(doc(0, 0, severity=7, text=quiet), timestamp=now),                      # 7 * 10
+            dict(doc(1, 0, severity=7, text=quiet), timestamp=now - timedelta(hours=24)),  # 70 / e
+            dict(doc(2, 0, severity=10, text="Shooting near the station"), timestamp=now),  # 100 + 15, capped
+        ]
+        columns = EventColumns.from_docs(docs)
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(columns.ids, ["id0", "id1", "id2"])
+        self.assertEqual(list(columns.static_score), [0.0, 0.0, 15.0])
+        scores = columns.scores(now=(now - datetime(1970, 1, 1)).total_seconds())
+        for score, expected in zip(scores, [70.0, 70.0 / math.e, 100.0]):
+            self.assertAlmostEqual(float(score), expected, places=3)
+
+        # One route point: an event on it (weight 1), one 25 m north (weight 0.5), one 1 km away
+        meters_per_degree = 6371000 * math.pi / 180
+        lat, lng = 40.758, -73.9855
+        fresh = datetime.utcnow()
+        placed = [
+            dict(doc(0, 0, severity=7, text=quiet), timestamp=fresh,
+                 coordinates={"lat": lat, "lng": lng}),
+            dict(doc(1, 0, severity=7, text=quiet), timestamp=fresh - timedelta(hours=24),
+                 coordinates={"lat": lat + 25 / meters_per_degree, "lng": lng}),
+            dict(doc(2, 0, severity=10, text=quiet), timestamp=fresh,
+                 coordinates={"lat": lat + 1000 / meters_per_degree, "lng": lng}),
+        ]
+        risk, count = compute_route_risk([(lat, lng)], EventColumns.from_docs(placed))
+        self.assertEqual(count, 2)
+        self.assertAlmostEqual(risk, 70.0 + 0.5 * 70.0 / math.e, places=2)
+
+        subset = columns.take(columns.severity > 7)
+        self.assertEqual(subset.ids, ["id2"])
+
+if __name__ == '__main__':
+    unittest.main()
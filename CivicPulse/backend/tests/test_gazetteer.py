@@ -0,0 +1,72 @@
+"""Unit tests for the offline gazetteer geocoder."""
+import unittest
+from app.gazetteer import Gazetteer, Place, normalize
+
+
+PLACES = [
+    Place("Times Square", "landmark", 40.7580, -73.9855),
+    Place("Grand Central Terminal", "landmark", 40.7527, -73.9772),
+    Place("Williamsburg", "neighborhood", 40.7081, -73.9571),
+    Place("42nd Street", "street", 40.7560, -73.9860),
+    Place("St. Marks Place", "street", 40.7274, -73.9853),
+    Place("Lower East Side", "neighborhood", 40.7150, -73.9843),
+    Place("Queens", "borough", 40.7282, -73.7949),
+    Place("Broadway", "street", 40.7590, -73.9845),
+    Place("5th Avenue", "street", 40.7750, -73.9650),
+    Place("Canal Street", "street", 40.7190, -74.0020),
+    Place("Brooklyn", "borough", 40.6782, -73.9442),
+]
+
+
+class TestGazetteer(unittest.TestCase):
+
+    def setUp(self):
+        self.gazetteer = Gazetteer(PLACES, {"Williamsburg": ["Billyburg"], "Lower East Side": ["LES"]})
+
+    def test_normalize_expands_abbreviations(self):
+        """Address spellings of the same street share one key."""
+        self.assertEqual(normalize("W. 42nd St."), "west 42nd street")
+        self.assertEqual(normalize("St Marks Pl"), "saint marks place")
+        self.assertEqual(normalize("Fifth Ave"), "5th avenue")
+
+    def test_match_methods(self):
+        """Exact, prefix, fuzzy and in-text hints resolve; unknown places do not."""
+        cases = {
+            "times sq, New York": ("Times Square", "exact"),
+            "W 42nd St": ("42nd Street", "exact"),
+            "Billyburg": ("Williamsburg", "exact"),
+            "Grand Central": ("Grand Central Terminal", "prefix"),
+            "Wiliamsburg": ("Williamsburg", "fuzzy"),
+            "Crash near Times Square this morning": ("Times Square", "text"),
+        }
+        for hint, (name, method) in cases.items():
+            found = self.gazetteer.match(hint)
+            self.assertIsNotNone(found, hint)
+            self.assertEqual((found.place.name, found.method), (name, method), hint)
+
+        self.assertIsNone(self.gazetteer.match("Springfield"))
+        self.assertIsNone(self.gazetteer.match("Gra"))
+        self.assertEqual(self.gazetteer.lookup("Times Square"), {"lat": 40.7580, "lng": -73.9855})
+
+    def test_single_words_in_text_need_capitals(self):
+        """One-word names inside text match only as proper nouns; short ones only as acronyms."""
+        self.assertEqual(self.gazetteer.match("Man robbed in Queens overnight").place.name, "Queens")
+        self.assertEqual(self.gazetteer.match("Bar fight on the LES last night").place.name, "Lower East Side")
+        self.assertIsNone(self.gazetteer.match("Drag queens perform at the fundraiser tonight"))
+        self.assertIsNone(self.gazetteer.match("Les Paul tribute concert draws a big crowd"))
+        self.assertIsNone(self.gazetteer.match("fewer cars, les accidents, more bikes on the road"))
+
+    def test_streets_answer_bare_names_only(self):
+        """House numbers, cross streets and boroughs make a street hint too precise for its centroid."""
+        for hint in ["123 Broadway", "350 5th Avenue", "Canal Street Brooklyn", "350 W 42nd St",
+                     "Broadway and Canal St", "Canal St / Broadway", "Shooting at 123 Broadway"]:
+            self.assertIsNone(self.gazetteer.match(hint), hint)
+        for hint in ["Broadway", "Canal St", "5th Ave", "Crash on Broadway this morning"]:
+            found = self.gazetteer.match(hint)
+            self.assertIsNotNone(found, hint)
+            self.assertEqual(found.place.kind, "street", hint)
+        self.assertEqual(self.gazetteer.match("Times Square, Manhattan").place.name, "Times Square")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""Unit tests for the historical importer and Database.import_events."""
+import asyncio
+import csv
+import json
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db import Database, db
+from scripts import import_history
+from scripts.import_history import load_checkpoint, parse_chunk, parse_time, run
+
+ROWS = [
+    {"unique_key": str(i), "Latitude": f"40.7{i}", "Longitude": "-73.99",
+     "created_date": "01/15/2024 10:00:00 PM", "complaint_type": "Assault", "descriptor": "Man assaulted"}
+    for i in range(10)
+]
+
+
+class FakeCollection:
+    def __init__(self, stored=()):
+        self.docs = {doc_id: None for doc_id in stored}
+
+    async def insert_many(self, batch, ordered=True):
+        errors = []
+        for i, doc in enumerate(batch):
+            if doc["_id"] in self.docs:
+                errors.append({"index": i, "code": 11000})
+            else:
+                self.docs[doc["_id"]] = doc
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+class TestImportHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = Path(self.tmp) / "complaints.csv"
+        with open(self.path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(ROWS[0]))
+            writer.writeheader()
+            writer.writerows(ROWS)
+
+    def test_parse_csv_and_jsonl_rows(self):
+        fields = {"id": "unique_key", "lat": "Latitude", "lng": "Longitude", "time": "created_date",
+                  "type": "complaint_type", "text": "descriptor"}
+        header = list(ROWS[0])
+        events, rejected = parse_chunk([list(ROWS[0].values()), ["x", "", "", "", "", ""]], header, fields, "nyc")
+        self.assertEqual((len(events), rejected), (1, 1))
+        self.assertEqual(events[0]["_id"], "import:nyc:0")
+        self.assertEqual(events[0]["timestamp"], datetime(2024, 1, 15, 22, 0))  # naive read as UTC
+
+        events, _ = parse_chunk([json.dumps(ROWS[1])], None, fields, "nyc", "America/New_York")
+        self.assertEqual(events[0]["timestamp"], datetime(2024, 1, 16, 3, 0))
+        self.assertEqual(events[0]["coordinates"]["coordinates"], [-73.99, 40.71])
+
+    def test_timestamps(self):
+        self.assertEqual(parse_time("2024-01-15T10:00:00+02:00", "America/New_York"), datetime(2024, 1, 15, 8, 0))
+        self.assertEqual(parse_time("1700000000000"), datetime(2023, 11, 14, 22, 13, 20))
+        self.assertIsNone(parse_time("yesterday"))
+
+    def test_import_events_splits_hot_and_archive_and_skips_duplicates(self):
+        database = Database()
+        database.collection, database.archive = FakeCollection(stored=["hot1"]), FakeCollection()
+        database.read_collection = database.collection  # marks the connection usable
+        now = datetime(2024, 1, 10)
+        events = [{"_id": "hot1", "timestamp": now}, {"_id": "hot2", "timestamp": now - timedelta(hours=1)},
+                  {"_id": "old", "timestamp": now - timedelta(days=30)}]
+        inserted = asyncio.run(database.import_events(events, now=now))
+        self.assertEqual([event["_id"] for event in inserted], ["hot2", "old"])
+        self.assertIn("old", database.archive.docs)
+        self.assertNotIn("old", database.collection.docs)
+
+    def test_resume_after_crash_before_rollups_keeps_counts(self):
+        stored, counted = set(), []
+        crash = [True]
+
+        async def import_events(events):
+            new = [event for event in events if event["_id"] not in stored]
+            stored.update(event["_id"] for event in new)
+            return new
+
+        async def increment_rollups(updates):
+            if crash[0]:
+                crash[0] = False
+                raise ConnectionError("crashed before rollups")
+            counted.append(sum(doc["count"] for doc, _ in updates))
+
+        async def connect():
+            pass
+
+        patched = {"import_events": import_events, "increment_rollups": increment_rollups, "connect": connect}
+        for name, fn in patched.items():
+            setattr(db, name, fn)
+        try:
+            args = (self.path, "nyc", {}, 1, 4)
+            with self.assertRaises(ConnectionError):
+                asyncio.run(run(*args, restart=False, rollups=True))
+            checkpoint = load_checkpoint(self.path, restart=False)
+            self.assertEqual((checkpoint["rows_done"], checkpoint["writing_until"]), (0, 4))
+
+            asyncio.run(run(*args, restart=False, rollups=True))
+            self.assertEqual(sum(counted), len(ROWS))
+            self.assertEqual(load_checkpoint(self.path, restart=False)["rows_done"], len(ROWS))
+        finally:
+            for name in patched:
+                delattr(db, name)
+
+
+if __name__ == '__main__':
+    unittest.main()
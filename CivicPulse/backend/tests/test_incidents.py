@@ -0,0 +1,113 @@
+"""Unit tests for incident merging."""
+import asyncio
+import unittest
+from datetime import datetime
+from app.incidents import lists_report, merge_update, new_incident, report_key
+from app.db import db, incident_filter
+from app.incidents import store_event
+from app.rollups import rollup_key
+
+
+def report(source, url, severity, hour):
+    return {
+        "source": source,
+        "url": url,
+        "title": f"Fire reported ({source})",
+        "timestamp": datetime(2024, 5, 1, hour),
+        "severity": severity,
+        "urgency": severity * 10 - 50,
+        "safety_score": severity * 10.0,
+    }
+
+
+class TestIncidents(unittest.TestCase):
+
+    def test_new_incident_lists_its_source(self):
+        incident = new_incident(report("rss:city", "https://city/1", 6, 9))
+        self.assertEqual(incident["report_count"], 1)
+        self.assertEqual([s["url"] for s in incident["sources"]], ["https://city/1"])
+
+    def test_merge_keeps_most_severe_and_earliest(self):
+        """A later, more severe report raises severity and extends the sources."""
+        incident = new_incident(report("rss:city", "https://city/1", 6, 9))
+        update = merge_update(incident, report("rss:reddit", "https://reddit/2", 8, 11))
+
+        self.assertEqual(update["$max"]["severity"], 8)
+        self.assertEqual(update["$max"]["last_reported_at"], datetime(2024, 5, 1, 11))
+        self.assertEqual(update["$min"]["first_reported_at"], datetime(2024, 5, 1, 9))
+        self.assertEqual(update["$push"]["sources"]["url"], "https://reddit/2")
+        self.assertEqual(update["$inc"], {"report_count": 1})
+
+    def test_out_of_order_report_keeps_the_rollup_hour(self):
+        """An earlier report extends first_reported_at but leaves timestamp, and so the rollup hour, alone."""
+        incident = dict(new_incident(report("rss:city", "https://city/1", 6, 11)),
+                        coordinates={"lat": 40.75, "lng": -73.98}, event_type="accident")
+        key = rollup_key(incident)
+        update = merge_update(incident, report("rss:reddit", "https://reddit/2", 6, 9))
+
+        self.assertEqual(update["$min"], {"first_reported_at": datetime(2024, 5, 1, 9)})
+        self.assertNotIn("timestamp", update.get("$set", {}))
+        self.assertEqual(key["hour"], datetime(2024, 5, 1, 11))
+
+    def test_merge_into_legacy_event(self):
+        """Events stored before merging get their own report as the first source."""
+        legacy = report("rss:city", "https://city/1", 6, 9)
+        update = merge_update(legacy, report("blotter", "https://police/3", 5, 10))
+
+        urls = [s["url"] for s in update["$push"]["sources"]["$each"]]
+        self.assertEqual(urls, ["https://city/1", "https://police/3"])
+        self.assertEqual(update["$set"], {"report_count": 2})
+
+    def test_blotter_entries_on_one_page_are_distinct(self):
+        """Entries of one listing page are separate reports; a re-scraped entry is not."""
+        first = dict(report("html:https://police/blotter", "https://police/blotter", 6, 9), text="Fire on Elm St")
+        second = dict(first, text="Fire on Oak Ave")
+        incident = new_incident(dict(first))
+
+        self.assertNotEqual(report_key(first), report_key(second))
+        self.assertEqual(incident["sources"][0]["key"], report_key(first))
+        self.assertFalse(lists_report(incident, second))
+        self.assertTrue(lists_report(incident, dict(first)))
+
+    def test_legacy_sources_match_a_rescrape(self):
+        """Documents stored before report keys still recognise their own reports."""
+        legacy = report("rss:city", "https://city/1", 6, 9)
+        self.assertTrue(lists_report(legacy, report("rss:city", "https://city/1", 6, 10)))
+
+        blotter = dict(report("html:https://police/blotter", "https://police/blotter", 6, 9), text="Fire on Elm St")
+        self.assertTrue(lists_report(blotter, dict(blotter)))
+        self.assertFalse(lists_report(blotter, dict(blotter, text="Fire on Oak Ave")))
+
+        merged = dict(legacy, sources=[{"source": "rss:reddit", "url": "https://reddit/2"}])
+        self.assertTrue(lists_report(merged, report("rss:reddit", "https://reddit/2", 7, 11)))
+        self.assertFalse(lists_report(merged, report("rss:reddit", "https://reddit/3", 7, 11)))
+
+    def test_centroid_placed_events_are_not_merged(self):
+        """Events at a street or neighborhood centroid neither look for nor attract merges."""
+        event = dict(report("rss:city", "https://city/9", 6, 9), event_type="accident",
+                     coordinates={"type": "Point", "coordinates": [-73.98, 40.75], "lat": 40.75, "lng": -73.98})
+        self.assertEqual(incident_filter(event, 250, 6)["approximate_location"], {"$ne": True})
+
+        calls = []
+
+        async def find_incident(*args):
+            calls.append("find")
+
+        async def insert_event(doc):
+            calls.append("insert")
+            return "new-id"
+
+        async def apply_rollup(key, update):
+            pass
+
+        db.find_incident, db.insert_event, db.apply_rollup = find_incident, insert_event, apply_rollup
+        try:
+            outcome = asyncio.run(store_event(dict(event, approximate_location=True)))
+        finally:
+            del db.find_incident, db.insert_event, db.apply_rollup
+        self.assertEqual(outcome, ("new-id", "new"))
+        self.assertEqual(calls, ["insert"])
+
+
+if __name__ == '__main__':
+    unittest.main()
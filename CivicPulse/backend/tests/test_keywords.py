@@ -0,0 +1,56 @@
+"""Unit tests for the shared keyword matcher."""
+import random
+import unittest
+from app import keywords
+from app.keywords import KeywordMatcher, SAFETY_KEYWORDS
+
+
+CATEGORIES = {
+    "crime": ["assault", "assault with weapon", "theft", "petty theft"],
+    "accident": ["accident", "car accident", "crash"],
+    "hazard": ["fire", "explosion"],
+}
+
+
+def expected_hits(categories, text):
+    """Reference semantics: the any(kw in text) scans the matcher replaces."""
+    text = text.lower()
+    return {c for c, kws in categories.items() if any(kw.lower() in text for kw in kws)}
+
+
+class TestKeywordMatcher(unittest.TestCase):
+
+    def test_overlapping_keywords_all_reported(self):
+        """A longer keyword also reports the categories of keywords inside it."""
+        matcher = KeywordMatcher({"major": ["assault with weapon"], "medium": ["assault"]})
+        self.assertEqual(matcher.match("Assault with weapon on 5th Ave"), {"major", "medium"})
+        self.assertEqual(matcher.match("Assault reported"), {"medium"})
+
+    def test_matches_substring_semantics(self):
+        """Both strategies agree with plain substring scanning on random texts."""
+        words = ["the", "firefighter", "car", "accidents", "petty", "thefts", "crashed",
+                 "assault", "with", "weapon", "explosions", "quiet", "park"]
+        rng = random.Random(3)
+        texts = [" ".join(rng.choice(words) for _ in range(rng.randint(0, 12))) for _ in range(300)]
+
+        original = keywords.REGEX_MIN_KEYWORDS
+        try:
+            for threshold in (1, 1000):  # force regex, then substring scanning
+                keywords.REGEX_MIN_KEYWORDS = threshold
+                matcher = KeywordMatcher(CATEGORIES)
+                for text in texts:
+                    self.assertEqual(matcher.match(text), expected_hits(CATEGORIES, text), text)
+        finally:
+            keywords.REGEX_MIN_KEYWORDS = original
+
+    def test_match_many(self):
+        """Batch matching returns one result per text, in order."""
+        results = SAFETY_KEYWORDS.match_many(["Shooting downtown", "Parade planned", "Water main break"])
+        self.assertIn("major_crime", results[0])
+        self.assertIn("high_risk", results[0])
+        self.assertEqual(results[1], frozenset())
+        self.assertEqual(results[2], {"infrastructure"})
+
+
+if __name__ == "__main__":
+    unittest.main()
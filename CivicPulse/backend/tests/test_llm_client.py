@@ -0,0 +1,58 @@
+"""Unit tests for the rate-limited LLM client building blocks."""
+import asyncio
+import time
+import unittest
+from app.llm_client import AdaptiveConcurrency, LLMUnavailable, RateLimiter, TokenBucket, parse_duration
+
+
+class TestLLMClient(unittest.TestCase):
+
+    def test_parse_duration(self):
+        """Reset headers come as Go-style durations."""
+        self.assertEqual(parse_duration("1s"), 1.0)
+        self.assertEqual(parse_duration("6m0s"), 360.0)
+        self.assertAlmostEqual(parse_duration("20ms"), 0.02)
+        self.assertEqual(parse_duration("2"), 2.0)
+        self.assertIsNone(parse_duration(""))
+
+    def test_bucket_syncs_with_headers(self):
+        """Server limits replace the configured ones; remaining budget caps the bucket."""
+        bucket = TokenBucket(600)
+        bucket.sync(limit=3000, remaining=10, now=bucket.updated)
+        self.assertEqual(bucket.capacity, 3000)
+        self.assertEqual(bucket.tokens, 10)
+        self.assertAlmostEqual(bucket.wait_time(60), 50 / 50.0)
+
+    def test_limiter_gives_up_past_deadline(self):
+        """A call that cannot get budget before its deadline fails fast."""
+        limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=60000)
+
+        async def run():
+            await limiter.acquire(100, time.monotonic() + 5)
+            await limiter.acquire(100, time.monotonic() + 5)  # refills in ~1s
+            with self.assertRaises(LLMUnavailable) as ctx:
+                limiter.requests.tokens = 0
+                await limiter.acquire(100, time.monotonic() + 0.1)
+            self.assertEqual(ctx.exception.reason, "rate_limited")
+
+        asyncio.run(run())
+
+    def test_concurrency_is_aimd(self):
+        """Limit grows slowly on success, halves on 429 and holds when budget is low."""
+        async def run():
+            concurrency = AdaptiveConcurrency(initial=8, maximum=10)
+            await concurrency.on_success(budget_fraction=0.9)
+            self.assertAlmostEqual(concurrency.limit, 8.125)
+            await concurrency.on_success(budget_fraction=0.01)
+            self.assertAlmostEqual(concurrency.limit, 8.125)
+            await concurrency.on_rate_limited()
+            self.assertAlmostEqual(concurrency.limit, 4.0625)
+            for _ in range(100):
+                await concurrency.on_success(None)
+            self.assertEqual(concurrency.limit, 10)
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
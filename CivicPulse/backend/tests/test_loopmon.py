@@ -0,0 +1,46 @@
+"""Unit tests for the event loop monitor."""
+import asyncio
+import socket
+import time
+import unittest
+from app import loopmon
+
+
+class TestLoopMonitor(unittest.TestCase):
+
+    def test_stall_is_reported_with_stack(self):
+        async def stall():
+            loopmon.start_loop_monitor()
+            await asyncio.sleep(0.2)
+            time.sleep(loopmon.BLOCK_SECONDS + 0.4)  # blocks the loop
+            await asyncio.sleep(0.3)
+            loopmon.stop_loop_monitor()
+
+        before = len(loopmon._blocks)
+        asyncio.run(stall())
+        report = loopmon.loop_report()
+        self.assertEqual(len(report["blocks"]), before + 1)
+        self.assertTrue(any("in stall" in line for line in report["blocks"][-1]["stack"]))
+        self.assertGreater(report["lag_seconds"], 0.0)
+
+    def test_strict_mode_flags_blocking_connect_on_loop(self):
+        server = socket.create_server(("127.0.0.1", 0))
+        address = server.getsockname()
+
+        async def connects():
+            loopmon.start_loop_monitor(strict=True)
+            socket.create_connection(address, timeout=1).close()
+            await asyncio.to_thread(lambda: socket.create_connection(address, timeout=1).close())  # off the loop
+            loopmon.stop_loop_monitor()
+
+        try:
+            asyncio.run(connects())
+        finally:
+            server.close()
+        sites = [site for site in loopmon.loop_report()["blocking_calls"] if site["event"] == "socket.connect"]
+        self.assertEqual(len(sites), 1)
+        self.assertIn("test_loopmon.py", sites[0]["site"])
+
+
+if __name__ == '__main__':
+    unittest.main()
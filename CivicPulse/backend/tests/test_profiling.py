@@ -0,0 +1,105 @@
+"""Unit tests for sampled request profiling."""
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from collections import Counter
+from pathlib import Path
+import app.profiling as profiling
+from app.profiling import ProfilingMiddleware, write_profile
+
+
+class FixedRandom:
+    def __init__(self, value):
+        self.value = value
+
+    def random(self):
+        return self.value
+
+
+def http_scope(headers=()):
+    return {"type": "http", "method": "GET", "path": "/events", "headers": list(headers)}
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = (profiling.SAMPLE_RATE, profiling.TOKEN, profiling.PROFILE_DIR,
+                      profiling.MAX_FILES, profiling.INTERVAL_MS, profiling.random)
+        profiling.PROFILE_DIR = Path(tempfile.mkdtemp())
+        profiling.INTERVAL_MS = 1.0
+
+    def tearDown(self):
+        (profiling.SAMPLE_RATE, profiling.TOKEN, profiling.PROFILE_DIR,
+         profiling.MAX_FILES, profiling.INTERVAL_MS, profiling.random) = self.saved
+
+    def request(self, headers=()):
+        """Run one request through the middleware; returns the response start headers."""
+        sent = []
+
+        async def app(scope, receive, send):
+            await asyncio.sleep(0.03)
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            return {"type": "http.request"}
+
+        asyncio.run(ProfilingMiddleware(app)(http_scope(headers), receive, send))
+        return dict(sent[0]["headers"])
+
+    def test_disabled_passes_through(self):
+        profiling.SAMPLE_RATE, profiling.TOKEN = 0.0, ""
+        headers = self.request([(b"x-profile", b"anything")])
+        self.assertNotIn(b"x-profile-id", headers)
+        self.assertEqual(list(profiling.PROFILE_DIR.iterdir()), [])
+
+    def test_selection_by_token_and_by_sample_rate(self):
+        profiling.TOKEN, profiling.SAMPLE_RATE = "secret", 0.0
+        self.assertIn(b"x-profile-id", self.request([(b"x-profile", b"secret")]))
+        self.assertNotIn(b"x-profile-id", self.request([(b"x-profile", b"wrong")]))
+        self.assertNotIn(b"x-profile-id", self.request())
+
+        # A wrong or missing token still leaves the request to sampling
+        profiling.SAMPLE_RATE = 0.5
+        profiling.random = FixedRandom(0.1)
+        self.assertIn(b"x-profile-id", self.request([(b"x-profile", b"wrong")]))
+        self.assertIn(b"x-profile-id", self.request())
+        profiling.random = FixedRandom(0.9)
+        self.assertNotIn(b"x-profile-id", self.request([(b"x-profile", b"wrong")]))
+
+    def test_profile_is_folded_stacks(self):
+        profiling.TOKEN, profiling.SAMPLE_RATE = "secret", 0.0
+        headers = self.request([(b"x-profile", b"secret")])
+        path = profiling.PROFILE_DIR / f"{headers[b'x-profile-id'].decode()}.folded"
+        lines = path.read_text().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertGreater(int(count), 0)
+            self.assertTrue(all(stack.split(";")))
+        # Waiting in asyncio.sleep is attributed to the awaiting call site
+        self.assertTrue(any(line.rsplit(" ", 1)[0].endswith("[await]") for line in lines))
+
+        written = write_profile(Counter({"a (x.py:1);b (x.py:5)": 3, "a (x.py:1)": 1}), "manual")
+        self.assertEqual(written.read_text(), "a (x.py:1);b (x.py:5) 3\na (x.py:1) 1\n")
+        self.assertIsNone(write_profile(Counter(), "empty"))
+
+    def test_ring_buffer_keeps_newest_files(self):
+        profiling.MAX_FILES = 3
+        profiling.PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        for i in range(5):
+            old = profiling.PROFILE_DIR / f"p{i}.folded"
+            old.write_text("main (x.py:1) 1\n")
+            os.utime(old, (now - 100 + i, now - 100 + i))
+        write_profile(Counter({"main (x.py:1)": 1}), "p5")
+        names = sorted(p.stem for p in profiling.PROFILE_DIR.glob("*.folded"))
+        self.assertEqual(names, ["p3", "p4", "p5"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Unit tests for the local relevance prefilter."""
+import os
+import random
+import tempfile
+import unittest
+from app.relevance import RelevanceModel, evaluate, features, train
+
+
+CLASSES = ["major_crime", "accident", "other"]
+
+
+def corpus(n, seed=1):
+    """Small labelled corpus with clearly separable wording per class."""
+    rng = random.Random(seed)
+    streets = ["Broadway", "Canal Street", "5th Avenue", "Houston Street"]
+    templates = {
+        "major_crime": ["Shooting on {s} leaves one injured", "Man stabbed near {s}, suspect fled"],
+        "accident": ["Car crash on {s} blocks two lanes", "Bus collision at {s} intersection"],
+        "other": ["Farmers market returns to {s}", "Library on {s} extends weekend hours"],
+    }
+    samples = []
+    for _ in range(n):
+        label = rng.choice(CLASSES)
+        text = rng.choice(templates[label]).format(s=rng.choice(streets))
+        samples.append((text, label, {"major_crime": 9, "accident": 6, "other": 2}[label]))
+    return samples
+
+
+class TestRelevance(unittest.TestCase):
+
+    def test_features_are_stable(self):
+        """Hashing must not depend on PYTHONHASHSEED."""
+        self.assertEqual(sorted(features("Car crash on Broadway")), sorted(features("car CRASH on broadway")))
+        self.assertTrue(all(0 <= f < 2 ** 18 for f in features("Car crash on Broadway")))
+
+    def test_decisions_follow_thresholds(self):
+        """Confident texts are decided locally, and never at impossible thresholds."""
+        model = train(corpus(300), CLASSES, epochs=5)
+
+        self.assertEqual(model.decide("Farmers market returns to Broadway").action, "drop")
+        decision = model.decide("Shooting on Canal Street leaves one injured")
+        self.assertEqual((decision.action, decision.label), ("local", "major_crime"))
+        self.assertEqual(model.decide("Shooting on Canal Street", 1.01, 1.01).action, "llm")
+
+    def test_evaluate_reports_agreement(self):
+        """Held-out replay agrees with the labels on a separable corpus."""
+        model = train(corpus(300), CLASSES, epochs=5)
+        report = evaluate(model, corpus(100, seed=2), drop_threshold=0.8, local_threshold=0.8)
+
+        self.assertEqual(report["samples"], 100)
+        self.assertGreater(report["llm_calls_avoided_rate"], 0.5)
+        self.assertGreaterEqual(report["overall_agreement"], 0.95)
+
+    def test_save_load_roundtrip(self):
+        """A saved model predicts the same as the trained one."""
+        model = train(corpus(100), CLASSES, epochs=3)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "relevance.json")
+            model.save(path)
+            loaded = RelevanceModel.load(path)
+
+        text = "Car crash on 5th Avenue blocks two lanes"
+        for label, p in model.predict_proba(text).items():
+            self.assertAlmostEqual(loaded.predict_proba(text)[label], p, places=3)
+        self.assertAlmostEqual(loaded.severity["accident"], 6.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Unit tests for background rescoring."""
+import math
+import unittest
+from datetime import datetime, timedelta
+from app.rescoring import SETTLE_HOURS, bucket_filter, rescore_buckets, rescore_cutoff, rescore_pipeline
+from app.scoring import compute_score, score_fields
+
+
+def evaluate(expr, doc):
+    """Evaluate the aggregation operators used by rescore_pipeline against a document."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if not isinstance(expr, dict):
+        return expr
+    (op, args), = expr.items()
+    if op == "$exp":
+        return math.exp(evaluate(args, doc))
+    values = [evaluate(arg, doc) for arg in args]
+    if op == "$cond":
+        return values[1] if values[0] else values[2]
+    if op == "$subtract":
+        difference = values[0] - values[1]
+        return difference.total_seconds() * 1000 if isinstance(difference, timedelta) else difference
+    operators = {
+        "$and": all, "$min": min, "$max": max, "$add": sum,
+        "$multiply": lambda vs: math.prod(vs),
+        "$divide": lambda vs: vs[0] / vs[1],
+        "$gte": lambda vs: vs[0] is not None and vs[0] >= vs[1],
+        "$lte": lambda vs: vs[0] is not None and vs[0] <= vs[1],
+    }
+    return operators[op](values)
+
+
+class TestRescoring(unittest.TestCase):
+
+    def test_pipeline_matches_compute_score(self):
+        now = datetime.utcnow()
+        for severity, hours, title in ((8, 1, "Shooting reported"), (3, 30, "Road closure"), (None, 5, "Crash")):
+            doc = {"title": title, "text": "", "timestamp": now - timedelta(hours=hours)}
+            if severity is not None:
+                doc["severity"] = severity
+            doc.update(score_fields(doc))
+            stage = rescore_pipeline(now)[0]["$set"]
+            self.assertAlmostEqual(evaluate(stage["safety_score"], doc), compute_score(doc), places=2)
+            self.assertEqual(stage["scored_at"], now)
+
+    def test_cutoff_bounds_drift(self):
+        """An event scored at the cutoff has drifted by exactly the threshold."""
+        now = datetime(2024, 5, 1, 12)
+        end = now - timedelta(hours=10)
+        cutoff = rescore_cutoff(end, now, threshold=1.0)
+        hours = lambda t: (t - end).total_seconds() / 3600
+        drift = 100 * (math.exp(-hours(cutoff) / 24) - math.exp(-hours(now) / 24))
+        self.assertAlmostEqual(drift, 1.0, places=6)
+        self.assertTrue(end < cutoff < now)
+
+    def test_buckets_are_bounded(self):
+        """Only unsettled buckets are visited, and old buckets tolerate older scores."""
+        now = datetime(2024, 5, 1, 12, 30)
+        buckets = rescore_buckets(now)
+        self.assertLessEqual(len(buckets), math.ceil(SETTLE_HOURS) + 2)
+        self.assertLessEqual(buckets[-1][0], now - timedelta(hours=SETTLE_HOURS))
+        self.assertGreater(buckets[-1][1], now - timedelta(hours=SETTLE_HOURS))
+        for (start, end, cutoff), (older_start, _, older_cutoff) in zip(buckets, buckets[1:]):
+            self.assertGreater(cutoff, start)
+            self.assertLess(older_cutoff, cutoff)
+        query = bucket_filter(*buckets[0])
+        self.assertEqual(query["timestamp"], {"$gte": buckets[0][0], "$lt": buckets[0][1]})
+        self.assertEqual(query["scored_at"], {"$lt": buckets[0][2]})
+
+
+if __name__ == '__main__':
+    unittest.main()
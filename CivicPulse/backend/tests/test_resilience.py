@@ -0,0 +1,111 @@
+"""Unit tests for upstream deadlines, hedging and circuit breakers."""
+import asyncio
+import time
+import unittest
+from app.resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded, Upstream, deadline, timeout_for
+
+
+class TestResilience(unittest.TestCase):
+
+    def test_breaker_opens_probes_and_closes(self):
+        breaker = CircuitBreaker("test_breaker", window=10, min_calls=4, failure_rate=0.5, reset_seconds=0.05)
+        for ok in (True, False, True, False):
+            self.assertTrue(breaker.allow())
+            breaker.record(ok)
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())   # the single half-open probe
+        self.assertFalse(breaker.allow())
+        breaker.record(True)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_deadline_cuts_timeouts(self):
+        self.assertEqual(timeout_for(5.0), 5.0)
+        with deadline(1.0):
+            self.assertLessEqual(timeout_for(5.0), 1.0)
+            with deadline(10.0):
+                self.assertLessEqual(timeout_for(5.0), 1.0)  # the enclosing deadline is sooner
+        with deadline(0):
+            with self.assertRaises(DeadlineExceeded):
+                timeout_for(5.0)
+
+    def test_ingest_route_outlives_request_deadline(self):
+        from fastapi.testclient import TestClient
+        import app.main as main
+
+        async def slow_ingest():
+            await asyncio.sleep(0.2)
+            # Geocoding and LLM calls run in threads, which inherit any deadline
+            await asyncio.to_thread(timeout_for, 5.0)
+            return {"events_processed": 1, "events_stored": 1}
+
+        saved, main.run_ingest = main.run_ingest, slow_ingest
+        try:
+            response = TestClient(main.app).post("/ingest/one-shot", headers={"X-Request-Deadline": "0.05"})
+        finally:
+            main.run_ingest = saved
+        self.assertEqual(response.status_code, 200)
+
+    def test_hedged_call_takes_first_answer(self):
+        service = Upstream("test_hedge", timeout=2.0, hedge=True)
+        service.latencies.extend([0.01] * 50)
+        calls = []
+
+        async def slow_then_fast(timeout):
+            calls.append(timeout)
+            await asyncio.sleep(1.0 if len(calls) == 1 else 0.01)
+            return len(calls)
+
+        started = time.monotonic()
+        self.assertEqual(asyncio.run(service.call(slow_then_fast)), 2)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(len(calls), 2)
+
+    def test_open_circuit_fails_fast(self):
+        service = Upstream("test_open", timeout=1.0)
+        service.breaker.outcomes.extend([False] * 20)
+        service.breaker.record(False)
+        with self.assertRaises(CircuitOpen):
+            service.call_sync(lambda timeout: "unreachable")
+
+    def test_failed_maps_status_counts_as_upstream_error(self):
+        """HTTP 200 with OVER_QUERY_LIMIT is an error for the metric and the breaker; ZERO_RESULTS is not."""
+        import app.geocode as geocode_module
+        from app.metrics import UPSTREAM_REQUESTS
+
+        class Response:
+            def __init__(self, status):
+                self.status = status
+
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return {"status": self.status, "results": []}
+
+        class Requests:
+            status = "OVER_QUERY_LIMIT"
+
+            def get(self, url, params=None, timeout=None):
+                return Response(self.status)
+
+        stub = Requests()
+        service = Upstream("test_maps_status", timeout=1.0)
+        fetch = lambda timeout: geocode_module.fetch_json("https://maps", {}, timeout)
+        saved, geocode_module.requests = geocode_module.requests, stub
+        try:
+            with self.assertRaises(geocode_module.MapsApiError):
+                service.call_sync(fetch)
+            stub.status = "ZERO_RESULTS"
+            self.assertEqual(service.call_sync(fetch)["status"], "ZERO_RESULTS")
+        finally:
+            geocode_module.requests = saved
+        self.assertEqual(list(service.breaker.outcomes), [False, True])
+        self.assertEqual(UPSTREAM_REQUESTS.labels("test_maps_status", "error")._value.get(), 1)
+        self.assertEqual(UPSTREAM_REQUESTS.labels("test_maps_status", "ok")._value.get(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""Unit tests for hourly event rollups."""
+import unittest
+from datetime import datetime
+from app.rollups import accumulate, geohash, geohash_bounds, rollup_key, stats_match, top_pipeline
+
+
+def event(lat, lng, minute, severity, event_type="accident"):
+    return {
+        "coordinates": {"lat": lat, "lng": lng},
+        "timestamp": datetime(2024, 5, 1, 13, minute),
+        "event_type": event_type,
+        "severity": severity,
+        "safety_score": severity * 10.0,
+    }
+
+
+class TestRollups(unittest.TestCase):
+
+    def test_geohash(self):
+        """Known cell, and the cell's bounds contain the point."""
+        self.assertEqual(geohash(40.758, -73.9855, 6), "dr5ru7")
+        south, west, north, east = geohash_bounds("dr5ru7")
+        self.assertTrue(south <= 40.758 <= north and west <= -73.9855 <= east)
+        self.assertTrue(geohash(40.758, -73.9855, 6).startswith(geohash(40.758, -73.9855, 4)))
+
+    def test_events_in_same_hour_and_cell_share_a_rollup(self):
+        rollups = {}
+        accumulate(rollups, event(40.7580, -73.9855, 5, 6))
+        accumulate(rollups, event(40.7581, -73.9856, 50, 8))
+        accumulate(rollups, event(40.7580, -73.9855, 20, 4, "minor_crime"))
+
+        key = rollup_key(event(40.7580, -73.9855, 0, 1))
+        self.assertEqual(key["_id"], "2024-05-01T13|dr5ru7|accident")
+        self.assertEqual(len(rollups), 2)
+        doc = rollups[key["_id"]]
+        self.assertEqual((doc["count"], doc["severity_sum"], doc["max_safety_score"]), (2, 14, 80.0))
+
+    def test_stats_pipelines(self):
+        """Cell filters match by prefix; top-N groups cells at the requested precision."""
+        match = stats_match(datetime(2024, 5, 1, 13, 30), cell="dr5r")
+        self.assertEqual(match["hour"], {"$gte": datetime(2024, 5, 1, 13)})
+        self.assertEqual(match["cell"], {"$regex": "^dr5r"})
+
+        pipeline = top_pipeline(match, "cell", precision=5, limit=3)
+        self.assertEqual(pipeline[1]["$group"]["_id"], {"$substrCP": ["$cell", 0, 5]})
+        self.assertEqual(pipeline[3], {"$limit": 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
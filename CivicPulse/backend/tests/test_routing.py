@@ -0,0 +1,69 @@
+"""Unit tests for the local routing engine."""
+import time
+import unittest
+import numpy as np
+from app.events import EventColumns
+from app.routing import RoadGraph, pack_graph
+
+SPACING = 0.001  # degrees, about 111 m of latitude
+
+
+def grid_graph(n=5):
+    """Two-way n x n street grid starting at (40.75, -73.99)."""
+    lat = [40.75 + SPACING * (i // n) for i in range(n * n)]
+    lng = [-73.99 + SPACING * (i % n) for i in range(n * n)]
+    edges = []
+    for i in range(n * n):
+        for j in (i + 1 if i % n < n - 1 else None, i + n if i + n < n * n else None):
+            if j is not None:
+                edges.append((i, j, [(lat[i], lng[i]), (lat[j], lng[j])]))
+                edges.append((j, i, [(lat[j], lng[j]), (lat[i], lng[i])]))
+    return RoadGraph(pack_graph(lat, lng, edges))
+
+
+def events_at(points, severity=10, now=None):
+    now = time.time() if now is None else now
+    return EventColumns([str(i) for i in range(len(points))], [p[0] for p in points], [p[1] for p in points],
+                        [now] * len(points), [severity] * len(points), [0] * len(points), [0] * len(points))
+
+
+class TestRouting(unittest.TestCase):
+
+    def test_shortest_path_without_risk(self):
+        graph = grid_graph()
+        path = graph.shortest_path({"lat": 40.75, "lng": -73.99}, {"lat": 40.754, "lng": -73.99}, 1.0, 0.0)
+        self.assertAlmostEqual(path["distance_meters"], 4 * 111.2, delta=2)
+        self.assertEqual(path["coordinates"][0], (40.75, -73.99))
+        self.assertAlmostEqual(path["coordinates"][-1][0], 40.754)
+        # Shapes are densified and joints are not repeated
+        self.assertEqual(len(path["coordinates"]), len(set(path["coordinates"])))
+
+    def test_risk_detours_and_expires(self):
+        graph = grid_graph()
+        start, end = {"lat": 40.75, "lng": -73.99}, {"lat": 40.754, "lng": -73.99}
+        now = time.time()
+        graph.update_risk(events_at([(40.752, -73.99)], now=now), now=now)
+        safe = graph.shortest_path(start, end, 0.5, 0.5, now=now)
+        self.assertGreater(safe["distance_meters"], 500)
+        self.assertTrue(all(abs(lng + 73.99) > 1e-9 for lat, lng in safe["coordinates"] if abs(lat - 40.752) < 1e-9))
+        fast = graph.shortest_path(start, end, 1.0, 0.0, now=now)
+        self.assertAlmostEqual(fast["distance_meters"], 4 * 111.2, delta=2)
+
+        # The event expires: its risk is subtracted again
+        self.assertEqual(graph.update_risk(EventColumns.empty(), now=now), (0, 1))
+        self.assertAlmostEqual(float(np.abs(graph.edge_risk(now)).max()), 0.0, places=6)
+
+    def test_incremental_matches_rebuild(self):
+        now = time.time()
+        first = events_at([(40.751, -73.9895), (40.753, -73.987)], now=now - 3600)
+        both = events_at([(40.751, -73.9895), (40.753, -73.987), (40.7535, -73.988)], now=now - 3600)
+        incremental, rebuilt = grid_graph(), grid_graph()
+        incremental.update_risk(first, now=now)
+        self.assertEqual(incremental.update_risk(both, now=now), (1, 0))
+        rebuilt.update_risk(both, now=now)
+        np.testing.assert_allclose(incremental.edge_risk(now), rebuilt.edge_risk(now), atol=1e-9)
+        self.assertGreater(rebuilt.edge_risk(now).max(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
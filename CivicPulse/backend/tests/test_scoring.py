@@ -1,7 +1,8 @@
 """Unit tests for safety scoring module."""
 import unittest
 from datetime import datetime, timedelta
-from app.scoring import compute_score, haversine_distance
+from app.scoring import (compute_route_risk, compute_score, decode_polyline, encode_polyline, events_near,
+                         haversine_distance, resample_polyline, simplify_polyline)
 
 
 class TestScoring(unittest.TestCase):
@@ -77,6 +78,67 @@ class TestScoring(unittest.TestCase):
             self.assertGreaterEqual(score, 0, f"Score {score} should be >= 0")
             self.assertLessEqual(score, 100, f"Score {score} should be <= 100")
     
+    def test_polyline_round_trip(self):
+        """Google's documented example decodes and encodes back exactly."""
+        encoded = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+        points = decode_polyline(encoded)
+        self.assertEqual(points.shape, (3, 2))
+        self.assertEqual(points.tolist(), [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]])
+        self.assertEqual(encode_polyline(points), encoded)
+        self.assertEqual(decode_polyline("_p~iF~ps|U_").shape, (0, 2))  # truncated
+
+    def test_simplify_polyline(self):
+        """Collinear points are dropped, a corner is kept."""
+        straight = [(40.75 + i * 1e-4, -73.99) for i in range(50)]
+        corner = straight + [(straight[-1][0], -73.99 + i * 1e-4) for i in range(1, 50)]
+        simplified = simplify_polyline(corner, tolerance_meters=1.0)
+        self.assertEqual(simplified.tolist(), [list(corner[0]), list(straight[-1]), list(corner[-1])])
+        self.assertEqual(len(simplify_polyline(corner, tolerance_meters=0)), len(corner))
+
+    def test_simplified_route_still_sees_mid_segment_events(self):
+        """A straight route simplifies to its ends; resampling keeps the middle scored."""
+        route = [(40.75 + i * 2e-4, -73.99) for i in range(60)]  # ~1.3 km straight north
+        event = {"coordinates": {"lat": route[30][0], "lng": -73.99}, "severity": 8,
+                 "timestamp": datetime.utcnow().isoformat(), "text": ""}
+        simplified = simplify_polyline(route, tolerance_meters=5.0)
+        self.assertEqual(len(simplified), 2)
+        samples = resample_polyline(simplified, spacing_meters=50.0)
+        self.assertLessEqual(haversine_distance(*samples[0], *samples[1]), 50.0)
+        risk, count = compute_route_risk(samples, [event], radius_meters=50.0, sample=False)
+        self.assertGreater(risk, 0.0)
+        self.assertGreaterEqual(count, 1)
+        self.assertEqual(len(resample_polyline(simplified, 50.0, max_points=10)), 10)
+
+    def test_route_events_without_snapshot_take_few_queries(self):
+        """Candidates come from a box query per segment of samples, not a $near per sample point."""
+        import asyncio
+        import app.api as api
+        from app.events import EventColumns
+
+        samples = resample_polyline([(40.70, -74.00), (40.75, -74.00)], spacing_meters=50.0, max_points=200)
+        near = {"_id": "near", "coordinates": {"lat": 40.7251, "lng": -74.0002}, "severity": 7,
+                "timestamp": datetime.utcnow(), "text": ""}
+        far = dict(near, _id="far", coordinates={"lat": 40.7251, "lng": -74.0100})
+        boxes = []
+
+        async def risk_events(bbox, since_hours):
+            boxes.append(bbox)
+            return [dict(near), dict(far)]
+
+        saved, api.get_snapshot = api.get_snapshot, lambda: None
+        api.db.risk_events = risk_events
+        try:
+            events = asyncio.run(api.nearby_route_events(samples))
+        finally:
+            api.get_snapshot = saved
+            del api.db.risk_events  # back to the class method
+        self.assertEqual(len(boxes), -(-len(samples) // api.ROUTE_LOOKUP_SEGMENT_POINTS))
+        self.assertLess(len(boxes), 10)
+        self.assertEqual(events.ids, ["near"])  # deduplicated across boxes, the far one filtered out
+
+        columns = EventColumns.from_docs([near, far])
+        self.assertEqual(events_near(samples, columns, 50.0, block=1).ids, ["near"])
+
     def test_haversine_distance(self):
         """Test Haversine distance calculation."""
         # Distance between NYC (40.7128, -74.0060) and Philadelphia (39.9526, -75.1652)
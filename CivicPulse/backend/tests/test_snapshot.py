@@ -0,0 +1,88 @@
+"""Unit tests for memory-mapped event snapshots."""
+import json
+import os
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from app.events import EventColumns
+from app.scoring import compute_route_risk
+import app.snapshot as snapshot_module
+from app.snapshot import Snapshot, build_snapshot, get_snapshot, publish_snapshot
+
+
+def doc(i, lat, lng, hours_ago=1.0):
+    return {
+        "_id": f"id{i}",
+        "source": "test",
+        "title": f"Event {i}",
+        "text": "Car accident reported",
+        "timestamp": datetime.utcnow() - timedelta(hours=hours_ago),
+        "coordinates": {"lat": lat, "lng": lng},
+        "safety_score": 50.0,
+        "severity": 6,
+        "event_type": "accident",
+    }
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.docs = [doc(i, 40.70 + rng.random() * 0.1, -74.00 + rng.random() * 0.1, rng.random() * 48)
+                     for i in range(500)]
+        self.directory = tempfile.mkdtemp()
+        version = publish_snapshot(build_snapshot(self.docs, cell_degrees=0.005), self.directory, 72)
+        self.snapshot = Snapshot(os.path.join(self.directory, version))
+
+    def test_bbox_and_window_query_matches_scan(self):
+        bbox = {"sw": {"lat": 40.72, "lng": -73.98}, "ne": {"lat": 40.75, "lng": -73.95}}
+        body = json.loads(self.snapshot.events_json(self.snapshot.query(bbox=bbox, since_hours=24)))
+        cutoff = datetime.utcnow() - timedelta(hours=24)
+        expected = {d["_id"] for d in self.docs
+                    if 40.72 <= d["coordinates"]["lat"] <= 40.75 and -73.98 <= d["coordinates"]["lng"] <= -73.95
+                    and d["timestamp"] >= cutoff}
+        self.assertEqual({e["_id"] for e in body["events"]}, expected)
+        self.assertEqual(body["count"], len(expected))
+        self.assertTrue(self.snapshot.covers(24) and not self.snapshot.covers(24 * 30))
+
+    def test_route_risk_matches_full_scan(self):
+        """Grid candidates score the same as scoring against every event."""
+        route = [(40.72 + i * 0.001, -73.97 + i * 0.0005) for i in range(60)]
+        sample = route[::max(1, len(route) // 20)]
+        candidates = self.snapshot.columns(self.snapshot.near(sample, radius_meters=50))
+        self.assertLess(len(candidates), len(self.docs))
+        risk, count = compute_route_risk(route, candidates)
+        full_risk, full_count = compute_route_risk(route, EventColumns.from_docs(self.docs))
+        self.assertEqual(count, full_count)
+        self.assertAlmostEqual(risk, full_risk, places=3)
+
+    def test_workers_swap_to_new_version(self):
+        first = get_snapshot(self.directory)
+        self.assertEqual(len(first), 500)
+        publish_snapshot(build_snapshot(self.docs[:10]), self.directory, 72, keep=1)
+        snapshot_module._checked_at = 0.0
+        second = get_snapshot(self.directory)
+        self.assertEqual(len(second), 10)
+        self.assertEqual(len(first), 500)  # still mapped after its directory was removed
+        self.assertEqual(len([name for name in os.listdir(self.directory) if name.startswith("v")]), 1)
+
+    def test_stale_snapshot_is_not_served(self):
+        version = publish_snapshot(build_snapshot(self.docs[:10]), self.directory, 72)
+        meta_path = os.path.join(self.directory, version, "meta.json")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        meta["created_at"] -= snapshot_module.MAX_AGE_SECONDS + 1
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        snapshot_module._checked_at = 0.0
+        self.assertIsNone(get_snapshot(self.directory))
+
+        publish_snapshot(build_snapshot(self.docs[:20]), self.directory, 72)
+        snapshot_module._checked_at = 0.0
+        self.assertEqual(len(get_snapshot(self.directory)), 20)
+        snapshot_module._snapshot, snapshot_module._checked_at = None, 0.0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Unit tests for the seeded synthetic city generator."""
+import math
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.events import EVENT_TYPES
+from scripts.synthetic import CHUNK_SIZE, SyntheticCity
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+
+def meters(a, b):
+    dlat = (a[0] - b[0]) * 111_320
+    dlng = (a[1] - b[1]) * 111_320 * math.cos(math.radians(a[0]))
+    return math.hypot(dlat, dlng)
+
+
+class TestSyntheticCity(unittest.TestCase):
+
+    def test_same_seed_reproduces_events_and_routes(self):
+        first, second = SyntheticCity(seed=3, now=NOW), SyntheticCity(seed=3, now=NOW)
+        self.assertEqual(first.events(200, score=False), second.events(200, score=False))
+        self.assertEqual(list(first.routes(3, 50)), list(second.routes(3, 50)))
+        start, end = first.points(2)
+        self.assertEqual(first.route(start, end, variant=2), second.route(start, end, variant=2))
+
+        other = SyntheticCity(seed=4, now=NOW)
+        self.assertNotEqual([e["coordinates"] for e in first.events(50, score=False)],
+                            [e["coordinates"] for e in other.events(50, score=False)])
+
+    def test_prefix_does_not_depend_on_n(self):
+        city = SyntheticCity(seed=5, now=NOW)
+        small = city.events(10, score=False)
+        large = city.events(CHUNK_SIZE + 10, score=False)
+        self.assertEqual(small, large[:10])
+        self.assertEqual(len(large), CHUNK_SIZE + 10)
+
+    def test_event_documents(self):
+        city = SyntheticCity(seed=6, now=NOW, days=2.0)
+        for doc in city.events(100, score=False):
+            self.assertIn(doc["event_type"], EVENT_TYPES)
+            self.assertTrue(1 <= doc["severity"] <= 10)
+            self.assertTrue((NOW - doc["timestamp"]).total_seconds() <= 2 * 86400)
+            self.assertLessEqual(doc["timestamp"], NOW)
+            lng, lat = doc["coordinates"]["coordinates"]
+            self.assertEqual((lat, lng), (doc["coordinates"]["lat"], doc["coordinates"]["lng"]))
+
+    def test_route_shape(self):
+        city = SyntheticCity(seed=7, now=NOW)
+        start, end = city.points(2)
+        for variant in (0, 1, 2):
+            route = city.route(start, end, variant=variant, step_m=25.0)
+            self.assertGreater(len(route), 2)
+            self.assertTrue(all(isinstance(p, tuple) and len(p) == 2 for p in route))
+            self.assertLess(meters(route[0], start), 1.0)
+            self.assertLess(meters(route[-1], end), 1.0)
+            # Densified: no step is much longer than step_m
+            self.assertLessEqual(max(meters(a, b) for a, b in zip(route, route[1:])), 25.0 * 1.5)
+
+    def test_route_records(self):
+        city = SyntheticCity(seed=8, now=NOW)
+        records = list(city.routes(2, 40))
+        self.assertEqual([r["id"] for r in records], [0, 1])
+        for record in records:
+            self.assertEqual(set(record), {"id", "start", "end", "points", "polyline"})
+            self.assertEqual(record["points"], 40)
+            self.assertIsInstance(record["polyline"], str)
+
+
+if __name__ == "__main__":
+    unittest.main()